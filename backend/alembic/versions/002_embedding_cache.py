@@ -0,0 +1,33 @@
+"""Add content-addressed embedding cache table
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Embeddings keyed by (model, task type, sha256 of normalized chunk text)
+    op.create_table(
+        'embedding_cache',
+        sa.Column('model_name', sa.String(), nullable=False),
+        sa.Column('task_type', sa.String(), nullable=False),
+        sa.Column('content_hash', sa.String(64), nullable=False),
+        sa.Column('embedding', Vector(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('model_name', 'task_type', 'content_hash'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('embedding_cache')
@@ -0,0 +1,29 @@
+"""Add content hash and processing signature to materials
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # sha256 of the uploaded file and the chunker/embedding configuration that
+    # produced the material's chunks, used to clone chunks of identical uploads
+    op.add_column('materials', sa.Column('content_hash', sa.String(64), nullable=True))
+    op.add_column('materials', sa.Column('processing_signature', sa.String(), nullable=True))
+    op.create_index('ix_materials_content_hash', 'materials', ['content_hash'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_materials_content_hash', table_name='materials')
+    op.drop_column('materials', 'processing_signature')
+    op.drop_column('materials', 'content_hash')
@@ -0,0 +1,128 @@
+"""Quantized embedding index option and match_chunks search function
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+
+The ANN index on chunks.embedding is built for EMBEDDING_INDEX_PRECISION at
+migration time:
+
+- full:   ivfflat over vector(768) (previous behaviour)
+- half:   ivfflat over embedding::halfvec(768), half the index size
+- binary: ivfflat over binary_quantize(embedding)::bit(768), 1/32 the index size
+
+The column keeps full-precision vectors, so match_chunks can re-rank the
+candidates of a quantized index exactly. half and binary need pgvector >= 0.7.
+To switch modes, change the setting and run `alembic downgrade 003 && alembic
+upgrade head`.
+
+"""
+from alembic import op
+
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+INDEX_DEFINITIONS = {
+    "full": "USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)",
+    "half": "USING ivfflat ((embedding::halfvec(768)) halfvec_cosine_ops) WITH (lists = 100)",
+    "binary": "USING ivfflat ((binary_quantize(embedding)::bit(768)) bit_hamming_ops) WITH (lists = 100)",
+}
+
+
+# Each branch orders by exactly the indexed expression so the planner can use
+# whichever index exists; quantized branches over-fetch candidate_count rows
+# and optionally re-rank them by full-precision cosine distance
+MATCH_CHUNKS_FUNCTION = """
+CREATE OR REPLACE FUNCTION match_chunks(
+    query_embedding vector(768),
+    match_notebook_id uuid,
+    match_count int DEFAULT 10,
+    candidate_count int DEFAULT 40,
+    index_precision text DEFAULT 'full',
+    rerank boolean DEFAULT true
+)
+RETURNS TABLE (
+    id uuid,
+    material_id uuid,
+    content text,
+    chunk_index int,
+    metadata jsonb,
+    similarity float
+)
+LANGUAGE plpgsql STABLE
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF index_precision = 'half' THEN
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata, c.embedding,
+                   (c.embedding::halfvec(768) <=> query_embedding::halfvec(768))::float AS distance
+            FROM chunks c
+            JOIN materials m ON m.id = c.material_id
+            WHERE m.notebook_id = match_notebook_id
+            ORDER BY c.embedding::halfvec(768) <=> query_embedding::halfvec(768)
+            LIMIT candidate_count
+        )
+        SELECT cand.id, cand.material_id, cand.content, cand.chunk_index, cand.metadata,
+               1 - CASE WHEN rerank THEN (cand.embedding <=> query_embedding)::float
+                        ELSE cand.distance END AS similarity
+        FROM candidates cand
+        ORDER BY similarity DESC
+        LIMIT match_count;
+
+    ELSIF index_precision = 'binary' THEN
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata, c.embedding,
+                   (binary_quantize(c.embedding)::bit(768) <~> binary_quantize(query_embedding))::float / 768 AS distance
+            FROM chunks c
+            JOIN materials m ON m.id = c.material_id
+            WHERE m.notebook_id = match_notebook_id
+            ORDER BY binary_quantize(c.embedding)::bit(768) <~> binary_quantize(query_embedding)
+            LIMIT candidate_count
+        )
+        SELECT cand.id, cand.material_id, cand.content, cand.chunk_index, cand.metadata,
+               1 - CASE WHEN rerank THEN (cand.embedding <=> query_embedding)::float
+                        ELSE cand.distance END AS similarity
+        FROM candidates cand
+        ORDER BY similarity DESC
+        LIMIT match_count;
+
+    ELSE
+        RETURN QUERY
+        SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata,
+               1 - (c.embedding <=> query_embedding)::float AS similarity
+        FROM chunks c
+        JOIN materials m ON m.id = c.material_id
+        WHERE m.notebook_id = match_notebook_id
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT match_count;
+    END IF;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    precision = settings.EMBEDDING_INDEX_PRECISION
+    if precision not in INDEX_DEFINITIONS:
+        raise ValueError(
+            f"EMBEDDING_INDEX_PRECISION must be one of {', '.join(INDEX_DEFINITIONS)}, got {precision!r}"
+        )
+
+    op.execute('DROP INDEX IF EXISTS ix_chunks_embedding')
+    op.execute(f'CREATE INDEX ix_chunks_embedding ON chunks {INDEX_DEFINITIONS[precision]}')
+    op.execute(MATCH_CHUNKS_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS match_chunks(vector, uuid, int, int, text, boolean)')
+    op.execute('DROP INDEX IF EXISTS ix_chunks_embedding')
+    op.execute(f'CREATE INDEX ix_chunks_embedding ON chunks {INDEX_DEFINITIONS["full"]}')
@@ -0,0 +1,27 @@
+"""Version chunks by chunker configuration
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Chunker configuration that produced each chunk, so re-chunking can write a
+    # new version next to the old one and swap them once it completes
+    op.add_column('chunks', sa.Column('chunker_version', sa.String(), nullable=True))
+    op.create_index('ix_chunks_material_id_chunker_version', 'chunks', ['material_id', 'chunker_version'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chunks_material_id_chunker_version', table_name='chunks')
+    op.drop_column('chunks', 'chunker_version')
@@ -0,0 +1,128 @@
+"""Tag chunk embeddings with the model that produced them
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+Existing embeddings all came from models/embedding-001, the only model used
+before EMBEDDING_MODEL was configurable. match_chunks gains a
+match_embedding_model argument so a query embedding is only compared with
+chunks embedded by the same model while a backfill is migrating them.
+
+"""
+import importlib.util
+from pathlib import Path
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+LEGACY_EMBEDDING_MODEL = "models/embedding-001"
+
+
+MATCH_CHUNKS_FUNCTION = """
+CREATE OR REPLACE FUNCTION match_chunks(
+    query_embedding vector(768),
+    match_notebook_id uuid,
+    match_count int DEFAULT 10,
+    candidate_count int DEFAULT 40,
+    index_precision text DEFAULT 'full',
+    rerank boolean DEFAULT true,
+    match_embedding_model text DEFAULT NULL
+)
+RETURNS TABLE (
+    id uuid,
+    material_id uuid,
+    content text,
+    chunk_index int,
+    metadata jsonb,
+    similarity float
+)
+LANGUAGE plpgsql STABLE
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF index_precision = 'half' THEN
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata, c.embedding,
+                   (c.embedding::halfvec(768) <=> query_embedding::halfvec(768))::float AS distance
+            FROM chunks c
+            JOIN materials m ON m.id = c.material_id
+            WHERE m.notebook_id = match_notebook_id
+              AND (match_embedding_model IS NULL OR c.embedding_model = match_embedding_model)
+            ORDER BY c.embedding::halfvec(768) <=> query_embedding::halfvec(768)
+            LIMIT candidate_count
+        )
+        SELECT cand.id, cand.material_id, cand.content, cand.chunk_index, cand.metadata,
+               1 - CASE WHEN rerank THEN (cand.embedding <=> query_embedding)::float
+                        ELSE cand.distance END AS similarity
+        FROM candidates cand
+        ORDER BY similarity DESC
+        LIMIT match_count;
+
+    ELSIF index_precision = 'binary' THEN
+        RETURN QUERY
+        WITH candidates AS (
+            SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata, c.embedding,
+                   (binary_quantize(c.embedding)::bit(768) <~> binary_quantize(query_embedding))::float / 768 AS distance
+            FROM chunks c
+            JOIN materials m ON m.id = c.material_id
+            WHERE m.notebook_id = match_notebook_id
+              AND (match_embedding_model IS NULL OR c.embedding_model = match_embedding_model)
+            ORDER BY binary_quantize(c.embedding)::bit(768) <~> binary_quantize(query_embedding)
+            LIMIT candidate_count
+        )
+        SELECT cand.id, cand.material_id, cand.content, cand.chunk_index, cand.metadata,
+               1 - CASE WHEN rerank THEN (cand.embedding <=> query_embedding)::float
+                        ELSE cand.distance END AS similarity
+        FROM candidates cand
+        ORDER BY similarity DESC
+        LIMIT match_count;
+
+    ELSE
+        RETURN QUERY
+        SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata,
+               1 - (c.embedding <=> query_embedding)::float AS similarity
+        FROM chunks c
+        JOIN materials m ON m.id = c.material_id
+        WHERE m.notebook_id = match_notebook_id
+          AND (match_embedding_model IS NULL OR c.embedding_model = match_embedding_model)
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT match_count;
+    END IF;
+END;
+$$;
+"""
+
+
+def _previous_match_chunks_function() -> str:
+    """match_chunks as defined by revision 004"""
+    path = Path(__file__).with_name("004_embedding_index_precision.py")
+    spec = importlib.util.spec_from_file_location("revision_004", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.MATCH_CHUNKS_FUNCTION
+
+
+def upgrade() -> None:
+    op.add_column('chunks', sa.Column('embedding_model', sa.String(), nullable=True))
+    op.execute(
+        sa.text("UPDATE chunks SET embedding_model = :model WHERE embedding IS NOT NULL")
+        .bindparams(model=LEGACY_EMBEDDING_MODEL)
+    )
+
+    op.execute('DROP FUNCTION IF EXISTS match_chunks(vector, uuid, int, int, text, boolean)')
+    op.execute(MATCH_CHUNKS_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS match_chunks(vector, uuid, int, int, text, boolean, text)')
+    op.execute(_previous_match_chunks_function())
+    op.drop_column('chunks', 'embedding_model')
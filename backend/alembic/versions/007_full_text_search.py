@@ -0,0 +1,107 @@
+"""Full-text search over chunks and messages
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+Adds stored tsvector columns generated from chunks.content and
+messages.content with GIN indexes, and the search_notebook_content function
+that ranks matches with ts_rank_cd and builds ts_headline snippets. Search
+cost follows the number of matches instead of the size of either table.
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+# Text search configuration of the generated columns; queries must use the same one
+TEXT_SEARCH_CONFIG = "english"
+
+
+# Matches are ranked and limited first, so ts_headline (which re-parses the
+# document) only runs on the rows returned
+SEARCH_NOTEBOOK_CONTENT_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION search_notebook_content(
+    search_notebook_id uuid,
+    search_query text,
+    match_count int DEFAULT 20
+)
+RETURNS TABLE (
+    id uuid,
+    type text,
+    title text,
+    content text,
+    highlight text,
+    created_at timestamp,
+    rank real
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH query AS (
+        SELECT websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', search_query) AS tsq
+    ),
+    chunk_matches AS (
+        SELECT c.id, 'material'::text AS type, m.filename::text AS title, c.content, c.created_at,
+               ts_rank_cd(c.content_tsv, query.tsq) AS rank
+        FROM chunks c
+        JOIN materials m ON m.id = c.material_id
+        CROSS JOIN query
+        WHERE c.content_tsv @@ query.tsq
+          AND m.notebook_id = search_notebook_id
+        ORDER BY rank DESC
+        LIMIT match_count
+    ),
+    message_matches AS (
+        SELECT msg.id, 'message'::text AS type, 'Conversation message'::text AS title,
+               msg.content, msg.created_at,
+               ts_rank_cd(msg.content_tsv, query.tsq) AS rank
+        FROM messages msg
+        JOIN conversations conv ON conv.id = msg.conversation_id
+        CROSS JOIN query
+        WHERE msg.content_tsv @@ query.tsq
+          AND conv.notebook_id = search_notebook_id
+        ORDER BY rank DESC
+        LIMIT match_count
+    ),
+    top_matches AS (
+        SELECT * FROM chunk_matches
+        UNION ALL
+        SELECT * FROM message_matches
+        ORDER BY rank DESC, created_at DESC
+        LIMIT match_count
+    )
+    SELECT t.id, t.type, t.title, left(t.content, 200) AS content,
+           ts_headline(
+               '{TEXT_SEARCH_CONFIG}', t.content, query.tsq,
+               'StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2'
+           ) AS highlight,
+           t.created_at, t.rank
+    FROM top_matches t
+    CROSS JOIN query
+    ORDER BY t.rank DESC, t.created_at DESC;
+$$;
+"""
+
+
+def upgrade() -> None:
+    for table in ("chunks", "messages"):
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN content_tsv tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', content)) STORED"
+        )
+        op.execute(f"CREATE INDEX ix_{table}_content_tsv ON {table} USING gin (content_tsv)")
+
+    op.execute(SEARCH_NOTEBOOK_CONTENT_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS search_notebook_content(uuid, text, int)')
+
+    for table in ("chunks", "messages"):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_content_tsv")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS content_tsv")
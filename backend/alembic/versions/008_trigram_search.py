@@ -0,0 +1,94 @@
+"""Trigram search over chunks and messages
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+Adds pg_trgm GIN indexes on chunks.content and messages.content and the
+search_notebook_trigram function. It finds substrings (identifiers, partial
+words) with an indexed ILIKE and typos with word_similarity. This is the
+"trigram" mode of notebook search; full-text search stays the default.
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+# Exact substrings rank 1.0; fuzzy matches rank by how well the query matches
+# the most similar run of words. Both predicates are served by the trigram
+# index; the threshold is set per call for the <% operator
+SEARCH_NOTEBOOK_TRIGRAM_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION search_notebook_trigram(
+    search_notebook_id uuid,
+    search_query text,
+    match_count int DEFAULT 20,
+    similarity_threshold real DEFAULT 0.5
+)
+RETURNS TABLE (
+    id uuid,
+    type text,
+    title text,
+    content text,
+    created_at timestamp,
+    rank real
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    pattern text := '%' || replace(replace(replace(search_query, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+BEGIN
+    PERFORM set_config('pg_trgm.word_similarity_threshold', similarity_threshold::text, true);
+
+    RETURN QUERY
+    WITH chunk_matches AS (
+        SELECT c.id, 'material'::text AS type, m.filename::text AS title, c.content, c.created_at,
+               CASE WHEN c.content ILIKE pattern THEN 1.0::real
+                    ELSE word_similarity(search_query, c.content) END AS rank
+        FROM chunks c
+        JOIN materials m ON m.id = c.material_id
+        WHERE (c.content ILIKE pattern OR search_query <% c.content)
+          AND m.notebook_id = search_notebook_id
+        ORDER BY rank DESC
+        LIMIT match_count
+    ),
+    message_matches AS (
+        SELECT msg.id, 'message'::text AS type, 'Conversation message'::text AS title,
+               msg.content, msg.created_at,
+               CASE WHEN msg.content ILIKE pattern THEN 1.0::real
+                    ELSE word_similarity(search_query, msg.content) END AS rank
+        FROM messages msg
+        JOIN conversations conv ON conv.id = msg.conversation_id
+        WHERE (msg.content ILIKE pattern OR search_query <% msg.content)
+          AND conv.notebook_id = search_notebook_id
+        ORDER BY rank DESC
+        LIMIT match_count
+    )
+    SELECT t.id, t.type, t.title, t.content, t.created_at, t.rank
+    FROM (
+        SELECT * FROM chunk_matches
+        UNION ALL
+        SELECT * FROM message_matches
+    ) t
+    ORDER BY t.rank DESC, t.created_at DESC
+    LIMIT match_count;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE INDEX ix_chunks_content_trgm ON chunks USING gin (content gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_messages_content_trgm ON messages USING gin (content gin_trgm_ops)')
+    op.execute(SEARCH_NOTEBOOK_TRIGRAM_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS search_notebook_trigram(uuid, text, int, real)')
+    op.execute('DROP INDEX IF EXISTS ix_messages_content_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_chunks_content_trgm')
@@ -0,0 +1,61 @@
+"""Lexical chunk matching for hybrid retrieval
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+
+Adds match_chunks_text, the full-text counterpart of match_chunks: it returns
+the same chunk columns, ranked by ts_rank_cd over the GIN-indexed content_tsv
+column (migration 007), for fusion with the vector results.
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+# Query terms are OR-ed rather than AND-ed, so natural-language questions still
+# match chunks that contain only some of their words; ts_rank_cd then rewards
+# chunks covering more of the terms, closer together
+MATCH_CHUNKS_TEXT_FUNCTION = """
+CREATE OR REPLACE FUNCTION match_chunks_text(
+    match_notebook_id uuid,
+    search_query text,
+    match_count int DEFAULT 50
+)
+RETURNS TABLE (
+    id uuid,
+    material_id uuid,
+    content text,
+    chunk_index int,
+    metadata jsonb,
+    rank real
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH query AS (
+        SELECT replace(plainto_tsquery('english', search_query)::text, '&', '|')::tsquery AS tsq
+    )
+    SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata,
+           ts_rank_cd(c.content_tsv, query.tsq) AS rank
+    FROM chunks c
+    JOIN materials m ON m.id = c.material_id
+    CROSS JOIN query
+    WHERE c.content_tsv @@ query.tsq
+      AND m.notebook_id = match_notebook_id
+    ORDER BY rank DESC
+    LIMIT match_count;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(MATCH_CHUNKS_TEXT_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS match_chunks_text(uuid, text, int)')
@@ -0,0 +1,205 @@
+"""Notebook-scoped vector search
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17
+
+chunks gets a denormalized notebook_id, filled from the chunk's material by a
+trigger so every writer (binary COPY, PostgREST inserts, clones) sets it.
+
+match_chunks no longer probes the global ANN index and filters the results
+by notebook, which returned too few rows and lost recall as other notebooks
+grew. It chooses a plan per notebook instead:
+
+- exact:  notebooks without their own index, or with at most
+          exact_scan_threshold chunks, are scanned exactly through the
+          notebook_id index and sorted by distance
+- ANN:    larger notebooks are searched through a partial HNSW index over just
+          their chunks, built by the sync_vector_indexes task once a notebook
+          passes VECTOR_EXACT_SCAN_MAX_CHUNKS (app/tasks/vector_indexes.py)
+
+The ANN query is run as dynamic SQL with the notebook id inlined, because the
+planner only uses a partial index when the predicate value is known when the
+query is planned.
+
+"""
+import importlib.util
+from pathlib import Path
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+SET_CHUNK_NOTEBOOK_ID_FUNCTION = """
+CREATE OR REPLACE FUNCTION set_chunk_notebook_id()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    SELECT m.notebook_id INTO NEW.notebook_id FROM materials m WHERE m.id = NEW.material_id;
+    RETURN NEW;
+END;
+$$;
+"""
+
+
+MATCH_CHUNKS_FUNCTION = """
+CREATE OR REPLACE FUNCTION match_chunks(
+    query_embedding vector(768),
+    match_notebook_id uuid,
+    match_count int DEFAULT 10,
+    candidate_count int DEFAULT 40,
+    index_precision text DEFAULT 'full',
+    rerank boolean DEFAULT true,
+    match_embedding_model text DEFAULT NULL,
+    exact_scan_threshold int DEFAULT 10000
+)
+RETURNS TABLE (
+    id uuid,
+    material_id uuid,
+    content text,
+    chunk_index int,
+    metadata jsonb,
+    similarity float
+)
+LANGUAGE plpgsql STABLE
+AS $$
+#variable_conflict use_column
+DECLARE
+    notebook_index text := format(
+        'ix_chunks_emb_%s_%s', index_precision, replace(match_notebook_id::text, '-', '')
+    );
+    use_index boolean;
+    order_expression text;
+    distance_expression text;
+BEGIN
+    -- A notebook's index only exists once it has outgrown the exact scan; the
+    -- bounded count covers notebooks that have shrunk since
+    SELECT EXISTS (
+        SELECT 1 FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE i.relname = notebook_index AND x.indisvalid
+    ) INTO use_index;
+
+    IF use_index THEN
+        SELECT count(*) > exact_scan_threshold INTO use_index
+        FROM (
+            SELECT 1 FROM chunks c
+            WHERE c.notebook_id = match_notebook_id
+            LIMIT exact_scan_threshold + 1
+        ) notebook_chunks;
+    END IF;
+
+    IF NOT use_index THEN
+        -- MATERIALIZED keeps the planner from ordering through the global index
+        RETURN QUERY
+        WITH notebook_chunks AS MATERIALIZED (
+            SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata, c.embedding
+            FROM chunks c
+            WHERE c.notebook_id = match_notebook_id
+              AND (match_embedding_model IS NULL OR c.embedding_model = match_embedding_model)
+        )
+        SELECT nc.id, nc.material_id, nc.content, nc.chunk_index, nc.metadata,
+               1 - (nc.embedding <=> query_embedding)::float AS similarity
+        FROM notebook_chunks nc
+        ORDER BY nc.embedding <=> query_embedding
+        LIMIT match_count;
+        RETURN;
+    END IF;
+
+    IF index_precision = 'half' THEN
+        order_expression := 'c.embedding::halfvec(768) <=> $1::halfvec(768)';
+        distance_expression := order_expression;
+    ELSIF index_precision = 'binary' THEN
+        order_expression := 'binary_quantize(c.embedding)::bit(768) <~> binary_quantize($1)';
+        distance_expression := '(' || order_expression || ')::float / 768';
+    ELSE
+        order_expression := 'c.embedding <=> $1';
+        distance_expression := order_expression;
+    END IF;
+
+    RETURN QUERY EXECUTE format($query$
+        WITH candidates AS (
+            SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata, c.embedding,
+                   (%s)::float AS distance
+            FROM chunks c
+            WHERE c.notebook_id = %L
+              AND ($2 IS NULL OR c.embedding_model = $2)
+            ORDER BY %s
+            LIMIT $3
+        )
+        SELECT cand.id, cand.material_id, cand.content, cand.chunk_index, cand.metadata,
+               1 - CASE WHEN $4 THEN (cand.embedding <=> $1)::float
+                        ELSE cand.distance END AS similarity
+        FROM candidates cand
+        ORDER BY similarity DESC
+        LIMIT $5
+    $query$, distance_expression, match_notebook_id, order_expression)
+    USING query_embedding, match_embedding_model, greatest(candidate_count, match_count),
+          rerank, match_count;
+END;
+$$;
+"""
+
+
+DROP_NOTEBOOK_INDEXES = r"""
+DO $$
+DECLARE
+    index_name text;
+BEGIN
+    FOR index_name IN
+        SELECT relname FROM pg_class WHERE relkind = 'i' AND relname LIKE 'ix\_chunks\_emb\_%'
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS %I', index_name);
+    END LOOP;
+END;
+$$;
+"""
+
+
+def _previous_match_chunks_function() -> str:
+    """match_chunks as defined by revision 006"""
+    path = Path(__file__).with_name("006_chunk_embedding_model.py")
+    spec = importlib.util.spec_from_file_location("revision_006", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.MATCH_CHUNKS_FUNCTION
+
+
+def upgrade() -> None:
+    op.add_column('chunks', sa.Column('notebook_id', UUID(as_uuid=True), nullable=True))
+    op.execute(
+        'UPDATE chunks c SET notebook_id = m.notebook_id FROM materials m WHERE m.id = c.material_id'
+    )
+    op.alter_column('chunks', 'notebook_id', nullable=False)
+    op.create_foreign_key(
+        'fk_chunks_notebook_id', 'chunks', 'notebooks', ['notebook_id'], ['id'], ondelete='CASCADE'
+    )
+    op.create_index('ix_chunks_notebook_id', 'chunks', ['notebook_id'])
+
+    op.execute(SET_CHUNK_NOTEBOOK_ID_FUNCTION)
+    op.execute(
+        'CREATE TRIGGER chunks_set_notebook_id BEFORE INSERT OR UPDATE OF material_id ON chunks '
+        'FOR EACH ROW EXECUTE FUNCTION set_chunk_notebook_id()'
+    )
+
+    op.execute('DROP FUNCTION IF EXISTS match_chunks(vector, uuid, int, int, text, boolean, text)')
+    op.execute(MATCH_CHUNKS_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS match_chunks(vector, uuid, int, int, text, boolean, text, int)')
+    op.execute(_previous_match_chunks_function())
+
+    op.execute(DROP_NOTEBOOK_INDEXES)
+    op.execute('DROP TRIGGER IF EXISTS chunks_set_notebook_id ON chunks')
+    op.execute('DROP FUNCTION IF EXISTS set_chunk_notebook_id()')
+    op.drop_index('ix_chunks_notebook_id', table_name='chunks')
+    op.drop_constraint('fk_chunks_notebook_id', 'chunks', type_='foreignkey')
+    op.drop_column('chunks', 'notebook_id')
@@ -0,0 +1,177 @@
+"""Drop the global embedding index; per-query ef_search for notebook indexes
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17
+
+Since revision 010 match_chunks only searches one notebook at a time: notebooks
+of up to VECTOR_EXACT_SCAN_MAX_CHUNKS chunks are scanned exactly, and larger
+ones go through their own partial HNSW index (built by sync_vector_indexes
+with HNSW_M and HNSW_EF_CONSTRUCTION). No query orders through the global
+ix_chunks_embedding index any more. It is also the ivfflat index migration 001
+trained on an empty table, whose lists never fit the data, and the planner
+could still pick it for a notebook query and return fewer rows than asked for.
+This revision drops it CONCURRENTLY, so uploads and searches keep running.
+
+match_chunks gains an ef_search argument, which sets hnsw.ef_search for the
+call on a notebook's partial index. Larger values trade latency for recall.
+The function becomes VOLATILE because it changes a setting.
+
+Needs pgvector >= 0.5 (0.7 for half and binary precision) for the notebook
+indexes.
+
+"""
+import importlib.util
+from pathlib import Path
+
+from alembic import op
+
+from app.core.config import settings
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+# Global index restored on downgrade, as built by revision 004
+IVFFLAT_INDEX_DEFINITIONS = {
+    "full": "USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)",
+    "half": "USING ivfflat ((embedding::halfvec(768)) halfvec_cosine_ops) WITH (lists = 100)",
+    "binary": "USING ivfflat ((binary_quantize(embedding)::bit(768)) bit_hamming_ops) WITH (lists = 100)",
+}
+
+
+MATCH_CHUNKS_FUNCTION = """
+CREATE OR REPLACE FUNCTION match_chunks(
+    query_embedding vector(768),
+    match_notebook_id uuid,
+    match_count int DEFAULT 10,
+    candidate_count int DEFAULT 40,
+    index_precision text DEFAULT 'full',
+    rerank boolean DEFAULT true,
+    match_embedding_model text DEFAULT NULL,
+    exact_scan_threshold int DEFAULT 10000,
+    ef_search int DEFAULT 40
+)
+RETURNS TABLE (
+    id uuid,
+    material_id uuid,
+    content text,
+    chunk_index int,
+    metadata jsonb,
+    similarity float
+)
+LANGUAGE plpgsql VOLATILE
+AS $$
+#variable_conflict use_column
+DECLARE
+    notebook_index text := format(
+        'ix_chunks_emb_%s_%s', index_precision, replace(match_notebook_id::text, '-', '')
+    );
+    use_index boolean;
+    order_expression text;
+    distance_expression text;
+BEGIN
+    -- A notebook's index only exists once it has outgrown the exact scan; the
+    -- bounded count covers notebooks that have shrunk since
+    SELECT EXISTS (
+        SELECT 1 FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE i.relname = notebook_index AND x.indisvalid
+    ) INTO use_index;
+
+    IF use_index THEN
+        SELECT count(*) > exact_scan_threshold INTO use_index
+        FROM (
+            SELECT 1 FROM chunks c
+            WHERE c.notebook_id = match_notebook_id
+            LIMIT exact_scan_threshold + 1
+        ) notebook_chunks;
+    END IF;
+
+    IF NOT use_index THEN
+        -- MATERIALIZED filters to the notebook before the exact sort
+        RETURN QUERY
+        WITH notebook_chunks AS MATERIALIZED (
+            SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata, c.embedding
+            FROM chunks c
+            WHERE c.notebook_id = match_notebook_id
+              AND (match_embedding_model IS NULL OR c.embedding_model = match_embedding_model)
+        )
+        SELECT nc.id, nc.material_id, nc.content, nc.chunk_index, nc.metadata,
+               1 - (nc.embedding <=> query_embedding)::float AS similarity
+        FROM notebook_chunks nc
+        ORDER BY nc.embedding <=> query_embedding
+        LIMIT match_count;
+        RETURN;
+    END IF;
+
+    -- HNSW returns at most ef_search rows, so never fewer than are asked for;
+    -- local to the calling transaction (one PostgREST request)
+    PERFORM set_config(
+        'hnsw.ef_search',
+        least(greatest(ef_search, candidate_count, match_count), 1000)::text,
+        true
+    );
+
+    IF index_precision = 'half' THEN
+        order_expression := 'c.embedding::halfvec(768) <=> $1::halfvec(768)';
+        distance_expression := order_expression;
+    ELSIF index_precision = 'binary' THEN
+        order_expression := 'binary_quantize(c.embedding)::bit(768) <~> binary_quantize($1)';
+        distance_expression := '(' || order_expression || ')::float / 768';
+    ELSE
+        order_expression := 'c.embedding <=> $1';
+        distance_expression := order_expression;
+    END IF;
+
+    RETURN QUERY EXECUTE format($query$
+        WITH candidates AS (
+            SELECT c.id, c.material_id, c.content, c.chunk_index, c.metadata, c.embedding,
+                   (%s)::float AS distance
+            FROM chunks c
+            WHERE c.notebook_id = %L
+              AND ($2 IS NULL OR c.embedding_model = $2)
+            ORDER BY %s
+            LIMIT $3
+        )
+        SELECT cand.id, cand.material_id, cand.content, cand.chunk_index, cand.metadata,
+               1 - CASE WHEN $4 THEN (cand.embedding <=> $1)::float
+                        ELSE cand.distance END AS similarity
+        FROM candidates cand
+        ORDER BY similarity DESC
+        LIMIT $5
+    $query$, distance_expression, match_notebook_id, order_expression)
+    USING query_embedding, match_embedding_model, greatest(candidate_count, match_count),
+          rerank, match_count;
+END;
+$$;
+"""
+
+
+def _previous_match_chunks_function() -> str:
+    """match_chunks as defined by revision 010"""
+    path = Path(__file__).with_name("010_chunk_notebook_id.py")
+    spec = importlib.util.spec_from_file_location("revision_010", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.MATCH_CHUNKS_FUNCTION
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_chunks_embedding')
+
+    op.execute('DROP FUNCTION IF EXISTS match_chunks(vector, uuid, int, int, text, boolean, text, int)')
+    op.execute(MATCH_CHUNKS_FUNCTION)
+
+
+def downgrade() -> None:
+    op.execute('DROP FUNCTION IF EXISTS match_chunks(vector, uuid, int, int, text, boolean, text, int, int)')
+    op.execute(_previous_match_chunks_function())
+
+    precision = settings.EMBEDDING_INDEX_PRECISION
+    definition = IVFFLAT_INDEX_DEFINITIONS.get(precision, IVFFLAT_INDEX_DEFINITIONS["full"])
+    with op.get_context().autocommit_block():
+        op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_chunks_embedding ON chunks {definition}')
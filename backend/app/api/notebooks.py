@@ -1,4 +1,5 @@
 """Notebook API endpoints"""
+from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from app.schemas.notebook import (
     NotebookCreateRequest,
@@ -15,10 +16,14 @@ from app.schemas.material import (
     ConversationResponse,
     MessageResponse,
     SearchResponse,
-    SearchResultResponse
+    SearchResultResponse,
+    RetrievalResponse,
+    RetrievedChunkResponse
 )
 from app.services.notebooks import notebook_service
 from app.services.materials import material_service
+from app.services.hybrid_search import hybrid_search_service, HybridSearchError
+from app.services.vector_search import vector_search_service
 from app.core.dependencies import get_current_user_id
 
 
@@ -203,7 +208,8 @@ async def upload_material(
         filename=request.filename,
         file_path=request.file_path,
         file_size=request.file_size,
-        mime_type=request.mime_type
+        mime_type=request.mime_type,
+        user_id=user_id
     )
     
     return MaterialUploadResponse(
@@ -261,20 +267,27 @@ async def get_notebook_conversations(
 async def search_notebook(
     notebook_id: str,
     q: str = Query(..., min_length=1, description="Search query"),
+    mode: Literal["fulltext", "trigram", "hybrid"] = Query(
+        "fulltext",
+        description="fulltext (stemmed words), trigram (substrings, typos) or hybrid (semantic + lexical chunks)"
+    ),
     user_id: str = Depends(get_current_user_id)
 ):
     """
     Search within notebook materials and conversations
     
-    Searches through material content and conversation messages for the query string.
-    Returns matching results with highlighted excerpts.
+    Searches material content and conversation messages. The default fulltext
+    mode matches stemmed words (web search syntax: "quoted phrases", OR,
+    -excluded); trigram mode matches substrings such as code identifiers and
+    tolerates typos; hybrid mode ranks material chunks by meaning and wording
+    together. Returns results ranked by relevance with highlighted excerpts.
     
     **Requirements**: 11.3
     """
     # Verify notebook ownership
     await notebook_service.get_notebook(notebook_id, user_id)
     
-    results = await notebook_service.search_notebook(notebook_id, q)
+    results = await notebook_service.search_notebook(notebook_id, q, mode=mode)
     
     search_results = [
         SearchResultResponse(
@@ -283,7 +296,8 @@ async def search_notebook(
             title=r["title"],
             content=r["content"],
             highlight=r["highlight"],
-            created_at=r["created_at"]
+            created_at=r["created_at"],
+            rank=r.get("rank")
         )
         for r in results
     ]
@@ -293,3 +307,45 @@ async def search_notebook(
         total=len(search_results),
         query=q
     )
+
+
+@router.get("/{notebook_id}/retrieve", response_model=RetrievalResponse)
+async def retrieve_chunks(
+    notebook_id: str,
+    q: str = Query(..., min_length=1, description="Natural-language query"),
+    limit: int = Query(10, ge=1, le=50, description="Number of chunks to return"),
+    profile: Literal["chat", "study"] = Query(
+        "chat", description="chat (lower latency) or study (higher recall) vector search"
+    ),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Retrieve the material chunks most relevant to a query
+    
+    Runs vector (embedding) and full-text retrieval concurrently and fuses the
+    rankings with reciprocal rank fusion. Each chunk carries its fused score and
+    its rank in each retriever. The profile sets the HNSW ef_search used by
+    the vector retrieval.
+    """
+    # Verify notebook ownership
+    await notebook_service.get_notebook(notebook_id, user_id)
+    
+    try:
+        chunks = await hybrid_search_service.search(
+            notebook_id, q, limit=limit,
+            ef_search=vector_search_service.ef_search_profiles[profile]
+        )
+    except HybridSearchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+    
+    return RetrievalResponse(
+        chunks=[
+            RetrievedChunkResponse(**{**chunk, "id": str(chunk["id"]), "material_id": str(chunk["material_id"])})
+            for chunk in chunks
+        ],
+        total=len(chunks),
+        query=q
+    )
@@ -1,5 +1,6 @@
 """Celery application configuration"""
 from celery import Celery
+from kombu import Queue
 from app.core.config import settings
 
 
@@ -23,5 +24,28 @@ celery_app.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes soft limit
     worker_prefetch_multiplier=1,  # Process one task at a time
     worker_max_tasks_per_child=50,  # Restart worker after 50 tasks
+    # Small and large materials are consumed by separate worker pools
+    task_queues=(Queue("materials"), Queue("materials_large")),
+    task_default_queue="materials",
+    task_routes={
+        # Fan-out shards of large materials stay off the small-upload pool
+        "app.tasks.embed_material_shard": {"queue": "materials_large"},
+        "app.tasks.finalize_material": {"queue": "materials_large"},
+        "app.tasks.sync_vector_indexes": {"queue": "materials_large"},
+    },
+    # Per-message priorities (0 runs first), used for per-user fairness
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "queue_order_strategy": "priority",
+    },
 )
 
+# Run by `celery beat`: the full sync drops indexes of deleted notebooks and of
+# notebooks shrunk by material deletions, which no upload triggers
+if settings.VECTOR_INDEX_SYNC_INTERVAL_SECONDS > 0:
+    celery_app.conf.beat_schedule = {
+        "sync-vector-indexes": {
+            "task": "app.tasks.sync_vector_indexes",
+            "schedule": float(settings.VECTOR_INDEX_SYNC_INTERVAL_SECONDS),
+        },
+    }
@@ -21,9 +21,45 @@ class Settings(BaseSettings):
     # Gemini AI
     GEMINI_API_KEY: str = ""
 
+    # Embeddings
+    EMBEDDING_MODEL: str = "models/embedding-001"  # Must produce 768-dimension vectors
+    EMBEDDING_PREVIOUS_MODELS: str = ""  # Models still being backfilled away from, searched alongside
+    EMBEDDING_BACKFILL_BATCH_SIZE: int = 200  # Chunks re-embedded per backfill step
+    EMBEDDING_BACKFILL_CHUNKS_PER_MINUTE: int = 1000  # Backfill throttle
+    EMBEDDING_BACKFILL_MAX_PASSES: int = 3  # Passes over the table retrying chunks whose embedding failed
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # Batched requests kept in flight per worker
+    EMBEDDING_REQUESTS_PER_MINUTE: int = 1500  # Provider quota, counted per embedded text; 0 disables the limit
+    EMBEDDING_TOKENS_PER_MINUTE: int = 1000000  # Provider quota, 0 disables the limit
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_TTL_SECONDS: int = 30 * 24 * 60 * 60  # Redis tier expiry (30 days)
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024  # In-process LRU entries, 0 disables
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 60 * 60
+    QUERY_EMBEDDING_CACHE_REDIS: bool = False  # Share query embeddings across API workers
+    EMBEDDING_INDEX_PRECISION: str = "full"  # Notebook HNSW indexes: full, half (halfvec) or binary
+    EMBEDDING_RERANK: bool = True  # Re-rank quantized index candidates at full precision
+    EMBEDDING_RERANK_FACTOR: int = 4  # Candidates fetched per requested result for quantized indexes
+    VECTOR_EXACT_SCAN_MAX_CHUNKS: int = 10000  # Larger notebooks get their own HNSW index instead of an exact scan
+    VECTOR_INDEX_SYNC_INTERVAL_SECONDS: int = 60 * 60  # Celery beat re-checks every notebook index, 0 disables
+    HNSW_M: int = 16  # HNSW graph degree of the per-notebook indexes
+    HNSW_EF_CONSTRUCTION: int = 64  # HNSW build-time candidate list size
+    HNSW_EF_SEARCH_CHAT: int = 40  # Query-time candidate list on notebook indexes, latency-sensitive retrieval
+    HNSW_EF_SEARCH_STUDY: int = 200  # Query-time candidate list on notebook indexes, recall-sensitive retrieval
+
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
 
+    # Material Processing
+    PROCESSING_CHECKPOINTS_ENABLED: bool = True  # Resume retried tasks from Redis checkpoints
+    PROCESSING_CHECKPOINT_TTL_SECONDS: int = 24 * 60 * 60
+    EMBEDDING_FANOUT_MIN_CHUNKS: int = 2000  # Larger materials embed across workers, 0 disables
+    EMBEDDING_FANOUT_SHARD_SIZE: int = 500  # Chunks embedded per sub-task
+    MATERIAL_LARGE_QUEUE_MB: int = 10  # Weighted size at which materials use the large queue
+    MATERIAL_FAIRNESS_WINDOW_SECONDS: int = 60 * 60  # How long a pending upload lowers its user's priority
+    CHUNK_STORE_METHOD: str = "copy"  # copy (binary COPY over DATABASE_URL_SYNC) or postgrest
+    CHUNK_COPY_BATCH_SIZE: int = 500  # Rows encoded per COPY statement
+    BOILERPLATE_MIN_PAGES: int = 3  # PDF header/footer lines on this many pages are stripped, 0 disables
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 3  # SimHash bits for a chunk to count as a duplicate (at most 7), -1 disables
+
     # Application
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
@@ -36,15 +72,46 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE_MB: int = 50
     ALLOWED_FILE_TYPES: str = "pdf,txt,md,docx"
 
+    # Chunking (changing these marks existing materials for the re-chunk backfill)
+    CHUNK_MIN_TOKENS: int = 500
+    CHUNK_MAX_TOKENS: int = 1000
+    CHUNK_OVERLAP_TOKENS: int = 100
+    RECHUNK_BACKFILL_BATCH_SIZE: int = 20  # Materials queued per backfill step
+    RECHUNK_MATERIALS_PER_MINUTE: int = 10  # Backfill throttle
+
+    # PDF Extraction
+    PDF_BACKEND: str = "auto"  # auto, pymupdf, pypdfium2 or pypdf2
+    PDF_EXTRACTION_WORKERS: int = 0  # Processes for page extraction, < 2 extracts serially
+    PDF_PARALLEL_MIN_PAGES: int = 50  # Smaller PDFs are not worth the process start-up
+    PDF_PAGES_PER_TASK: int = 8  # Minimum pages handed to a worker at once
+
+    # Notebook Search
+    SEARCH_TRIGRAM_THRESHOLD: float = 0.5  # pg_trgm word_similarity needed for a fuzzy match
+    HYBRID_CANDIDATES: int = 50  # Chunks fetched by each hybrid retrieval leg before fusion
+    HYBRID_RRF_K: int = 60  # Reciprocal rank fusion damping constant
+
     # Rate Limiting
     RATE_LIMIT_QUESTIONS_PER_MINUTE: int = 10
     RATE_LIMIT_UPLOADS_PER_HOUR: int = 5
 
+    @field_validator("NEAR_DUPLICATE_MAX_DISTANCE")
+    @classmethod
+    def check_near_duplicate_max_distance(cls, value: int) -> int:
+        """SimHash lookups split fingerprints into distance + 1 bands of at least 8 bits"""
+        if value > 7:
+            raise ValueError("NEAR_DUPLICATE_MAX_DISTANCE must be at most 7")
+        return value
+
     @property
     def cors_origins_list(self) -> list[str]:
         """Get CORS origins as a list"""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
 
+    @property
+    def embedding_previous_models_list(self) -> list[str]:
+        """Get previous embedding models as a list"""
+        return [m.strip() for m in self.EMBEDDING_PREVIOUS_MODELS.split(",") if m.strip()]
+
     @property
     def allowed_file_types_list(self) -> list[str]:
         """Get allowed file types as a list"""
@@ -8,6 +8,7 @@ from app.models.user import User  # noqa: F401
 from app.models.notebook import Notebook  # noqa: F401
 from app.models.material import Material  # noqa: F401
 from app.models.chunk import Chunk  # noqa: F401
+from app.models.embedding_cache import EmbeddingCacheEntry  # noqa: F401
 from app.models.conversation import Conversation, Message  # noqa: F401
 from app.models.study import StudySession, StudyQuestion, StudyResponse  # noqa: F401
 from app.models.experiment import Experiment, ExperimentEvent  # noqa: F401
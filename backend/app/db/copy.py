@@ -0,0 +1,94 @@
+"""Binary COPY encoding for bulk-loading chunks into Postgres"""
+import io
+import json
+import struct
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from pgvector.utils import to_db_binary
+
+
+# Binary COPY framing (https://www.postgresql.org/docs/current/sql-copy.html)
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+_COPY_TRAILER = struct.pack("!h", -1)
+_NULL_FIELD = struct.pack("!i", -1)
+
+# Postgres timestamps count microseconds from 2000-01-01
+_POSTGRES_EPOCH = datetime(2000, 1, 1)
+
+# jsonb binary representation is a version byte followed by the JSON text
+_JSONB_VERSION = b"\x01"
+
+CHUNK_COPY_COLUMNS = (
+    "id", "material_id", "content", "embedding", "chunk_index", "metadata",
+    "chunker_version", "embedding_model", "created_at"
+)
+
+CHUNK_COPY_SQL = (
+    f"COPY chunks ({', '.join(CHUNK_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT BINARY)"
+)
+
+ChunkRow = Tuple[str, Sequence[float], int, Optional[Dict[str, Any]]]
+
+
+def _field(data: Optional[bytes]) -> bytes:
+    if data is None:
+        return _NULL_FIELD
+    return struct.pack("!i", len(data)) + data
+
+
+def _timestamp(value: datetime) -> bytes:
+    delta = value - _POSTGRES_EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return struct.pack("!q", microseconds)
+
+
+def encode_chunk_rows(
+    material_id: str,
+    rows: Iterable[ChunkRow],
+    chunker_version: Optional[str] = None,
+    embedding_model: Optional[str] = None,
+    created_at: Optional[datetime] = None
+) -> bytes:
+    """
+    Encode chunk rows as a binary COPY payload for CHUNK_COPY_SQL
+
+    Embeddings use pgvector's binary format (dimension header + big-endian
+    float32), so vectors are neither formatted as text nor parsed by Postgres.
+
+    Args:
+        material_id: UUID of the material the chunks belong to
+        rows: (content, embedding, chunk_index, metadata) tuples
+        chunker_version: Chunker configuration that produced every row
+        embedding_model: Embedding model that produced every row's embedding
+        created_at: Timestamp for every row (defaults to now, UTC)
+
+    Returns:
+        Complete COPY payload including header and trailer
+    """
+    material_uuid = uuid.UUID(str(material_id)).bytes
+    version = chunker_version.encode("utf-8") if chunker_version is not None else None
+    model = embedding_model.encode("utf-8") if embedding_model is not None else None
+    timestamp = _timestamp(created_at or datetime.utcnow())
+    field_count = struct.pack("!h", len(CHUNK_COPY_COLUMNS))
+
+    buffer = io.BytesIO()
+    buffer.write(_COPY_HEADER)
+
+    for content, embedding, chunk_index, metadata in rows:
+        buffer.write(field_count)
+        buffer.write(_field(uuid.uuid4().bytes))
+        buffer.write(_field(material_uuid))
+        buffer.write(_field(content.encode("utf-8")))
+        buffer.write(_field(to_db_binary(embedding)))
+        buffer.write(_field(struct.pack("!i", chunk_index)))
+        buffer.write(_field(
+            _JSONB_VERSION + json.dumps(metadata).encode("utf-8") if metadata is not None else None
+        ))
+        buffer.write(_field(version))
+        buffer.write(_field(model))
+        buffer.write(_field(timestamp))
+
+    buffer.write(_COPY_TRAILER)
+    return buffer.getvalue()
@@ -3,6 +3,7 @@ from app.models.user import User, UserArchetype
 from app.models.notebook import Notebook
 from app.models.material import Material, ProcessingStatus
 from app.models.chunk import Chunk
+from app.models.embedding_cache import EmbeddingCacheEntry
 from app.models.conversation import Conversation, Message, MessageRole
 from app.models.study import StudySession, StudyQuestion, StudyResponse, QuestionType
 from app.models.experiment import Experiment, ExperimentEvent
@@ -14,6 +15,7 @@ __all__ = [
     "Material",
     "ProcessingStatus",
     "Chunk",
+    "EmbeddingCacheEntry",
     "Conversation",
     "Message",
     "MessageRole",
@@ -1,7 +1,7 @@
 """Chunk model"""
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import Column, Computed, String, DateTime, ForeignKey, Integer, Text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from sqlalchemy.orm import relationship
 from pgvector.sqlalchemy import Vector
 import uuid
@@ -15,10 +15,14 @@ class Chunk(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     material_id = Column(UUID(as_uuid=True), ForeignKey("materials.id", ondelete="CASCADE"), nullable=False, index=True)
+    notebook_id = Column(UUID(as_uuid=True), ForeignKey("notebooks.id", ondelete="CASCADE"), nullable=False, index=True)  # Copied from the material by trigger
     content = Column(Text, nullable=False)
     embedding = Column(Vector(768), nullable=True)  # Gemini embedding dimension
     chunk_index = Column(Integer, nullable=False)
     chunk_metadata = Column("metadata", JSONB, nullable=True)  # page_number, section_header, etc.
+    chunker_version = Column(String, nullable=True)  # TextChunkingService.config_version that produced the chunk
+    embedding_model = Column(String, nullable=True)  # Embedding model that produced the embedding
+    content_tsv = Column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True))  # GIN-indexed
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -26,5 +30,6 @@ class Chunk(Base):
 
     # Index for vector similarity search
     __table_args__ = (
-        # Will be created in migration with: CREATE INDEX ON chunks USING ivfflat (embedding vector_cosine_ops)
+        # No global embedding index (dropped by migration 011): notebooks past
+        # VECTOR_EXACT_SCAN_MAX_CHUNKS get a partial HNSW index (app/tasks/vector_indexes.py)
     )
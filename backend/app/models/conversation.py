@@ -1,8 +1,8 @@
 """Conversation and Message models"""
 import enum
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Float, Enum
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import Column, Computed, String, DateTime, ForeignKey, Text, Float, Enum
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
 from sqlalchemy.orm import relationship
 import uuid
 
@@ -38,6 +38,7 @@ class Message(Base):
     content = Column(Text, nullable=False)
     citations = Column(JSONB, nullable=True)  # Array of chunk references
     grounding_score = Column(Float, nullable=True)
+    content_tsv = Column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True))  # GIN-indexed
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
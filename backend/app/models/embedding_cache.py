@@ -0,0 +1,17 @@
+"""Embedding cache model"""
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime
+from pgvector.sqlalchemy import Vector
+
+from app.db.base import Base
+
+
+class EmbeddingCacheEntry(Base):
+    """Embedding cache entry - content-addressed embeddings shared across materials"""
+    __tablename__ = "embedding_cache"
+
+    model_name = Column(String, primary_key=True)
+    task_type = Column(String, primary_key=True)
+    content_hash = Column(String(64), primary_key=True)  # sha256 of normalized text
+    embedding = Column(Vector(), nullable=False)  # Dimension depends on model_name
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -28,6 +28,8 @@ class Material(Base):
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String, nullable=False)
     processing_status = Column(Enum(ProcessingStatus), default=ProcessingStatus.PENDING, nullable=False, index=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the uploaded file
+    processing_signature = Column(String, nullable=True)  # Chunker/embedding config of the chunks
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -87,6 +87,7 @@ class SearchResultResponse(BaseModel):
     content: str
     highlight: str
     created_at: datetime
+    rank: Optional[float] = None  # Relevance score, higher is better
 
 
 class SearchResponse(BaseModel):
@@ -94,3 +95,24 @@ class SearchResponse(BaseModel):
     results: list[SearchResultResponse]
     total: int
     query: str
+
+
+class RetrievedChunkResponse(BaseModel):
+    """Hybrid retrieval chunk schema"""
+    id: str
+    material_id: str
+    content: str
+    chunk_index: int
+    metadata: Optional[dict] = None
+    score: float  # Reciprocal rank fusion score
+    semantic_rank: Optional[int] = None  # 1-based rank in the vector results
+    lexical_rank: Optional[int] = None  # 1-based rank in the full-text results
+    similarity: Optional[float] = None  # Cosine similarity to the query
+    text_rank: Optional[float] = None  # ts_rank_cd score
+
+
+class RetrievalResponse(BaseModel):
+    """Hybrid retrieval response schema"""
+    chunks: list[RetrievedChunkResponse]
+    total: int
+    query: str
@@ -1,9 +1,12 @@
 """Embedding generation service using Gemini API"""
 import logging
+import threading
 import time
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
 import google.generativeai as genai
 from app.core.config import settings
+from app.services.embedding_cache import LRUTTLCache, content_hash, query_embedding_cache
 
 
 logger = logging.getLogger(__name__)
@@ -14,6 +17,112 @@ class EmbeddingError(Exception):
     pass
 
 
+class TokenBucketRateLimiter:
+    """
+    Thread-safe token bucket limiter for provider request and token quotas
+    
+    Two buckets refill continuously: one holds API requests per minute, the
+    other holds input tokens per minute. A limit of 0 disables that bucket.
+    Gemini counts every text of a batchEmbedContents call as a request, so a
+    batch is charged one request per text.
+    """
+    
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize rate limiter with full buckets
+        
+        Args:
+            requests_per_minute: Request quota (0 for unlimited)
+            tokens_per_minute: Token quota (0 for unlimited)
+            clock: Monotonic clock, injectable for tests
+            sleep: Sleep function, injectable for tests
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute)
+        self._last_refill = clock()
+        self._paused_until = 0.0
+    
+    def acquire(self, tokens: int = 0, requests: int = 1) -> None:
+        """
+        Block until a call carrying the given requests and tokens fits in the quota
+        
+        Args:
+            tokens: Estimated input tokens for the call
+            requests: Requests the provider counts for the call (texts in a batch)
+        """
+        # A call larger than the whole bucket would never fit; let it drain the bucket
+        if self.requests_per_minute:
+            requests = min(requests, self.requests_per_minute)
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+        
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                
+                wait = max(0.0, self._paused_until - now)
+                
+                if self.requests_per_minute and self._available_requests < requests:
+                    deficit = requests - self._available_requests
+                    wait = max(wait, deficit * 60.0 / self.requests_per_minute)
+                
+                if self.tokens_per_minute and self._available_tokens < tokens:
+                    deficit = tokens - self._available_tokens
+                    wait = max(wait, deficit * 60.0 / self.tokens_per_minute)
+                
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._available_requests -= requests
+                    if self.tokens_per_minute:
+                        self._available_tokens -= tokens
+                    return
+            
+            self._sleep(wait)
+    
+    def pause(self, seconds: float) -> None:
+        """
+        Hold back all callers for a while, e.g. after the provider rejected a request
+        
+        Args:
+            seconds: How long no new request may start
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+    
+    def _refill(self, now: float) -> None:
+        """Top up both buckets for the time elapsed since the last refill"""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        
+        if elapsed <= 0:
+            return
+        
+        if self.requests_per_minute:
+            self._available_requests = min(
+                float(self.requests_per_minute),
+                self._available_requests + elapsed * self.requests_per_minute / 60.0
+            )
+        
+        if self.tokens_per_minute:
+            self._available_tokens = min(
+                float(self.tokens_per_minute),
+                self._available_tokens + elapsed * self.tokens_per_minute / 60.0
+            )
+
+
 class EmbeddingService:
     """Service for generating embeddings using Gemini API"""
     
@@ -28,14 +137,30 @@ class EmbeddingService:
         else:
             genai.configure(api_key=settings.GEMINI_API_KEY)
         
-        # Gemini embedding model
-        self.model_name = "models/embedding-001"
+        # Gemini embedding model; stored chunks are tagged with it
+        self.model_name = settings.EMBEDDING_MODEL
         self.embedding_dimension = 768
+        self.document_task_type = "retrieval_document"
+        self.query_task_type = "retrieval_query"
         
         # Rate limiting configuration
         self.max_retries = 3
         self.base_retry_delay = 1.0  # seconds
-        self.batch_size = 100  # Max texts per batch
+        self.batch_size = 100  # Max texts per batch request (Gemini API limit)
+        
+        # Concurrency configuration
+        self.max_concurrency = max(1, settings.EMBEDDING_MAX_CONCURRENCY)
+        self.rate_limiter = TokenBucketRateLimiter(
+            requests_per_minute=settings.EMBEDDING_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.EMBEDDING_TOKENS_PER_MINUTE
+        )
+        
+        # Query embedding caches: in-process LRU first, then optional shared Redis
+        self.query_cache = LRUTTLCache(
+            max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+        )
+        self.shared_query_cache = query_embedding_cache
     
     def generate_embedding(self, text: str) -> List[float]:
         """
@@ -55,11 +180,13 @@ class EmbeddingService:
         if not text or not text.strip():
             raise EmbeddingError("Cannot generate embedding for empty text")
         
+        self.rate_limiter.acquire(self._estimate_tokens([text]))
+        
         try:
             result = genai.embed_content(
                 model=self.model_name,
                 content=text,
-                task_type="retrieval_document"
+                task_type=self.document_task_type
             )
             
             embedding = result['embedding']
@@ -109,25 +236,35 @@ class EmbeddingService:
         
         embeddings: List[Optional[List[float]]] = [None] * len(texts)
         
-        # Process in batches
-        for batch_start in range(0, len(valid_texts), self.batch_size):
-            batch_end = min(batch_start + self.batch_size, len(valid_texts))
-            batch_texts = valid_texts[batch_start:batch_end]
-            batch_indices = valid_indices[batch_start:batch_end]
-            
-            logger.info(
-                f"Processing embedding batch {batch_start // self.batch_size + 1}: "
-                f"{len(batch_texts)} texts"
+        # Split into batches, remembering where each text came from
+        batches = [
+            (
+                valid_texts[batch_start:batch_start + self.batch_size],
+                valid_indices[batch_start:batch_start + self.batch_size]
             )
-            
-            batch_embeddings = self._generate_batch_with_retry(
-                batch_texts,
-                retry_on_failure
-            )
-            
-            # Map results back to original indices
-            for i, embedding in enumerate(batch_embeddings):
-                original_index = batch_indices[i]
+            for batch_start in range(0, len(valid_texts), self.batch_size)
+        ]
+        
+        logger.info(
+            f"Embedding {len(valid_texts)} texts in {len(batches)} batches "
+            f"(up to {self.max_concurrency} in flight)"
+        )
+        
+        def run_batch(batch_texts: List[str]) -> List[Optional[List[float]]]:
+            return self._generate_batch_with_retry(batch_texts, retry_on_failure)
+        
+        if self.max_concurrency == 1 or len(batches) == 1:
+            batch_results = [run_batch(batch_texts) for batch_texts, _ in batches]
+        else:
+            workers = min(self.max_concurrency, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                batch_results = list(
+                    executor.map(run_batch, [batch_texts for batch_texts, _ in batches])
+                )
+        
+        # Map results back to original indices
+        for (_, batch_indices), batch_embeddings in zip(batches, batch_results):
+            for original_index, embedding in zip(batch_indices, batch_embeddings):
                 embeddings[original_index] = embedding
         
         # Count successes and failures
@@ -152,52 +289,111 @@ class EmbeddingService:
         """
         Generate embeddings for a batch with retry logic
         
+        Sends the whole batch in a single API request. If the batched request
+        keeps failing, falls back to embedding each text individually so that
+        one bad input does not fail its neighbours.
+        
         Args:
             texts: Batch of texts to embed
             retry_on_failure: Whether to retry on errors
             
         Returns:
-            List of embeddings (None for failures)
+            List of embeddings (None for failures), aligned with texts
         """
+        max_attempts = self.max_retries if retry_on_failure else 1
+        
+        for attempt in range(max_attempts):
+            try:
+                return self._embed_batch(texts)
+                
+            except EmbeddingError as e:
+                if attempt == max_attempts - 1:
+                    logger.error(
+                        f"Batch embedding failed after {attempt + 1} attempts, "
+                        f"falling back to per-text requests: {e}"
+                    )
+                    break
+                
+                # Exponential backoff, shared with every batch in flight so
+                # concurrent requests stop hammering a throttled provider
+                delay = self.base_retry_delay * (2 ** attempt)
+                logger.warning(
+                    f"Batch embedding failed (attempt {attempt + 1}), "
+                    f"retrying in {delay}s: {e}"
+                )
+                self.rate_limiter.pause(delay)
+        
         embeddings: List[Optional[List[float]]] = []
         
         for text in texts:
-            embedding = None
-            last_error = None
-            
-            for attempt in range(self.max_retries if retry_on_failure else 1):
-                try:
-                    embedding = self.generate_embedding(text)
-                    break  # Success
-                    
-                except EmbeddingError as e:
-                    last_error = e
-                    
-                    if not retry_on_failure or attempt == self.max_retries - 1:
-                        # Don't retry or max retries reached
-                        logger.error(
-                            f"Embedding generation failed after {attempt + 1} attempts: {e}"
-                        )
-                        break
-                    
-                    # Exponential backoff
-                    delay = self.base_retry_delay * (2 ** attempt)
-                    logger.warning(
-                        f"Embedding generation failed (attempt {attempt + 1}), "
-                        f"retrying in {delay}s: {e}"
-                    )
-                    time.sleep(delay)
+            try:
+                embeddings.append(self.generate_embedding(text))
+            except EmbeddingError as e:
+                logger.error(f"Embedding generation failed for single text: {e}")
+                embeddings.append(None)
+        
+        return embeddings
+    
+    def _embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed a batch of texts with one batched API request
+        
+        Args:
+            texts: Texts to embed (at most batch_size)
+            
+        Returns:
+            List of embeddings aligned with texts; None for any item whose
+            embedding came back with the wrong dimension
             
-            embeddings.append(embedding)
+        Raises:
+            EmbeddingError: If the request fails or returns the wrong number of embeddings
+        """
+        self.rate_limiter.acquire(self._estimate_tokens(texts), requests=len(texts))
+        
+        try:
+            result = genai.embed_content(
+                model=self.model_name,
+                content=list(texts),
+                task_type=self.document_task_type
+            )
+        except Exception as e:
+            raise EmbeddingError(f"Failed to generate batch embeddings: {str(e)}")
+        
+        batch_embeddings = result['embedding']
+        
+        if len(batch_embeddings) != len(texts):
+            raise EmbeddingError(
+                f"Unexpected batch size: {len(batch_embeddings)} embeddings "
+                f"for {len(texts)} texts"
+            )
+        
+        embeddings: List[Optional[List[float]]] = []
+        
+        for i, embedding in enumerate(batch_embeddings):
+            if len(embedding) != self.embedding_dimension:
+                logger.error(
+                    f"Unexpected embedding dimension for batch item {i}: {len(embedding)} "
+                    f"(expected {self.embedding_dimension})"
+                )
+                embeddings.append(None)
+            else:
+                embeddings.append(list(embedding))
         
         return embeddings
     
-    def generate_query_embedding(self, query: str) -> List[float]:
+    @staticmethod
+    def _estimate_tokens(texts: List[str]) -> int:
+        """Rough token estimate for quota accounting (~4 characters per token)"""
+        return sum(len(text) // 4 + 1 for text in texts)
+    
+    def generate_query_embedding(self, query: str, model_name: Optional[str] = None) -> List[float]:
         """
         Generate embedding for a search query
         
         Args:
             query: Search query text
+            model_name: Model to embed with (defaults to the current model);
+                queries must use the model of the chunks they are compared with
             
         Returns:
             Query embedding vector
@@ -205,16 +401,35 @@ class EmbeddingService:
         Raises:
             EmbeddingError: If embedding generation fails
             
-        Note: Uses different task_type for queries vs documents
+        Note: Uses different task_type for queries vs documents. Results are
+        cached by model and normalized query text, so repeated questions skip
+        the network.
+        
+        Requirements: 12.1, 15.6
         """
         if not query or not query.strip():
             raise EmbeddingError("Cannot generate embedding for empty query")
         
+        model_name = model_name or self.model_name
+        cache_key = (model_name, content_hash(query))
+        
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        if self.shared_query_cache is not None:
+            cached = self.shared_query_cache.get_many(
+                model_name, self.query_task_type, [query]
+            )[0]
+            if cached is not None:
+                self.query_cache.set(cache_key, tuple(cached))
+                return cached
+        
         try:
             result = genai.embed_content(
-                model=self.model_name,
+                model=model_name,
                 content=query,
-                task_type="retrieval_query"
+                task_type=self.query_task_type
             )
             
             embedding = result['embedding']
@@ -225,13 +440,19 @@ class EmbeddingService:
                     f"(expected {self.embedding_dimension})"
                 )
             
-            return embedding
-            
         except Exception as e:
             logger.error(f"Query embedding generation failed: {str(e)}")
             raise EmbeddingError(f"Failed to generate query embedding: {str(e)}")
+        
+        self.query_cache.set(cache_key, tuple(embedding))
+        
+        if self.shared_query_cache is not None:
+            self.shared_query_cache.set_many(
+                model_name, self.query_task_type, [query], [embedding]
+            )
+        
+        return embedding
 
 
 # Singleton instance
 embedding_service = EmbeddingService()
-
@@ -0,0 +1,332 @@
+"""Content-addressed embedding cache backed by Redis with a Postgres fallback"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Dict, Any, Tuple
+
+import redis
+from supabase import Client
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text so that trivially different copies share a cache key
+
+    Applies Unicode NFC normalization, collapses whitespace runs and strips
+    leading/trailing whitespace. Case is preserved because it affects embeddings.
+    """
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of normalized text"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model_name, task_type, sha256(normalized text))
+
+    Redis is checked first; misses fall through to the `embedding_cache` table.
+    Cache failures are logged and treated as misses so they never fail ingestion.
+    """
+
+    # Hashes per PostgREST lookup: the filter travels in the GET query string
+    # (~70 bytes per hash), which gateways reject beyond a few KB
+    POSTGRES_LOOKUP_BATCH_SIZE = 50
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        supabase: Optional[Client] = None,
+        ttl_seconds: int = 30 * 24 * 60 * 60
+    ):
+        """
+        Initialize embedding cache
+
+        Args:
+            redis_client: Redis client for the hot tier (None disables it)
+            supabase: Supabase client for the Postgres tier (None disables it)
+            ttl_seconds: Expiry for Redis entries
+
+        Requirements: 15.2, 15.7
+        """
+        self.redis = redis_client
+        self.supabase = supabase
+        self.ttl_seconds = ttl_seconds
+        self.table_name = "embedding_cache"
+
+    @staticmethod
+    def make_key(model_name: str, task_type: str, text_hash: str) -> str:
+        """Build the Redis key for a cache entry"""
+        return f"embedding:{model_name}:{task_type}:{text_hash}"
+
+    def get_many(
+        self,
+        model_name: str,
+        task_type: str,
+        texts: List[str]
+    ) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings for texts
+
+        Args:
+            model_name: Embedding model name
+            task_type: Embedding task type (retrieval_document, retrieval_query)
+            texts: Texts to look up
+
+        Returns:
+            List aligned with texts: cached embedding or None for a miss
+        """
+        hashes = [content_hash(text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        if not texts:
+            return results
+
+        # Tier 1: Redis
+        if self.redis is not None:
+            try:
+                keys = [self.make_key(model_name, task_type, h) for h in hashes]
+                for i, value in enumerate(self.redis.mget(keys)):
+                    if value is not None:
+                        results[i] = self._decode(value)
+            except Exception as e:
+                logger.warning(f"Embedding cache Redis lookup failed: {e}")
+
+        # Tier 2: Postgres, only for Redis misses
+        missing = sorted({hashes[i] for i, result in enumerate(results) if result is None})
+
+        if missing and self.supabase is not None:
+            found: Dict[str, List[float]] = {}
+
+            for start in range(0, len(missing), self.POSTGRES_LOOKUP_BATCH_SIZE):
+                try:
+                    response = self.supabase.table(self.table_name).select(
+                        "content_hash, embedding"
+                    ).eq("model_name", model_name).eq("task_type", task_type).in_(
+                        "content_hash", missing[start:start + self.POSTGRES_LOOKUP_BATCH_SIZE]
+                    ).execute()
+                except Exception as e:
+                    logger.warning(f"Embedding cache Postgres lookup failed: {e}")
+                    continue
+
+                for row in response.data or []:
+                    found[row["content_hash"]] = self._parse_vector(row["embedding"])
+
+            for i, text_hash in enumerate(hashes):
+                if results[i] is None and text_hash in found:
+                    results[i] = found[text_hash]
+
+            # Promote Postgres hits into Redis
+            if found:
+                self._set_redis(model_name, task_type, found)
+
+        return results
+
+    def set_many(
+        self,
+        model_name: str,
+        task_type: str,
+        texts: List[str],
+        embeddings: List[Optional[List[float]]]
+    ) -> None:
+        """
+        Store embeddings for texts in both cache tiers
+
+        Args:
+            model_name: Embedding model name
+            task_type: Embedding task type
+            texts: Embedded texts
+            embeddings: Embeddings aligned with texts (None entries are skipped)
+        """
+        entries: Dict[str, List[float]] = {
+            content_hash(text): embedding
+            for text, embedding in zip(texts, embeddings)
+            if embedding is not None
+        }
+
+        if not entries:
+            return
+
+        self._set_redis(model_name, task_type, entries)
+
+        if self.supabase is not None:
+            try:
+                rows = [
+                    {
+                        "model_name": model_name,
+                        "task_type": task_type,
+                        "content_hash": text_hash,
+                        "embedding": embedding
+                    }
+                    for text_hash, embedding in entries.items()
+                ]
+                self.supabase.table(self.table_name).upsert(
+                    rows,
+                    on_conflict="model_name,task_type,content_hash"
+                ).execute()
+            except Exception as e:
+                logger.warning(f"Embedding cache Postgres write failed: {e}")
+
+    def _set_redis(
+        self,
+        model_name: str,
+        task_type: str,
+        entries: Dict[str, List[float]]
+    ) -> None:
+        """Write entries to Redis with expiry"""
+        if self.redis is None:
+            return
+
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for text_hash, embedding in entries.items():
+                pipeline.set(
+                    self.make_key(model_name, task_type, text_hash),
+                    self._encode(embedding),
+                    ex=self.ttl_seconds
+                )
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache Redis write failed: {e}")
+
+    @staticmethod
+    def _encode(embedding: List[float]) -> bytes:
+        """Pack an embedding as float32 bytes (pgvector precision)"""
+        return array('f', embedding).tobytes()
+
+    @staticmethod
+    def _decode(value: bytes) -> List[float]:
+        """Unpack float32 bytes into an embedding"""
+        vector = array('f')
+        vector.frombytes(value)
+        return vector.tolist()
+
+    @staticmethod
+    def _parse_vector(value: Any) -> List[float]:
+        """Parse a pgvector value returned by PostgREST ("[0.1,0.2,...]")"""
+        if isinstance(value, str):
+            return [float(x) for x in json.loads(value)]
+        return [float(x) for x in value]
+
+
+class LRUTTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries also expire after a TTL
+
+    Used for query embeddings, where the same question is often asked
+    repeatedly within a notebook session.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize cache
+
+        Args:
+            max_size: Maximum number of entries (0 disables the cache)
+            ttl_seconds: Seconds an entry stays valid after being stored
+            clock: Monotonic clock, injectable for tests
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _create_embedding_cache() -> EmbeddingCache:
+    """Build the shared cache from settings"""
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return EmbeddingCache()
+
+    # Redis.from_url connects lazily, so an unavailable Redis only costs cache misses
+    redis_client = redis.Redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=2,
+        socket_connect_timeout=2
+    )
+
+    supabase: Optional[Client] = None
+    try:
+        from app.services.auth import auth_service
+        supabase = auth_service.supabase
+    except Exception as e:
+        logger.warning(f"Embedding cache Postgres tier disabled: {e}")
+
+    return EmbeddingCache(
+        redis_client=redis_client,
+        supabase=supabase,
+        ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS
+    )
+
+
+def _create_query_embedding_cache() -> Optional[EmbeddingCache]:
+    """Build the optional Redis tier shared by API workers for query embeddings"""
+    if not settings.QUERY_EMBEDDING_CACHE_REDIS:
+        return None
+
+    redis_client = redis.Redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=0.5,
+        socket_connect_timeout=0.5
+    )
+
+    return EmbeddingCache(
+        redis_client=redis_client,
+        ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+    )
+
+
+# Singleton instances
+embedding_cache = _create_embedding_cache()
+query_embedding_cache = _create_query_embedding_cache()
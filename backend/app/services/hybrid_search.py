@@ -0,0 +1,140 @@
+"""Hybrid semantic and lexical chunk retrieval"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from supabase import Client
+
+from app.core.config import settings
+from app.services.auth import auth_service
+from app.services.vector_search import vector_search_service
+
+
+logger = logging.getLogger(__name__)
+
+
+class HybridSearchError(Exception):
+    """Base exception for hybrid search errors"""
+    pass
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[dict]], k: int = 60) -> List[dict]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion
+
+    Each result scores sum(1 / (k + rank)) over the lists it appears in (rank
+    starting at 1), so items ranked well by several retrievers rise to the top
+    without comparing their raw scores.
+
+    Args:
+        rankings: Result lists, best first; items are matched by "id"
+        k: Damping constant; larger values flatten the weight of top ranks
+
+    Returns:
+        Fused results, best first, each with "score" and a "ranks" list
+        holding its 1-based rank in every input list (None if absent)
+    """
+    fused: Dict[str, dict] = {}
+
+    for list_index, ranking in enumerate(rankings):
+        for rank, item in enumerate(ranking, start=1):
+            entry = fused.get(item["id"])
+            if entry is None:
+                entry = {**item, "score": 0.0, "ranks": [None] * len(rankings)}
+                fused[item["id"]] = entry
+            else:
+                entry.update({key: value for key, value in item.items() if key not in entry})
+            entry["score"] += 1.0 / (k + rank)
+            entry["ranks"][list_index] = rank
+
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+
+class HybridSearchService:
+    """
+    Notebook-scoped retrieval combining pgvector ANN and full-text search
+
+    The semantic leg embeds the query and runs match_chunks; the lexical leg
+    runs match_chunks_text. Both Supabase clients are blocking, so each leg runs
+    in a worker thread and retrieval takes as long as the slower leg. Results
+    are fused with reciprocal rank fusion. If one leg fails the other's results
+    are returned alone.
+    """
+
+    def __init__(self):
+        """Initialize with Supabase client and fusion settings"""
+        self.supabase: Client = auth_service.supabase
+        self.candidates = max(settings.HYBRID_CANDIDATES, 1)
+        self.rrf_k = settings.HYBRID_RRF_K
+
+    async def search(
+        self,
+        notebook_id: str,
+        query: str,
+        limit: int = 10,
+        ef_search: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Retrieve the chunks of a notebook most relevant to a query
+
+        Args:
+            notebook_id: Notebook UUID
+            query: Natural-language query
+            limit: Number of chunks to return
+            ef_search: HNSW candidate list size for the semantic leg
+
+        Returns:
+            Chunk dictionaries (id, material_id, content, chunk_index, metadata)
+            best first, with the fused "score", "semantic_rank"/"lexical_rank"
+            (None when a leg did not return the chunk), and the legs' raw
+            "similarity"/"text_rank" where available
+
+        Raises:
+            HybridSearchError: If both legs fail
+        """
+        candidates = max(self.candidates, limit)
+
+        semantic, lexical = await asyncio.gather(
+            asyncio.to_thread(
+                vector_search_service.match_text, notebook_id, query, candidates, ef_search
+            ),
+            asyncio.to_thread(self._match_text, notebook_id, query, candidates),
+            return_exceptions=True
+        )
+
+        if isinstance(semantic, Exception) and isinstance(lexical, Exception):
+            logger.error(f"Hybrid search failed for notebook {notebook_id}: {semantic}; {lexical}")
+            raise HybridSearchError(f"Failed to search chunks: {semantic}")
+
+        for leg, result in (("semantic", semantic), ("lexical", lexical)):
+            if isinstance(result, Exception):
+                logger.warning(f"Hybrid search {leg} leg failed for notebook {notebook_id}: {result}")
+
+        fused = reciprocal_rank_fusion([
+            [] if isinstance(semantic, Exception) else semantic,
+            [] if isinstance(lexical, Exception) else lexical,
+        ], k=self.rrf_k)
+
+        results = []
+        for entry in fused[:limit]:
+            semantic_rank, lexical_rank = entry.pop("ranks")
+            if "rank" in entry:
+                entry["text_rank"] = entry.pop("rank")
+            entry["semantic_rank"] = semantic_rank
+            entry["lexical_rank"] = lexical_rank
+            results.append(entry)
+
+        return results
+
+    def _match_text(self, notebook_id: str, query: str, limit: int) -> list[dict]:
+        """Full-text leg: chunks ranked by ts_rank_cd (match_chunks_text)"""
+        response = self.supabase.rpc("match_chunks_text", {
+            "match_notebook_id": notebook_id,
+            "search_query": query,
+            "match_count": limit
+        }).execute()
+        return response.data or []
+
+
+# Singleton instance
+hybrid_search_service = HybridSearchService()
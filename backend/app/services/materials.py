@@ -25,7 +25,8 @@ class MaterialService:
         filename: str,
         file_path: str,
         file_size: int,
-        mime_type: str
+        mime_type: str,
+        user_id: Optional[str] = None
     ) -> dict:
         """
         Create a material record after file upload and trigger processing
@@ -37,6 +38,7 @@ class MaterialService:
             file_path: Supabase storage path
             file_size: File size in bytes
             mime_type: MIME type of the file
+            user_id: Owner of the material, for fair queueing of bulk uploads
             
         Returns:
             Created material data
@@ -90,8 +92,18 @@ class MaterialService:
                 # Trigger background processing task (lazy import to avoid circular dependency)
                 try:
                     from app.tasks.material_processing import process_material
-                    process_material.delay(material_id)
-                    logger.info(f"Triggered background processing for material {material_id}")
+                    from app.tasks.routing import material_queue_router
+                    
+                    # Route by size and the user's pending uploads so small
+                    # materials are not stuck behind large ones or bulk imports
+                    route = material_queue_router.route(
+                        material_id, file_size, mime_type, user_id=user_id
+                    )
+                    process_material.apply_async(args=[material_id], **route)
+                    logger.info(
+                        f"Triggered background processing for material {material_id} "
+                        f"(queue={route['queue']}, priority={route['priority']})"
+                    )
                 except Exception as task_error:
                     logger.error(f"Failed to trigger background task: {task_error}")
                     # Don't fail the request - material is created, processing can be retried
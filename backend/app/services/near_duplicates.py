@@ -0,0 +1,233 @@
+"""Near-duplicate suppression for material ingestion"""
+import hashlib
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from app.services.text_chunking import TextChunk
+
+
+logger = logging.getLogger(__name__)
+
+
+# Page marker at the start of a page yielded by PDF extraction
+_PAGE_START = re.compile(r'^(\s*\[PAGE \d+\]\n)')
+
+_DIGITS = re.compile(r'\d+')
+_WHITESPACE = re.compile(r'\s+')
+_WORD = re.compile(r'\w+')
+
+SIMHASH_BITS = 64
+
+# Hamming distance d is found by exact lookup on d + 1 bands (pigeonhole);
+# beyond 8 bands each band is too narrow for the lookup to narrow anything
+MAX_DISTANCE = 7
+
+
+def _normalize_line(line: str) -> str:
+    """Normalize a line for boilerplate matching; page numbers and dates become 0"""
+    return _WHITESPACE.sub(" ", _DIGITS.sub("0", line)).strip().lower()
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    64-bit SimHash of a text over word shingles
+
+    Texts sharing most of their shingles get fingerprints that differ in few
+    bits, so near-duplicates are found by Hamming distance.
+
+    Args:
+        text: Text to fingerprint
+        shingle_size: Words per shingle
+
+    Returns:
+        Fingerprint as an unsigned 64-bit integer
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    # Bit strings let zip/count tally each bit position in C rather than per bit in Python
+    bit_strings = [
+        format(
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"),
+            f"0{SIMHASH_BITS}b"
+        )
+        for shingle in shingles
+    ]
+    threshold = len(bit_strings) / 2
+
+    fingerprint = 0
+    for column in zip(*bit_strings):
+        fingerprint = fingerprint << 1 | (column.count("1") > threshold)
+    return fingerprint
+
+
+class SimHashIndex:
+    """
+    Fingerprints of kept chunks, searchable by Hamming distance
+
+    Fingerprints are split into max_distance + 1 bands; two fingerprints within
+    max_distance bits agree exactly on at least one band, so only fingerprints
+    sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int = 3):
+        """
+        Initialize index
+
+        Args:
+            max_distance: Largest Hamming distance counted as a near-duplicate
+
+        Raises:
+            ValueError: If max_distance exceeds MAX_DISTANCE
+        """
+        if max_distance > MAX_DISTANCE:
+            raise ValueError(f"max_distance must be at most {MAX_DISTANCE}, got {max_distance}")
+
+        self.max_distance = max_distance
+        self.band_count = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.band_count
+        self._bands: List[Dict[int, List[int]]] = [{} for _ in range(self.band_count)]
+
+    def _band_keys(self, fingerprint: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [fingerprint >> (i * self.band_bits) & mask for i in range(self.band_count)]
+
+    def find(self, fingerprint: int) -> bool:
+        """Whether a fingerprint within max_distance has been added"""
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            for candidate in band.get(key, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    return True
+        return False
+
+    def add(self, fingerprint: int) -> None:
+        """Add a fingerprint"""
+        for band, key in zip(self._bands, self._band_keys(fingerprint)):
+            band.setdefault(key, []).append(fingerprint)
+
+
+def strip_page_boilerplate(
+    segments: Iterable[str],
+    stats: Dict[str, int],
+    edge_lines: int = 2,
+    min_pages: int = 3,
+    sample_pages: int = 8
+) -> Iterator[str]:
+    """
+    Remove header/footer lines repeated across pages of an extracted document
+
+    Only the first and last edge_lines non-blank lines of each page (segments
+    starting with a [PAGE n] marker) are candidates, and at most half of a
+    page's lines. A line is boilerplate once
+    it has appeared at the edge of min_pages pages, comparing with digits
+    normalized so "Page 3 of 40" matches "Page 4 of 40". The first sample_pages
+    pages are held back so boilerplate is also removed from them. Segments
+    without a page marker pass through unchanged.
+
+    Args:
+        segments: Segments from TextExtractionService.extract_text_stream
+        stats: Counters; "boilerplate_lines_removed" is incremented
+        edge_lines: Lines at each end of a page that may be headers/footers
+        min_pages: Pages a line must appear on to be treated as boilerplate
+        sample_pages: Pages read ahead before the first page is released
+
+    Yields:
+        Segments with boilerplate lines removed
+    """
+    stats.setdefault("boilerplate_lines_removed", 0)
+    counts: Counter = Counter()
+    held: List[str] = []
+
+    def edges(segment: str) -> Tuple[str, List[str], Set[int]]:
+        """Split off the page prefix and find the indices of edge lines"""
+        match = _PAGE_START.match(segment)
+        prefix = match.group(1) if match else ""
+        lines = segment[len(prefix):].split("\n")
+        content = [i for i, line in enumerate(lines) if line.strip()]
+        # Leave the middle of short pages alone so a page is never stripped bare
+        count = min(edge_lines, len(content) // 2)
+        if count == 0:
+            return prefix, lines, set()
+        return prefix, lines, set(content[:count] + content[-count:])
+
+    def observe(segment: str) -> None:
+        _, lines, edge_indices = edges(segment)
+        counts.update({_normalize_line(lines[i]) for i in edge_indices})
+
+    def strip(segment: str) -> str:
+        prefix, lines, edge_indices = edges(segment)
+        removed = {
+            i for i in edge_indices
+            if len(lines[i]) < 200 and counts[_normalize_line(lines[i])] >= min_pages
+        }
+        if not removed:
+            return segment
+        stats["boilerplate_lines_removed"] += len(removed)
+        return prefix + "\n".join(line for i, line in enumerate(lines) if i not in removed)
+
+    for segment in segments:
+        if not _PAGE_START.match(segment):
+            if held:
+                held.append(segment)
+            else:
+                yield segment
+            continue
+
+        observe(segment)
+        if len(held) < sample_pages:
+            held.append(segment)
+            continue
+
+        if held:
+            for page in held:
+                yield strip(page) if _PAGE_START.match(page) else page
+            held = []
+        yield strip(segment)
+
+    for page in held:
+        yield strip(page) if _PAGE_START.match(page) else page
+
+
+def drop_near_duplicate_chunks(
+    chunks: Iterable[TextChunk],
+    stats: Dict[str, int],
+    max_distance: int = 3
+) -> Iterator[TextChunk]:
+    """
+    Drop chunks that nearly duplicate an earlier chunk of the same material
+
+    Kept chunks are renumbered so chunk indices stay contiguous. The result is
+    deterministic for the same input, so checkpointed progress still lines up
+    with the stream on retries.
+
+    Args:
+        chunks: Chunks in document order
+        stats: Counters; "duplicate_chunks_removed" is incremented
+        max_distance: Largest SimHash Hamming distance counted as a duplicate
+
+    Yields:
+        Chunks that are not near-duplicates
+    """
+    stats.setdefault("duplicate_chunks_removed", 0)
+    index = SimHashIndex(max_distance)
+    chunk_index = 0
+
+    for chunk in chunks:
+        fingerprint = simhash(chunk.content)
+        if index.find(fingerprint):
+            stats["duplicate_chunks_removed"] += 1
+            continue
+
+        index.add(fingerprint)
+        chunk.chunk_index = chunk_index
+        chunk.metadata["chunk_index"] = chunk_index
+        chunk_index += 1
+        yield chunk
+
+    if stats["duplicate_chunks_removed"]:
+        logger.info(f"Dropped {stats['duplicate_chunks_removed']} near-duplicate chunks")
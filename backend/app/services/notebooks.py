@@ -1,10 +1,18 @@
 """Notebook service for CRUD operations"""
+import logging
 from typing import Optional
 from datetime import datetime
 from fastapi import HTTPException, status
 from supabase import Client
 from app.core.config import settings
 from app.services.auth import auth_service
+from app.services.hybrid_search import hybrid_search_service, HybridSearchError
+
+
+logger = logging.getLogger(__name__)
+
+
+SEARCH_MODES = ("fulltext", "trigram", "hybrid")
 
 
 class NotebookService:
@@ -196,6 +204,14 @@ class NotebookService:
             # Supabase doesn't return error for successful delete
             # If we got here, deletion was successful
             
+            # Drop the notebook's vector index (lazy import to avoid circular dependency)
+            try:
+                from app.tasks.material_processing import sync_vector_indexes
+                sync_vector_indexes.apply_async(kwargs={"notebook_id": notebook_id})
+            except Exception as task_error:
+                # The periodic full sync drops it later
+                logger.warning(f"Failed to queue vector index sync for notebook {notebook_id}: {task_error}")
+            
         except HTTPException:
             raise
         except Exception as e:
@@ -302,109 +318,75 @@ class NotebookService:
                 detail=f"Failed to fetch conversations: {str(e)}"
             )
 
-    async def search_notebook(self, notebook_id: str, query: str) -> list[dict]:
+    async def search_notebook(
+        self,
+        notebook_id: str,
+        query: str,
+        limit: int = 20,
+        mode: str = "fulltext"
+    ) -> list[dict]:
         """
         Search within notebook materials and conversations
         
+        Modes:
+        - fulltext: stemmed full-text query against the GIN-indexed tsvector
+          columns (search_notebook_content, migration 007), in web search
+          syntax ("quoted phrases", OR, -excluded)
+        - trigram: substring and typo-tolerant matching against pg_trgm GIN
+          indexes (search_notebook_trigram, migration 008), for identifiers
+          and partial words that stemming mangles
+        - hybrid: material chunks only, ranked by fusing vector similarity
+          with full-text rank (HybridSearchService); rank is the fused score
+        
         Args:
             notebook_id: Notebook UUID
             query: Search query string
+            limit: Maximum number of results
+            mode: "fulltext", "trigram" or "hybrid"
             
         Returns:
-            List of search result dictionaries
+            List of search result dictionaries, best match first, with
+            <mark>-highlighted snippets
+            
+        Raises:
+            HTTPException: If the mode is unknown or the search fails
             
         Requirements: 11.3
         """
+        if mode not in SEARCH_MODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Search mode must be one of: {', '.join(SEARCH_MODES)}"
+            )
+        
         try:
-            results = []
-            query_lower = query.lower()
-            
-            # Search in materials (chunks)
-            chunks_response = self.supabase.table("chunks").select(
-                "id, content, created_at, material_id, materials(filename)"
-            ).eq("materials.notebook_id", notebook_id).ilike("content", f"%{query}%").limit(20).execute()
-            
-            if chunks_response.data:
-                for chunk in chunks_response.data:
-                    # Create highlight with query context
-                    content = chunk["content"]
-                    content_lower = content.lower()
-                    query_pos = content_lower.find(query_lower)
-                    
-                    if query_pos >= 0:
-                        # Extract context around the query (50 chars before and after)
-                        start = max(0, query_pos - 50)
-                        end = min(len(content), query_pos + len(query) + 50)
-                        highlight = content[start:end]
-                        
-                        # Add ellipsis if truncated
-                        if start > 0:
-                            highlight = "..." + highlight
-                        if end < len(content):
-                            highlight = highlight + "..."
-                        
-                        # Highlight the query term
-                        highlight = highlight.replace(
-                            query,
-                            f"<mark>{query}</mark>",
-                            1  # Only highlight first occurrence in excerpt
-                        )
-                        
-                        material_filename = chunk.get("materials", {}).get("filename", "Unknown")
-                        
-                        results.append({
-                            "id": chunk["id"],
-                            "type": "material",
-                            "title": material_filename,
-                            "content": content[:200],  # First 200 chars
-                            "highlight": highlight,
-                            "created_at": chunk["created_at"]
-                        })
-            
-            # Search in messages
-            messages_response = self.supabase.table("messages").select(
-                "id, content, created_at, conversation_id, conversations(notebook_id)"
-            ).eq("conversations.notebook_id", notebook_id).ilike("content", f"%{query}%").limit(20).execute()
-            
-            if messages_response.data:
-                for message in messages_response.data:
-                    # Create highlight with query context
-                    content = message["content"]
-                    content_lower = content.lower()
-                    query_pos = content_lower.find(query_lower)
-                    
-                    if query_pos >= 0:
-                        # Extract context around the query
-                        start = max(0, query_pos - 50)
-                        end = min(len(content), query_pos + len(query) + 50)
-                        highlight = content[start:end]
-                        
-                        # Add ellipsis if truncated
-                        if start > 0:
-                            highlight = "..." + highlight
-                        if end < len(content):
-                            highlight = highlight + "..."
-                        
-                        # Highlight the query term
-                        highlight = highlight.replace(
-                            query,
-                            f"<mark>{query}</mark>",
-                            1
-                        )
-                        
-                        results.append({
-                            "id": message["id"],
-                            "type": "message",
-                            "title": "Conversation message",
-                            "content": content[:200],
-                            "highlight": highlight,
-                            "created_at": message["created_at"]
-                        })
-            
-            # Sort by relevance (for now, just by date)
-            results.sort(key=lambda x: x["created_at"], reverse=True)
-            
-            return results
+            if mode == "hybrid":
+                return await self._search_hybrid(notebook_id, query, limit)
+            
+            if mode == "trigram":
+                response = self.supabase.rpc("search_notebook_trigram", {
+                    "search_notebook_id": notebook_id,
+                    "search_query": query,
+                    "match_count": limit,
+                    "similarity_threshold": settings.SEARCH_TRIGRAM_THRESHOLD
+                }).execute()
+                
+                return [
+                    {
+                        **row,
+                        "content": row["content"][:200],
+                        "highlight": _highlight(row["content"], query)
+                    }
+                    for row in response.data or []
+                ]
+            
+            response = self.supabase.rpc("search_notebook_content", {
+                "search_notebook_id": notebook_id,
+                "search_query": query,
+                "match_count": limit
+            }).execute()
+            
+            return response.data or []
             
         except Exception as e:
             raise HTTPException(
@@ -412,6 +394,62 @@ class NotebookService:
                 detail=f"Failed to search notebook: {str(e)}"
             )
 
+    async def _search_hybrid(self, notebook_id: str, query: str, limit: int) -> list[dict]:
+        """Hybrid chunk retrieval shaped as search results, titled by material"""
+        try:
+            chunks = await hybrid_search_service.search(notebook_id, query, limit=limit)
+        except HybridSearchError as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to search notebook: {str(e)}"
+            )
+        
+        if not chunks:
+            return []
+        
+        material_ids = list({chunk["material_id"] for chunk in chunks})
+        response = self.supabase.table("materials").select(
+            "id, filename, created_at"
+        ).in_("id", material_ids).execute()
+        materials = {m["id"]: m for m in response.data or []}
+        
+        results = []
+        for chunk in chunks:
+            material = materials.get(chunk["material_id"])
+            if material is None:
+                continue  # Material deleted since the chunk was matched
+            results.append({
+                "id": chunk["id"],
+                "type": "material",
+                "title": material["filename"],
+                "content": chunk["content"][:200],
+                "highlight": _highlight(chunk["content"], query),
+                "created_at": material["created_at"],
+                "rank": chunk["score"]
+            })
+        
+        return results
+
+
+def _highlight(content: str, query: str, context: int = 50) -> str:
+    """Excerpt around the first case-insensitive occurrence of query, marked up"""
+    position = content.lower().find(query.lower())
+    if position < 0:
+        # Fuzzy match without the literal query: show the start of the content
+        return content[:2 * context] + ("..." if len(content) > 2 * context else "")
+    
+    start = max(0, position - context)
+    end = min(len(content), position + len(query) + context)
+    match_end = position + len(query)
+    
+    return (
+        ("..." if start > 0 else "")
+        + content[start:position]
+        + f"<mark>{content[position:match_end]}</mark>"
+        + content[match_end:end]
+        + ("..." if end < len(content) else "")
+    )
+
 
 # Singleton instance
 notebook_service = NotebookService()
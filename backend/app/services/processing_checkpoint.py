@@ -0,0 +1,315 @@
+"""Resumable checkpoints for the material processing pipeline, stored in Redis"""
+import base64
+import json
+import logging
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+
+import redis
+
+from app.core.config import settings
+from app.services.text_chunking import TextChunk
+
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkBatch:
+    """A batch of consecutive chunks with their embeddings"""
+
+    def __init__(
+        self,
+        chunks: List[TextChunk],
+        embeddings: List[Optional[List[float]]],
+        cache_stats: Optional[Dict[str, int]] = None
+    ):
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self.cache_stats = cache_stats or {"hits": 0, "misses": 0}
+
+    @property
+    def end(self) -> int:
+        """Chunk index just past the last chunk of the batch"""
+        return self.chunks[-1].chunk_index + 1 if self.chunks else 0
+
+    def to_json(self) -> str:
+        """Serialize the batch (embeddings packed as base64 float32)"""
+        return json.dumps({
+            "chunks": [chunk.to_dict() for chunk in self.chunks],
+            "embeddings": [
+                base64.b64encode(array('f', e).tobytes()).decode('ascii') if e is not None else None
+                for e in self.embeddings
+            ],
+            "cache_stats": self.cache_stats
+        })
+
+    @classmethod
+    def from_json(cls, value: Any) -> "ChunkBatch":
+        """Deserialize a batch written by to_json"""
+        data = json.loads(value)
+
+        embeddings: List[Optional[List[float]]] = []
+        for packed in data["embeddings"]:
+            if packed is None:
+                embeddings.append(None)
+                continue
+            vector = array('f')
+            vector.frombytes(base64.b64decode(packed))
+            embeddings.append(vector.tolist())
+
+        chunks = [
+            TextChunk(c["content"], c["chunk_index"], c["metadata"])
+            for c in data["chunks"]
+        ]
+        return cls(chunks, embeddings, data.get("cache_stats"))
+
+
+class ProcessingCheckpoint:
+    """
+    Progress of one material through download → extract/chunk → embed → store
+
+    Artifacts are keyed by material_id and the sha256 of the downloaded file:
+
+    - `material_pipeline:{material_id}` (hash) records the content hash, how many
+      chunks have been embedded and stored, and the extraction metadata once
+      every chunk has been embedded
+    - `material_pipeline:{material_id}:{content_hash}:batches` (list) holds the
+      embedded chunk batches in order
+    - `material_pipeline:{material_id}:{content_hash}:shards` (hash) holds the
+      chunk shards of a material whose embedding is fanned out across workers
+
+    A retried task replays checkpointed batches instead of embedding them again,
+    and skips downloading and extraction entirely once all chunks are embedded.
+    Redis failures are logged and disable the checkpoint for the rest of the run,
+    so they never fail processing; the next attempt then starts from scratch.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis],
+        material_id: str,
+        ttl_seconds: int = 24 * 60 * 60
+    ):
+        """
+        Initialize checkpoint
+
+        Args:
+            redis_client: Redis client (None disables checkpointing)
+            material_id: UUID of the material being processed
+            ttl_seconds: Expiry for checkpoint keys, refreshed on every write
+        """
+        self.redis = redis_client
+        self.material_id = material_id
+        self.ttl_seconds = ttl_seconds
+        self.enabled = redis_client is not None
+
+        self.content_hash: Optional[str] = None
+        self.embedded_chunks = 0
+        self.stored_chunks = 0
+        self.stored_count = 0
+        self.extraction_metadata: Optional[Dict[str, Any]] = None
+
+    @property
+    def manifest_key(self) -> str:
+        return f"material_pipeline:{self.material_id}"
+
+    @property
+    def batches_key(self) -> str:
+        return f"material_pipeline:{self.material_id}:{self.content_hash}:batches"
+
+    @property
+    def shards_key(self) -> str:
+        return f"material_pipeline:{self.material_id}:{self.content_hash}:shards"
+
+    @property
+    def is_embedded(self) -> bool:
+        """Whether every chunk has been embedded, so the file is no longer needed"""
+        return self.content_hash is not None and self.extraction_metadata is not None
+
+    def load(self) -> "ProcessingCheckpoint":
+        """Read progress left by an earlier attempt"""
+        if not self.enabled:
+            return self
+
+        try:
+            manifest = {
+                self._str(key): self._str(value)
+                for key, value in self.redis.hgetall(self.manifest_key).items()
+            }
+        except Exception as e:
+            self._disable(f"load failed: {e}")
+            return self
+
+        if not manifest.get("content_hash"):
+            return self
+
+        self.content_hash = manifest["content_hash"]
+        self.embedded_chunks = int(manifest.get("embedded_chunks", 0))
+        self.stored_chunks = int(manifest.get("stored_chunks", 0))
+        self.stored_count = int(manifest.get("stored_count", 0))
+        if manifest.get("extraction_metadata"):
+            self.extraction_metadata = json.loads(manifest["extraction_metadata"])
+
+        logger.info(
+            f"Resuming material {self.material_id} from checkpoint: "
+            f"{self.embedded_chunks} chunks embedded, {self.stored_chunks} stored"
+        )
+        return self
+
+    def begin(self, content_hash: str) -> None:
+        """
+        Bind the checkpoint to the downloaded file
+
+        Progress recorded for different file content is discarded.
+        """
+        if self.content_hash != content_hash:
+            if self.content_hash is not None:
+                logger.info(f"Material {self.material_id} content changed, discarding checkpoint")
+                self.clear()
+            self._reset()
+
+        self.content_hash = content_hash
+        self._write_manifest({"content_hash": content_hash})
+
+    def iter_batches(self) -> Iterator[ChunkBatch]:
+        """Yield checkpointed batches in order, one Redis read at a time"""
+        if not self.enabled or self.content_hash is None:
+            return
+
+        position = 0
+        while True:
+            try:
+                values = self.redis.lrange(self.batches_key, position, position)
+            except Exception as e:
+                raise RuntimeError(f"Failed to read processing checkpoint: {e}")
+
+            if not values:
+                return
+
+            yield ChunkBatch.from_json(values[0])
+            position += 1
+
+    def add_batch(self, batch: ChunkBatch) -> None:
+        """Record a newly embedded batch"""
+        if not self.enabled or self.content_hash is None:
+            return
+
+        try:
+            pipeline = self.redis.pipeline(transaction=True)
+            pipeline.rpush(self.batches_key, batch.to_json())
+            pipeline.hset(self.manifest_key, "embedded_chunks", batch.end)
+            pipeline.expire(self.batches_key, self.ttl_seconds)
+            pipeline.expire(self.manifest_key, self.ttl_seconds)
+            pipeline.execute()
+            self.embedded_chunks = batch.end
+        except Exception as e:
+            self._disable(f"batch write failed: {e}")
+
+    def put_shard(self, index: int, batch: ChunkBatch) -> None:
+        """
+        Store a shard of chunks for a fan-out sub-task
+
+        Unlike progress records, shards are the only copy of the data handed
+        between tasks, so write failures raise.
+        """
+        if not self.enabled or self.content_hash is None:
+            raise RuntimeError("Processing checkpoints are unavailable")
+
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.hset(self.shards_key, str(index), batch.to_json())
+        pipeline.expire(self.shards_key, self.ttl_seconds)
+        pipeline.execute()
+
+    def get_shard(self, index: int) -> ChunkBatch:
+        """Read a shard written by put_shard"""
+        if not self.enabled or self.content_hash is None:
+            raise RuntimeError("Processing checkpoints are unavailable")
+
+        value = self.redis.hget(self.shards_key, str(index))
+        if value is None:
+            raise RuntimeError(f"Shard {index} of material {self.material_id} is missing")
+        return ChunkBatch.from_json(value)
+
+    def mark_embedded(self, extraction_metadata: Dict[str, Any]) -> None:
+        """Record that extraction finished and every chunk has been embedded"""
+        self.extraction_metadata = extraction_metadata
+        self._write_manifest({"extraction_metadata": json.dumps(extraction_metadata)})
+
+    def mark_stored(self, stored_chunks: int, stored_count: int) -> None:
+        """Record that chunks before stored_chunks are in the database"""
+        self.stored_chunks = stored_chunks
+        self.stored_count = stored_count
+        self._write_manifest({"stored_chunks": stored_chunks, "stored_count": stored_count})
+
+    def clear(self) -> None:
+        """Delete the checkpoint (after success or when the content changed)"""
+        if not self.enabled:
+            return
+
+        try:
+            keys = [self.manifest_key]
+            if self.content_hash is not None:
+                keys.extend([self.batches_key, self.shards_key])
+            self.redis.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Failed to clear processing checkpoint: {e}")
+
+    def _write_manifest(self, fields: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+
+        try:
+            pipeline = self.redis.pipeline(transaction=True)
+            pipeline.hset(self.manifest_key, mapping=fields)
+            pipeline.expire(self.manifest_key, self.ttl_seconds)
+            if self.content_hash is not None:
+                # Keep the artifacts alive as long as the manifest that points at them
+                pipeline.expire(self.batches_key, self.ttl_seconds)
+                pipeline.expire(self.shards_key, self.ttl_seconds)
+            pipeline.execute()
+        except Exception as e:
+            self._disable(f"manifest write failed: {e}")
+
+    def _reset(self) -> None:
+        self.embedded_chunks = 0
+        self.stored_chunks = 0
+        self.stored_count = 0
+        self.extraction_metadata = None
+
+    def _disable(self, reason: str) -> None:
+        """Stop checkpointing this run; partial progress must not be trusted"""
+        logger.warning(f"Processing checkpoint disabled for material {self.material_id}: {reason}")
+        if self.enabled:
+            try:
+                self.redis.delete(self.manifest_key)
+            except Exception:
+                pass
+        self.enabled = False
+
+    @staticmethod
+    def _str(value: Any) -> str:
+        return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+def _create_checkpoint_redis() -> Optional[redis.Redis]:
+    """Build the Redis client used for checkpoints from settings"""
+    if not settings.PROCESSING_CHECKPOINTS_ENABLED:
+        return None
+
+    return redis.Redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=5,
+        socket_connect_timeout=2
+    )
+
+
+checkpoint_redis = _create_checkpoint_redis()
+
+
+def load_checkpoint(material_id: str) -> ProcessingCheckpoint:
+    """Load the processing checkpoint of a material"""
+    return ProcessingCheckpoint(
+        checkpoint_redis,
+        material_id,
+        ttl_seconds=settings.PROCESSING_CHECKPOINT_TTL_SECONDS
+    ).load()
@@ -1,18 +1,117 @@
 """Text chunking service for creating retrievable segments"""
 import re
 import logging
-from typing import List, Dict, Any, Optional
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 import tiktoken
 
+from app.core.config import settings
+
 
 logger = logging.getLogger(__name__)
 
 
+# Version of the chunking algorithm; bump whenever chunk boundaries change for
+# the same settings so existing materials are picked up by the re-chunk backfill
+CHUNKER_VERSION = 4
+
+
+# UTF-8 continuation bytes (10xxxxxx) never start a character
+_UTF8_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+def _char_count(data: bytes) -> int:
+    """Count the characters starting inside a span of UTF-8 bytes"""
+    return len(data.translate(None, _UTF8_CONTINUATION_BYTES))
+
+
 class ChunkingError(Exception):
     """Base exception for chunking errors"""
     pass
 
 
+# Page markers inserted by PDF extraction, including the newline that follows them
+_PAGE_MARKER = re.compile(r'\[PAGE (\d+)\]\n?')
+
+
+# Boundary strengths. A window ends at the boundary in its token band scoring
+# highest on strength plus _POSITION_WEIGHT times its position in the band (0 at
+# min_chunk_tokens, 1 at max_chunk_tokens): a paragraph break wins over a
+# sentence end less than a quarter of the band later, and a heading always wins
+_HEADING_BOUNDARY = 8
+_PARAGRAPH_BOUNDARY = 3
+_SENTENCE_BOUNDARY = 2
+_LINE_BOUNDARY = 1
+_POSITION_WEIGHT = 4
+
+# Boundary patterns run on UTF-8 bytes so offsets line up with token byte offsets
+# without converting between character and byte positions
+_HEADING = re.compile(
+    rb'^[ \t]*(?:'
+    rb'#{1,6}[ \t]+\S[^\n]*'  # Markdown heading
+    rb'|(?i:(?:chapter|section|part|unit|lecture)[ \t]+[0-9ivxlc]+\b[^\n]{0,80})'  # Numbered division, any case
+    rb'|(?=[^\n]*[A-Z])[A-Z0-9][A-Z0-9 \t,.:;&/()\'-]{2,98}'  # ALL CAPS line
+    rb')[ \t]*$',
+    re.MULTILINE
+)
+_PARAGRAPH = re.compile(rb'\n[ \t]*\n')
+_SENTENCE = re.compile(rb'[.!?]["\')\]]*(?=\s)')
+_LINE = re.compile(rb'\n')
+_WHITESPACE_BYTES = frozenset(b' \t\r\n')
+
+
+class PageIndex:
+    """Sorted page start offsets for O(log n) page attribution of chunks"""
+    
+    def __init__(self):
+        self.starts: List[int] = []
+        self.page_numbers: List[int] = []
+    
+    def add(self, page_number: int, offset: int) -> None:
+        """Record that a page starts at a character offset (offsets must not decrease)"""
+        self.starts.append(offset)
+        self.page_numbers.append(page_number)
+    
+    def lookup(self, char_start: int, char_end: int) -> Optional[Tuple[int, int]]:
+        """
+        Find the first and last page covered by a character range
+        
+        Args:
+            char_start: Start offset of the range
+            char_end: Offset just past the end of the range
+            
+        Returns:
+            Tuple of (first page, last page), or None if the range lies before
+            the first page marker
+        """
+        last = bisect_right(self.starts, max(char_start, char_end - 1)) - 1
+        if last < 0:
+            return None
+        
+        first = bisect_right(self.starts, char_start) - 1
+        first_page = self.page_numbers[max(first, 0)]
+        return first_page, self.page_numbers[last]
+
+
+class HeadingIndex:
+    """Sorted heading byte offsets for O(log n) section attribution of chunks"""
+    
+    def __init__(self):
+        self.starts: List[int] = []
+        self.headings: List[str] = []
+    
+    def add(self, offset: int, heading: str) -> None:
+        """Record a heading starting at a byte offset (offsets must not decrease)"""
+        self.starts.append(offset)
+        self.headings.append(heading)
+    
+    def lookup(self, offset: int) -> Optional[str]:
+        """Find the heading of the section containing a byte offset"""
+        i = bisect_right(self.starts, offset) - 1
+        return self.headings[i] if i >= 0 else None
+
+
 class TextChunk:
     """Represents a text chunk with metadata"""
     
@@ -35,6 +134,141 @@ class TextChunk:
         }
 
 
+class _PendingText:
+    """
+    Tokens awaiting chunking, with the text they decode to and its boundaries
+    
+    Boundaries are document byte offsets; the cursor is the (token, byte, char)
+    index of the next window within the pending buffers. Tokens are decoded to
+    bytes a slice at a time, only around where a window ends or overlaps.
+    """
+    
+    def __init__(self, encoding: tiktoken.Encoding):
+        self.encoding = encoding
+        self.tokens: List[int] = []
+        self.text = ""
+        self.data = b""
+        self.char_offset = 0  # Character offset of text in the document
+        self.byte_offset = 0  # Byte offset of data in the document
+        self.boundary_offsets: List[int] = []
+        self.boundary_strengths: List[int] = []
+        self.cursor = (0, 0, 0)
+    
+    def extend(
+        self,
+        text: str,
+        data: bytes,
+        tokens: List[int],
+        boundary_offsets: List[int],
+        boundary_strengths: List[int]
+    ) -> None:
+        """Release everything behind the cursor, then append a tokenized segment"""
+        start_token, start_byte, start_char = self.cursor
+        self.char_offset += start_char
+        self.byte_offset += start_byte
+        self.cursor = (0, 0, 0)
+        
+        self.tokens = self.tokens[start_token:] + tokens
+        self.text = self.text[start_char:] + text
+        self.data = self.data[start_byte:] + data
+        
+        keep = bisect_left(self.boundary_offsets, self.byte_offset)
+        self.boundary_offsets = self.boundary_offsets[keep:] + boundary_offsets
+        self.boundary_strengths = self.boundary_strengths[keep:] + boundary_strengths
+    
+    def byte_length(self, first: int, last: int) -> int:
+        """Number of bytes tokens[first:last] decode to"""
+        return len(self.encoding.decode_bytes(self.tokens[first:last]))
+    
+    def snap(
+        self,
+        low: int,
+        low_byte: int,
+        high: int,
+        high_byte: int,
+        position_weight: float
+    ) -> Optional[Tuple[int, int, int]]:
+        """
+        Pick the boundary in tokens [low, high] to cut at
+        
+        The boundary scoring highest on strength plus position_weight times its
+        position in the range wins, the latest one on ties.
+        
+        Args:
+            low: First candidate token
+            low_byte: Byte index of token low within data
+            high: Last candidate token
+            high_byte: Byte index of token high within data
+            position_weight: Score of the range end over its start (0 picks
+                the latest of the strongest boundaries)
+            
+        Returns:
+            Tuple of (token, byte index of the token within data, boundary
+            strength), or None if the range holds no boundary
+        """
+        best, best_score = None, 0.0
+        first = bisect_left(self.boundary_offsets, self.byte_offset + low_byte)
+        last = bisect_right(self.boundary_offsets, self.byte_offset + high_byte)
+        scale = position_weight / max(high_byte - low_byte, 1)
+        
+        for i in range(first, last):
+            score = self.boundary_strengths[i] + (
+                self.boundary_offsets[i] - self.byte_offset - low_byte
+            ) * scale
+            if score >= best_score:
+                best, best_score = i, score
+        
+        if best is None:
+            return None
+        
+        # A boundary inside a token (e.g. ".\n\n") cuts after that token
+        token, byte = self._token_at(
+            self.boundary_offsets[best] - self.byte_offset, low, low_byte, high, high_byte
+        )
+        return token, byte, self.boundary_strengths[best]
+    
+    def last_word_start(self, low: int, low_byte: int, high: int, high_byte: int) -> Tuple[int, int]:
+        """Last token in [low, high] that starts a word (high if none), with its byte index"""
+        # Only reached for text without boundaries, so decoding token by token is fine
+        lengths = map(len, self.encoding.decode_tokens_bytes(self.tokens[low:high]))
+        starts = list(accumulate(lengths, initial=low_byte))
+        for token in range(high, low - 1, -1):
+            if self.data[starts[token - low]] in _WHITESPACE_BYTES:
+                return token, starts[token - low]
+        return high, high_byte
+    
+    def _token_at(
+        self,
+        byte: int,
+        low: int,
+        low_byte: int,
+        high: int,
+        high_byte: int
+    ) -> Tuple[int, int]:
+        """
+        First token in [low, high] starting at or after a byte index within data
+        
+        Searches by interpolating on bytes per token, with one decode_bytes
+        call per step from the nearer end of the range still in question.
+        """
+        if low_byte >= byte:
+            return low, low_byte
+        
+        while high - low > 1:
+            guess = low + (byte - low_byte) * (high - low) // (high_byte - low_byte)
+            middle = min(max(guess, low + 1), high - 1)
+            if middle - low <= high - middle:
+                middle_byte = low_byte + self.byte_length(low, middle)
+            else:
+                middle_byte = high_byte - self.byte_length(middle, high)
+            if middle_byte >= byte:
+                high, high_byte = middle, middle_byte
+            else:
+                low, low_byte = middle, middle_byte
+        
+        return high, high_byte
+
+
 class TextChunkingService:
     """Service for chunking text into retrievable segments"""
     
@@ -66,6 +300,14 @@ class TextChunkingService:
             logger.error(f"Failed to load tiktoken encoding: {e}")
             raise ChunkingError(f"Failed to initialize tokenizer: {str(e)}")
     
+    @property
+    def config_version(self) -> str:
+        """Identify the algorithm and settings that determine chunk boundaries"""
+        return (
+            f"{CHUNKER_VERSION}:{self.encoding.name}:"
+            f"{self.min_chunk_tokens}-{self.max_chunk_tokens}/{self.overlap_tokens}"
+        )
+    
     def chunk_text(
         self,
         text: str,
@@ -89,113 +331,296 @@ class TextChunkingService:
         if not text or not text.strip():
             raise ChunkingError("Cannot chunk empty text")
         
-        try:
-            # Extract page markers if present (from PDF extraction)
-            page_markers = self._extract_page_markers(text)
+        return list(self.iter_chunks([text], material_metadata))
+    
+    def iter_chunks(
+        self,
+        segments: Iterable[str],
+        material_metadata: Optional[Dict[str, Any]] = None
+    ) -> Iterator[TextChunk]:
+        """
+        Chunk a stream of text segments, yielding chunks as token windows fill
+        
+        The document is the concatenation of the segments (e.g. pages yielded by
+        TextExtractionService.extract_text_stream). Only the tokens of the window
+        being filled are kept in memory, so memory stays flat for large documents.
+        
+        Each segment is tokenized exactly once, and heading, paragraph, sentence
+        and line boundaries are found alongside. Each window ends at the
+        strongest boundary between min_chunk_tokens and max_chunk_tokens, so
+        chunks do not split sentences or words; token byte offsets are decoded
+        only for that band and for the overlap.
+        
+        Args:
+            segments: Consecutive pieces of the document text
+            material_metadata: Metadata from material (format, page_count, etc.)
             
-            # Tokenize the entire text
-            tokens = self.encoding.encode(text)
-            total_tokens = len(tokens)
+        Yields:
+            TextChunk objects in document order
             
-            if total_tokens == 0:
-                raise ChunkingError("Text produced no tokens")
+        Raises:
+            ChunkingError: If chunking fails or produces no chunks
+            
+        Requirements: 4.5
+        """
+        try:
+            page_index = PageIndex()
+            heading_index = HeadingIndex()
+            pending = _PendingText(self.encoding)
+            document_chars = 0
+            document_bytes = 0
             
-            chunks = []
             chunk_index = 0
-            start_pos = 0
+            total_tokens = 0
             
-            while start_pos < total_tokens:
-                # Determine chunk end position
-                end_pos = min(start_pos + self.max_chunk_tokens, total_tokens)
+            for segment in segments:
+                if not segment:
+                    continue
                 
-                # Extract chunk tokens
-                chunk_tokens = tokens[start_pos:end_pos]
+                # Strip page markers (from PDF extraction) and index where each page starts
+                segment, segment_pages = self._extract_page_markers(segment)
+                for page_num, position in segment_pages:
+                    page_index.add(page_num, document_chars + position)
+                document_chars += len(segment)
                 
-                # Decode back to text
-                chunk_text = self.encoding.decode(chunk_tokens)
+                if not segment:
+                    continue
                 
-                # Clean up chunk text
-                chunk_text = chunk_text.strip()
+                segment_bytes = segment.encode('utf-8')
+                boundary_offsets, boundary_strengths = self._find_boundaries(
+                    segment_bytes, document_bytes, heading_index
+                )
+                document_bytes += len(segment_bytes)
                 
-                if chunk_text:
-                    # Determine which page this chunk belongs to
-                    chunk_metadata = self._create_chunk_metadata(
-                        chunk_text,
-                        chunk_index,
-                        page_markers,
-                        material_metadata
-                    )
-                    
-                    chunk = TextChunk(
-                        content=chunk_text,
-                        chunk_index=chunk_index,
-                        metadata=chunk_metadata
-                    )
-                    chunks.append(chunk)
-                    chunk_index += 1
+                segment_tokens = self.encoding.encode(segment)
+                total_tokens += len(segment_tokens)
                 
-                # Move to next chunk with overlap
-                # If this is the last chunk, break
-                if end_pos >= total_tokens:
-                    break
+                pending.extend(
+                    segment, segment_bytes, segment_tokens, boundary_offsets, boundary_strengths
+                )
                 
-                # Move start position forward, accounting for overlap
-                start_pos = end_pos - self.overlap_tokens
+                # Emit full windows; the last window is held back until input ends
+                while len(pending.tokens) - pending.cursor[0] > self.max_chunk_tokens:
+                    chunk = self._take_window(
+                        pending, chunk_index, page_index, heading_index, material_metadata
+                    )
+                    
+                    if chunk is not None:
+                        yield chunk
+                        chunk_index += 1
+            
+            if total_tokens == 0:
+                raise ChunkingError("Text produced no tokens")
+            
+            if len(pending.tokens) > pending.cursor[0]:
+                chunk = self._take_window(
+                    pending, chunk_index, page_index, heading_index, material_metadata
+                )
                 
-                # Ensure we make progress
-                if start_pos <= chunks[-1].chunk_index if chunks else 0:
-                    start_pos = end_pos
+                if chunk is not None:
+                    yield chunk
+                    chunk_index += 1
             
-            if not chunks:
+            if chunk_index == 0:
                 raise ChunkingError("No chunks were created from text")
             
             logger.info(
-                f"Created {len(chunks)} chunks from {total_tokens} tokens "
-                f"(avg {total_tokens // len(chunks)} tokens per chunk)"
+                f"Created {chunk_index} chunks from {total_tokens} tokens "
+                f"(avg {total_tokens // chunk_index} tokens per chunk)"
             )
             
-            return chunks
-            
         except ChunkingError:
             raise
         except Exception as e:
             logger.error(f"Chunking failed: {str(e)}")
             raise ChunkingError(f"Failed to chunk text: {str(e)}")
     
-    def _extract_page_markers(self, text: str) -> Dict[int, int]:
+    def _find_boundaries(
+        self,
+        data: bytes,
+        base: int,
+        heading_index: HeadingIndex
+    ) -> Tuple[List[int], List[int]]:
         """
-        Extract page markers from text (e.g., [PAGE 1])
+        Find the boundaries a window may end at within a segment
+        
+        Args:
+            data: UTF-8 encoded segment
+            base: Byte offset of the segment in the document
+            heading_index: Index that headings found in the segment are added to
+            
+        Returns:
+            Tuple of (sorted document byte offsets, their strengths)
+        """
+        # Marked weakest first, so an offset keeps its strongest boundary
+        strengths: Dict[int, int] = dict.fromkeys(
+            [match.start() for match in _LINE.finditer(data)], _LINE_BOUNDARY
+        )
+        strengths.update(dict.fromkeys(
+            [match.end() for match in _SENTENCE.finditer(data)], _SENTENCE_BOUNDARY
+        ))
+        strengths.update(dict.fromkeys(
+            [match.start() for match in _PARAGRAPH.finditer(data)], _PARAGRAPH_BOUNDARY
+        ))
+        for match in _HEADING.finditer(data):
+            strengths[match.start()] = _HEADING_BOUNDARY
+            heading = match.group().strip().lstrip(b'#').strip()
+            heading_index.add(base + match.start(), heading.decode('utf-8', errors='replace'))
+        
+        offsets = sorted(strengths)
+        return [base + offset for offset in offsets], [strengths[offset] for offset in offsets]
+    
+    def _take_window(
+        self,
+        pending: "_PendingText",
+        chunk_index: int,
+        page_index: PageIndex,
+        heading_index: HeadingIndex,
+        material_metadata: Optional[Dict[str, Any]]
+    ) -> Optional[TextChunk]:
+        """
+        Build the chunk for the window starting at the cursor and advance it
+        
+        A full window ends at the best-scoring boundary (see _POSITION_WEIGHT)
+        whose token lies between min_chunk_tokens and max_chunk_tokens past the
+        start, falling back to the last word start. After a paragraph or section
+        break the next window starts right there; otherwise it starts at the
+        latest of the strongest boundaries within the overlap (if any),
+        repeating the closing sentence rather than a fixed overlap_tokens of
+        context.
+        Chunk content is sliced from the source text using the byte length of
+        the window's tokens, never re-encoded.
+        
+        Args:
+            pending: Pending tokens, text and boundaries
+            chunk_index: Index for the chunk
+            page_index: Page start offsets in the document
+            heading_index: Heading offsets in the document
+            material_metadata: Material-level metadata
+            
+        Returns:
+            Chunk, or None if the window is whitespace-only
+        """
+        start_token, start_byte, start_char = pending.cursor
+        
+        if len(pending.tokens) - start_token <= self.max_chunk_tokens:
+            end_token, end_byte, end_strength = len(pending.tokens), len(pending.data), 0
+        else:
+            low = start_token + min(self.min_chunk_tokens, self.max_chunk_tokens)
+            high = start_token + self.max_chunk_tokens
+            low_byte = start_byte + pending.byte_length(start_token, low)
+            high_byte = low_byte + pending.byte_length(low, high)
+            end = pending.snap(low, low_byte, high, high_byte, _POSITION_WEIGHT)
+            if end is None:
+                end = (*pending.last_word_start(low, low_byte, high, high_byte), 0)
+            end_token, end_byte, end_strength = end
+        
+        end_char = start_char + _char_count(pending.data[start_byte:end_byte])
+        
+        raw_text = pending.text[start_char:end_char]
+        chunk_text = raw_text.strip()
+        chunk = None
+        
+        if chunk_text:
+            leading = len(raw_text) - len(raw_text.lstrip())
+            char_start = pending.char_offset + start_char + leading
+            byte_start = pending.byte_offset + start_byte + len(raw_text[:leading].encode('utf-8'))
+            
+            chunk = TextChunk(
+                content=chunk_text,
+                chunk_index=chunk_index,
+                metadata=self._create_chunk_metadata(
+                    chunk_index,
+                    end_token - start_token,
+                    char_start,
+                    char_start + len(chunk_text),
+                    page_index,
+                    heading_index.lookup(byte_start),
+                    material_metadata
+                )
+            )
+        
+        # Move start position forward, keeping at most overlap_tokens of context
+        # that starts at a boundary, and never starting before a fixed
+        # max_chunk_tokens - overlap_tokens stride would; a window ending at a
+        # paragraph or section break needs no overlap
+        next_token, next_byte = end_token, end_byte
+        low = max(
+            end_token - self.overlap_tokens,
+            start_token + self.max_chunk_tokens - self.overlap_tokens,
+            start_token + 1
+        )
+        if (
+            self.overlap_tokens > 0
+            and end_strength < _PARAGRAPH_BOUNDARY
+            and low < end_token < len(pending.tokens)
+        ):
+            overlap = pending.snap(
+                low,
+                end_byte - pending.byte_length(low, end_token),
+                end_token - 1,
+                end_byte - pending.byte_length(end_token - 1, end_token),
+                position_weight=0
+            )
+            if overlap is not None:
+                next_token, next_byte, _ = overlap
+        
+        next_char = end_char - _char_count(pending.data[next_byte:end_byte])
+        pending.cursor = (next_token, next_byte, next_char)
+        
+        return chunk
+    
+    def _extract_page_markers(self, text: str) -> Tuple[str, List[Tuple[int, int]]]:
+        """
+        Remove page markers (e.g., [PAGE 1]) from text
+        
+        Markers are positional metadata only; stripping them keeps them out of
+        chunk content and embeddings.
         
         Args:
             text: Text with potential page markers
             
         Returns:
-            Dictionary mapping page number to character position
+            Tuple of (text without markers, [(page number, character position
+            in the stripped text)])
         """
-        page_markers = {}
-        pattern = r'\[PAGE (\d+)\]'
+        pages: List[Tuple[int, int]] = []
+        parts: List[str] = []
+        last_end = 0
+        position = 0
+        
+        for match in _PAGE_MARKER.finditer(text):
+            parts.append(text[last_end:match.start()])
+            position += match.start() - last_end
+            pages.append((int(match.group(1)), position))
+            last_end = match.end()
         
-        for match in re.finditer(pattern, text):
-            page_num = int(match.group(1))
-            position = match.start()
-            page_markers[page_num] = position
+        if not pages:
+            return text, pages
         
-        return page_markers
+        parts.append(text[last_end:])
+        return "".join(parts), pages
     
     def _create_chunk_metadata(
         self,
-        chunk_text: str,
         chunk_index: int,
-        page_markers: Dict[int, int],
+        token_count: int,
+        char_start: int,
+        char_end: int,
+        page_index: PageIndex,
+        section_header: Optional[str],
         material_metadata: Optional[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """
         Create metadata for a chunk
         
         Args:
-            chunk_text: The chunk text
             chunk_index: Index of this chunk
-            page_markers: Page marker positions
+            token_count: Number of tokens in the chunk's window
+            char_start: Character offset of the chunk in the source text
+            char_end: Character offset just past the chunk in the source text
+            page_index: Page start offsets in the source text
+            section_header: Heading of the section the chunk starts in
             material_metadata: Material-level metadata
             
         Returns:
@@ -203,28 +628,22 @@ class TextChunkingService:
         """
         metadata: Dict[str, Any] = {
             "chunk_index": chunk_index,
-            "token_count": len(self.encoding.encode(chunk_text))
+            "token_count": token_count,
+            "char_start": char_start,
+            "char_end": char_end
         }
         
         # Add material metadata if available
         if material_metadata:
             metadata["material_format"] = material_metadata.get("format")
         
-        # Determine page number if page markers exist
-        if page_markers:
-            # Find the page this chunk belongs to
-            # Look for page markers in the chunk text
-            page_match = re.search(r'\[PAGE (\d+)\]', chunk_text)
-            if page_match:
-                metadata["page_number"] = int(page_match.group(1))
-        
-        # Extract potential section headers (lines that are short and capitalized)
-        lines = chunk_text.split('\n')
-        for line in lines[:3]:  # Check first 3 lines
-            line = line.strip()
-            if line and len(line) < 100 and line.isupper():
-                metadata["section_header"] = line
-                break
+        # Determine the pages this chunk spans if page markers exist
+        page_range = page_index.lookup(char_start, char_end)
+        if page_range:
+            metadata["page_number"], metadata["page_end"] = page_range
+        
+        if section_header:
+            metadata["section_header"] = section_header
         
         return metadata
     
@@ -246,5 +665,9 @@ class TextChunkingService:
 
 
 # Singleton instance
-text_chunking_service = TextChunkingService()
+text_chunking_service = TextChunkingService(
+    min_chunk_tokens=settings.CHUNK_MIN_TOKENS,
+    max_chunk_tokens=settings.CHUNK_MAX_TOKENS,
+    overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
+)
 
@@ -1,19 +1,41 @@
 """Text extraction service for various document formats"""
+import codecs
 import io
 import logging
-from typing import Optional, Dict, Any
+import mmap
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, BinaryIO, Iterator, Type, Union
 from pathlib import Path
 
+from billiard.pool import Pool
+
 try:
     from PyPDF2 import PdfReader
 except ImportError:
     PdfReader = None
 
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
 try:
     from docx import Document
 except ImportError:
     Document = None
 
+from app.core.config import settings
+
 
 logger = logging.getLogger(__name__)
 
@@ -33,12 +55,264 @@ class ExtractionFailedError(TextExtractionError):
     pass
 
 
+# Extraction input: raw bytes or a seekable binary file (e.g. a downloaded temp file)
+FileSource = Union[bytes, BinaryIO]
+
+
+@contextmanager
+def _map_file(source: FileSource) -> Iterator[Union[bytes, mmap.mmap]]:
+    """
+    Expose a file source as a bytes-like buffer without reading it into memory
+    
+    Files are memory-mapped read-only, so pages are loaded by the OS on demand.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        yield source
+        return
+    
+    source.seek(0, os.SEEK_END)
+    if source.tell() == 0:
+        yield b""
+        return
+    
+    with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield mapped
+
+
+class PdfBackend(ABC):
+    """
+    PDF text extraction engine
+    
+    Opened over PDF bytes, a binary file or a file path; subclasses wrap one
+    library each.
+    Instances are context managers that release the document on exit.
+    """
+    
+    name = ""
+    
+    @classmethod
+    @abstractmethod
+    def is_available(cls) -> bool:
+        """Whether the backend's library is installed"""
+    
+    @abstractmethod
+    def __init__(self, source: Union[FileSource, str]):
+        """Open a document"""
+    
+    @property
+    @abstractmethod
+    def page_count(self) -> int:
+        """Number of pages in the document"""
+    
+    @abstractmethod
+    def extract_page(self, index: int) -> str:
+        """Extract the text of the page at a 0-based index"""
+    
+    def close(self) -> None:
+        pass
+    
+    def __enter__(self) -> "PdfBackend":
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class PyPDF2Backend(PdfBackend):
+    """Pure-Python PyPDF2 engine; slowest, but always installed"""
+    
+    name = "pypdf2"
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        return PdfReader is not None
+    
+    def __init__(self, source: Union[FileSource, str]):
+        self._file = None
+        self._map = None
+        
+        if isinstance(source, str):
+            self._file = open(source, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._reader = PdfReader(self._map)
+        elif isinstance(source, (bytes, bytearray)):
+            self._reader = PdfReader(io.BytesIO(source))
+        else:
+            source.seek(0)
+            self._reader = PdfReader(source)
+    
+    @property
+    def page_count(self) -> int:
+        return len(self._reader.pages)
+    
+    def extract_page(self, index: int) -> str:
+        return self._reader.pages[index].extract_text()
+    
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+
+class PyMuPDFBackend(PdfBackend):
+    """MuPDF engine (pymupdf package)"""
+    
+    name = "pymupdf"
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        return pymupdf is not None
+    
+    def __init__(self, source: Union[FileSource, str]):
+        self._map = None
+        self._view = None
+        
+        if isinstance(source, str):
+            self._doc = pymupdf.open(source)
+        elif isinstance(source, (bytes, bytearray)):
+            self._doc = pymupdf.open(stream=source, filetype="pdf")
+        else:
+            source.seek(0)
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+            self._doc = pymupdf.open(stream=self._view, filetype="pdf")
+    
+    @property
+    def page_count(self) -> int:
+        return self._doc.page_count
+    
+    def extract_page(self, index: int) -> str:
+        return self._doc[index].get_text()
+    
+    def close(self) -> None:
+        self._doc.close()
+        self._doc = None
+        if self._view is not None:
+            self._view.release()
+        if self._map is not None:
+            self._map.close()
+
+
+class PdfiumBackend(PdfBackend):
+    """PDFium engine (pypdfium2 package)"""
+    
+    name = "pypdfium2"
+    
+    @classmethod
+    def is_available(cls) -> bool:
+        return pypdfium2 is not None
+    
+    def __init__(self, source: Union[FileSource, str]):
+        if not isinstance(source, (str, bytes, bytearray)):
+            source.seek(0)
+        self._doc = pypdfium2.PdfDocument(source)
+    
+    @property
+    def page_count(self) -> int:
+        return len(self._doc)
+    
+    def extract_page(self, index: int) -> str:
+        page = self._doc[index]
+        try:
+            text_page = page.get_textpage()
+            try:
+                return text_page.get_text_range()
+            finally:
+                text_page.close()
+        finally:
+            page.close()
+    
+    def close(self) -> None:
+        self._doc.close()
+
+
+# Registered PDF backends, in order of preference for PDF_BACKEND=auto
+PDF_BACKENDS: Dict[str, Type[PdfBackend]] = {}
+
+
+def register_pdf_backend(backend: Type[PdfBackend]) -> Type[PdfBackend]:
+    """Register a PDF backend; automatic selection tries backends in registration order"""
+    PDF_BACKENDS[backend.name] = backend
+    return backend
+
+
+for _backend in (PyMuPDFBackend, PdfiumBackend, PyPDF2Backend):
+    register_pdf_backend(_backend)
+
+
+def available_pdf_backends() -> list[str]:
+    """Names of registered backends whose libraries are installed"""
+    return [name for name, backend in PDF_BACKENDS.items() if backend.is_available()]
+
+
+def get_pdf_backend(name: Optional[str] = None) -> Type[PdfBackend]:
+    """
+    Select a PDF backend by name, falling back to the fastest available one
+    
+    Args:
+        name: Backend name, or "auto"/None for the first available backend
+        
+    Returns:
+        Backend class
+        
+    Raises:
+        ExtractionFailedError: If no PDF backend is installed
+    """
+    name = name or settings.PDF_BACKEND
+    
+    if name != "auto":
+        backend = PDF_BACKENDS.get(name)
+        if backend is not None and backend.is_available():
+            return backend
+        logger.warning(f"PDF backend '{name}' is not available, selecting automatically")
+    
+    for backend in PDF_BACKENDS.values():
+        if backend.is_available():
+            return backend
+    
+    raise ExtractionFailedError(
+        "No PDF library is installed. Cannot extract PDF text."
+    )
+
+
+def _extract_page_text(document: PdfBackend, index: int) -> Optional[str]:
+    """Extract text from one PDF page, logging and skipping pages that fail"""
+    try:
+        return document.extract_page(index)
+    except Exception as page_error:
+        logger.warning(f"Failed to extract text from page {index + 1}: {page_error}")
+        return None
+
+
+def _extract_pdf_page_range(
+    backend_name: str,
+    pdf_path: str,
+    start: int,
+    end: int
+) -> list[tuple[int, Optional[str]]]:
+    """
+    Extract text from pages [start, end) of a PDF file (runs in a worker process)
+    
+    Returns:
+        List of (1-based page number, page text or None) in page order
+    """
+    with PDF_BACKENDS[backend_name](pdf_path) as document:
+        return [
+            (index + 1, _extract_page_text(document, index))
+            for index in range(start, end)
+        ]
+
+
 class TextExtractionService:
     """Service for extracting text from various document formats"""
 
+    # Target size of the blocks plain text files are streamed in
+    text_block_chars = 64 * 1024
+
     def extract_text(
         self,
-        file_content: bytes,
+        file_content: FileSource,
         mime_type: str,
         filename: str
     ) -> tuple[str, Dict[str, Any]]:
@@ -46,7 +320,7 @@ class TextExtractionService:
         Extract text from file content based on MIME type
         
         Args:
-            file_content: Raw file bytes
+            file_content: Raw file bytes or a seekable binary file
             mime_type: MIME type of the file
             filename: Original filename (used for extension fallback)
             
@@ -60,19 +334,57 @@ class TextExtractionService:
             
         Requirements: 4.4
         """
+        segments, metadata = self.extract_text_stream(file_content, mime_type, filename)
+        return "".join(segments), metadata
+
+    def extract_text_stream(
+        self,
+        file_content: FileSource,
+        mime_type: str,
+        filename: str
+    ) -> tuple[Iterator[str], Dict[str, Any]]:
+        """
+        Extract text incrementally, one page or block at a time
+        
+        Concatenating the yielded segments gives the same text as extract_text.
+        The metadata dictionary is filled in as the stream is consumed and is
+        complete once the iterator is exhausted.
+        
+        Args:
+            file_content: Raw file bytes or a seekable binary file
+            mime_type: MIME type of the file
+            filename: Original filename (used for extension fallback)
+            
+        Returns:
+            Tuple of (segment iterator, metadata)
+            
+        Raises:
+            UnsupportedFormatError: If file format is not supported
+            ExtractionFailedError: If extraction fails (raised while iterating)
+            
+        Requirements: 4.4
+        """
+        metadata: Dict[str, Any] = {}
+        
+        # Determine extraction method based on MIME type
+        if mime_type == 'application/pdf' or filename.lower().endswith('.pdf'):
+            segments = self._extract_pdf(file_content, metadata)
+        elif mime_type in ['text/plain', 'text/markdown'] or filename.lower().endswith(('.txt', '.md')):
+            segments = self._extract_text(file_content, metadata)
+        elif mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' or filename.lower().endswith('.docx'):
+            segments = self._extract_docx(file_content, metadata)
+        else:
+            raise UnsupportedFormatError(
+                f"Unsupported file format: {mime_type} ({filename})"
+            )
+        
+        return self._wrap_errors(segments, filename), metadata
+
+    def _wrap_errors(self, segments: Iterator[str], filename: str) -> Iterator[str]:
+        """Convert unexpected errors raised while streaming into ExtractionFailedError"""
         try:
-            # Determine extraction method based on MIME type
-            if mime_type == 'application/pdf' or filename.lower().endswith('.pdf'):
-                return self._extract_pdf(file_content)
-            elif mime_type in ['text/plain', 'text/markdown'] or filename.lower().endswith(('.txt', '.md')):
-                return self._extract_text(file_content)
-            elif mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' or filename.lower().endswith('.docx'):
-                return self._extract_docx(file_content)
-            else:
-                raise UnsupportedFormatError(
-                    f"Unsupported file format: {mime_type} ({filename})"
-                )
-        except UnsupportedFormatError:
+            yield from segments
+        except TextExtractionError:
             raise
         except Exception as e:
             logger.error(f"Text extraction failed for {filename}: {str(e)}")
@@ -80,113 +392,201 @@ class TextExtractionService:
                 f"Failed to extract text from {filename}: {str(e)}"
             )
 
-    def _extract_pdf(self, file_content: bytes) -> tuple[str, Dict[str, Any]]:
+    def _extract_pdf(self, file_content: FileSource, metadata: Dict[str, Any]) -> Iterator[str]:
         """
-        Extract text from PDF file
+        Extract text from PDF file, one page at a time
         
         Args:
-            file_content: PDF file bytes
+            file_content: PDF file bytes or file
+            metadata: Metadata dictionary to fill in
             
-        Returns:
-            Tuple of (extracted_text, metadata)
+        Yields:
+            Page text prefixed with a page marker
             
         Raises:
             ExtractionFailedError: If PDF extraction fails
         """
-        if PdfReader is None:
-            raise ExtractionFailedError(
-                "PyPDF2 is not installed. Cannot extract PDF text."
-            )
+        backend = get_pdf_backend()
         
         try:
-            pdf_file = io.BytesIO(file_content)
-            reader = PdfReader(pdf_file)
-            
-            # Extract text from all pages
-            text_parts = []
-            page_count = len(reader.pages)
-            
-            for page_num, page in enumerate(reader.pages, start=1):
-                try:
-                    page_text = page.extract_text()
-                    if page_text and page_text.strip():
-                        # Add page marker for metadata preservation
-                        text_parts.append(f"[PAGE {page_num}]\n{page_text}")
-                except Exception as page_error:
-                    logger.warning(f"Failed to extract text from page {page_num}: {page_error}")
-                    continue
-            
-            if not text_parts:
-                raise ExtractionFailedError("No text could be extracted from PDF")
+            document = backend(file_content)
+            page_count = document.page_count
             
-            full_text = "\n\n".join(text_parts)
-            
-            metadata = {
+            metadata.update({
                 "format": "pdf",
+                "pdf_backend": backend.name,
                 "page_count": page_count,
-                "extracted_pages": len(text_parts)
-            }
-            
-            return full_text, metadata
-            
-        except ExtractionFailedError:
-            raise
+                "extracted_pages": 0
+            })
         except Exception as e:
             raise ExtractionFailedError(f"PDF extraction failed: {str(e)}")
+        
+        with document:
+            if self._use_parallel_pdf(page_count):
+                page_texts = self._extract_pdf_pages_parallel(backend, file_content, page_count)
+            else:
+                page_texts = self._extract_pdf_pages(document)
+            
+            for page_num, page_text in page_texts:
+                if page_text and page_text.strip():
+                    # Add page marker for metadata preservation
+                    separator = "\n\n" if metadata["extracted_pages"] else ""
+                    metadata["extracted_pages"] += 1
+                    yield f"{separator}[PAGE {page_num}]\n{page_text}"
+        
+        if not metadata["extracted_pages"]:
+            raise ExtractionFailedError("No text could be extracted from PDF")
+
+    def _extract_pdf_pages(self, document: PdfBackend) -> Iterator[tuple[int, Optional[str]]]:
+        """Extract text from all pages in the current process"""
+        for index in range(document.page_count):
+            yield index + 1, _extract_page_text(document, index)
+
+    def _use_parallel_pdf(self, page_count: int) -> bool:
+        """Decide whether a PDF is large enough to fan out to worker processes"""
+        return settings.PDF_EXTRACTION_WORKERS >= 2 and page_count >= settings.PDF_PARALLEL_MIN_PAGES
+
+    def _extract_pdf_pages_parallel(
+        self,
+        backend: Type[PdfBackend],
+        file_content: FileSource,
+        page_count: int
+    ) -> Iterator[tuple[int, Optional[str]]]:
+        """
+        Extract text from page ranges in a process pool, yielding pages in order
+        
+        The PDF is written once to a temporary file that each worker opens with
+        its own backend instance. Only a bounded number of ranges is in
+        flight, so finished text does not pile up ahead of the consumer.
+        
+        The pool is billiard's (Celery's multiprocessing fork), which unlike
+        concurrent.futures can start processes from the daemonic children of
+        a prefork Celery worker.
+        """
+        workers = settings.PDF_EXTRACTION_WORKERS
+        pages_per_range = max(
+            settings.PDF_PAGES_PER_TASK,
+            -(-page_count // (workers * 4))
+        )
+        ranges = [
+            (start, min(start + pages_per_range, page_count))
+            for start in range(0, page_count, pages_per_range)
+        ]
+        
+        logger.info(
+            f"Extracting {page_count} PDF pages in {len(ranges)} ranges "
+            f"across {workers} processes"
+        )
+        
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            if isinstance(file_content, (bytes, bytearray)):
+                tmp.write(file_content)
+            else:
+                file_content.seek(0)
+                shutil.copyfileobj(file_content, tmp)
+            pdf_path = tmp.name
+        
+        pool = Pool(processes=workers)
+        try:
+            pending: deque = deque()
+            next_range = 0
+            
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < workers * 2:
+                    start, end = ranges[next_range]
+                    pending.append(pool.apply_async(
+                        _extract_pdf_page_range, (backend.name, pdf_path, start, end)
+                    ))
+                    next_range += 1
+                
+                yield from pending.popleft().get()
+        finally:
+            pool.terminate()
+            pool.join()
+            os.unlink(pdf_path)
 
-    def _extract_text(self, file_content: bytes) -> tuple[str, Dict[str, Any]]:
+    def _extract_text(self, file_content: FileSource, metadata: Dict[str, Any]) -> Iterator[str]:
         """
         Extract text from plain text file
         
+        The file is decoded incrementally, so neither the raw bytes nor the
+        decoded text need to fit in memory at once.
+        
         Args:
-            file_content: Text file bytes
+            file_content: Text file bytes or file
+            metadata: Metadata dictionary to fill in
             
-        Returns:
-            Tuple of (extracted_text, metadata)
+        Yields:
+            Blocks of whole lines
             
         Raises:
             ExtractionFailedError: If text extraction fails
         """
-        try:
+        with _map_file(file_content) as data:
             # Try UTF-8 first, then fall back to other encodings
             encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
             
             for encoding in encodings:
                 try:
-                    text = file_content.decode(encoding)
-                    
-                    if not text.strip():
-                        raise ExtractionFailedError("File is empty or contains no text")
-                    
-                    metadata = {
-                        "format": "text",
-                        "encoding": encoding,
-                        "char_count": len(text)
-                    }
-                    
-                    return text, metadata
-                    
+                    has_text = any(
+                        block.strip() for block in self._decode_blocks(data, encoding)
+                    )
+                    break
                 except UnicodeDecodeError:
                     continue
+            else:
+                raise ExtractionFailedError(
+                    "Could not decode text file with any supported encoding"
+                )
             
-            raise ExtractionFailedError(
-                "Could not decode text file with any supported encoding"
-            )
+            if not has_text:
+                raise ExtractionFailedError("File is empty or contains no text")
             
-        except ExtractionFailedError:
-            raise
-        except Exception as e:
-            raise ExtractionFailedError(f"Text extraction failed: {str(e)}")
+            metadata.update({
+                "format": "text",
+                "encoding": encoding,
+                "char_count": 0
+            })
+            
+            # Yield blocks of whole lines so the chunker never holds the full text
+            pending = ""
+            
+            for block in self._decode_blocks(data, encoding):
+                metadata["char_count"] += len(block)
+                lines = (pending + block).splitlines(keepends=True)
+                
+                # The last line may continue in the next block
+                pending = lines.pop() if lines and not lines[-1].endswith(('\n', '\r')) else ""
+                if lines:
+                    yield "".join(lines)
+            
+            if pending:
+                yield pending
 
-    def _extract_docx(self, file_content: bytes) -> tuple[str, Dict[str, Any]]:
+    def _decode_blocks(self, data: Union[bytes, mmap.mmap], encoding: str) -> Iterator[str]:
+        """Incrementally decode a buffer in blocks of about text_block_chars bytes"""
+        decoder = codecs.getincrementaldecoder(encoding)()
+        view = memoryview(data)
+        
+        try:
+            for start in range(0, len(view), self.text_block_chars):
+                end = start + self.text_block_chars
+                text = decoder.decode(view[start:end], final=end >= len(view))
+                if text:
+                    yield text
+        finally:
+            view.release()
+
+    def _extract_docx(self, file_content: FileSource, metadata: Dict[str, Any]) -> Iterator[str]:
         """
-        Extract text from DOCX file
+        Extract text from DOCX file, one paragraph at a time
         
         Args:
-            file_content: DOCX file bytes
+            file_content: DOCX file bytes or file
+            metadata: Metadata dictionary to fill in
             
-        Returns:
-            Tuple of (extracted_text, metadata)
+        Yields:
+            Paragraph text
             
         Raises:
             ExtractionFailedError: If DOCX extraction fails
@@ -197,35 +597,30 @@ class TextExtractionService:
             )
         
         try:
-            docx_file = io.BytesIO(file_content)
+            if isinstance(file_content, (bytes, bytearray)):
+                docx_file = io.BytesIO(file_content)
+            else:
+                docx_file = file_content
+                docx_file.seek(0)
             doc = Document(docx_file)
-            
-            # Extract text from all paragraphs
-            text_parts = []
-            paragraph_count = 0
-            
-            for para in doc.paragraphs:
-                para_text = para.text.strip()
-                if para_text:
-                    text_parts.append(para_text)
-                    paragraph_count += 1
-            
-            if not text_parts:
-                raise ExtractionFailedError("No text could be extracted from DOCX")
-            
-            full_text = "\n\n".join(text_parts)
-            
-            metadata = {
-                "format": "docx",
-                "paragraph_count": paragraph_count
-            }
-            
-            return full_text, metadata
-            
-        except ExtractionFailedError:
-            raise
         except Exception as e:
             raise ExtractionFailedError(f"DOCX extraction failed: {str(e)}")
+        
+        metadata.update({
+            "format": "docx",
+            "paragraph_count": 0
+        })
+        
+        # Extract text from all paragraphs
+        for para in doc.paragraphs:
+            para_text = para.text.strip()
+            if para_text:
+                separator = "\n\n" if metadata["paragraph_count"] else ""
+                metadata["paragraph_count"] += 1
+                yield f"{separator}{para_text}"
+        
+        if not metadata["paragraph_count"]:
+            raise ExtractionFailedError("No text could be extracted from DOCX")
 
 
 # Singleton instance
@@ -0,0 +1,170 @@
+"""Semantic search over chunk embeddings"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from supabase import Client
+
+from app.core.config import settings
+from app.services.auth import auth_service
+from app.services.embedding import embedding_service
+
+
+logger = logging.getLogger(__name__)
+
+
+class VectorSearchError(Exception):
+    """Base exception for vector search errors"""
+    pass
+
+
+class VectorSearchService:
+    """
+    Nearest-neighbour chunk search through the match_chunks database function
+
+    With a quantized index (EMBEDDING_INDEX_PRECISION half or binary) the index
+    returns `rerank_factor` times as many candidates as requested, which are
+    re-ranked by full-precision cosine distance when rerank is enabled.
+
+    Notebooks with at most exact_scan_max_chunks chunks, or without their own
+    index yet, are scanned exactly; larger ones are searched through their
+    partial HNSW index (see sync_vector_indexes). ef_search sets how many
+    candidates HNSW explores per query: callers pick a profile, "chat" for
+    latency or "study" for recall, or pass a value directly.
+
+    Query embeddings are only compared with chunks embedded by the same model.
+    While chunks are being backfilled to a new model, search_text also queries
+    every model in EMBEDDING_PREVIOUS_MODELS and merges the results.
+    """
+
+    def __init__(self):
+        """Initialize with Supabase client and index settings"""
+        self.supabase: Client = auth_service.supabase
+        self.index_precision = settings.EMBEDDING_INDEX_PRECISION
+        self.rerank = settings.EMBEDDING_RERANK
+        self.rerank_factor = max(settings.EMBEDDING_RERANK_FACTOR, 1)
+        self.exact_scan_max_chunks = settings.VECTOR_EXACT_SCAN_MAX_CHUNKS
+        self.ef_search_profiles = {
+            "chat": settings.HNSW_EF_SEARCH_CHAT,
+            "study": settings.HNSW_EF_SEARCH_STUDY,
+        }
+        self.previous_models = settings.embedding_previous_models_list
+
+    async def search(
+        self,
+        notebook_id: str,
+        query_embedding: List[float],
+        limit: int = 10,
+        rerank: Optional[bool] = None,
+        embedding_model: Optional[str] = None,
+        ef_search: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Find the chunks of a notebook closest to a query embedding
+
+        Args:
+            notebook_id: Notebook UUID
+            query_embedding: Query embedding (retrieval_query task type)
+            limit: Number of chunks to return
+            rerank: Override full-precision re-ranking for quantized indexes
+            embedding_model: Model that produced query_embedding (defaults to
+                the current model); only chunks of this model are searched
+            ef_search: HNSW candidate list size (defaults to the chat profile)
+
+        Returns:
+            Chunk dictionaries (id, material_id, content, chunk_index, metadata,
+            similarity), most similar first
+
+        Raises:
+            VectorSearchError: If the search fails
+        """
+        return await asyncio.to_thread(
+            self.match, notebook_id, query_embedding, limit, rerank, embedding_model, ef_search
+        )
+
+    async def search_text(
+        self,
+        notebook_id: str,
+        query: str,
+        limit: int = 10,
+        ef_search: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Embed a query and find the closest chunks of a notebook
+
+        Args:
+            notebook_id: Notebook UUID
+            query: Natural-language query
+            limit: Number of chunks to return
+            ef_search: HNSW candidate list size (defaults to the chat profile)
+
+        Returns:
+            Chunk dictionaries, most similar first
+        """
+        return await asyncio.to_thread(self.match_text, notebook_id, query, limit, ef_search)
+
+    def match(
+        self,
+        notebook_id: str,
+        query_embedding: List[float],
+        limit: int = 10,
+        rerank: Optional[bool] = None,
+        embedding_model: Optional[str] = None,
+        ef_search: Optional[int] = None
+    ) -> list[dict]:
+        """Blocking implementation of search, for callers running it in a thread"""
+        rerank = self.rerank if rerank is None else rerank
+        ef_search = self.ef_search_profiles["chat"] if ef_search is None else ef_search
+        candidate_count = limit if self.index_precision == "full" else limit * self.rerank_factor
+
+        try:
+            response = self.supabase.rpc("match_chunks", {
+                "query_embedding": query_embedding,
+                "match_notebook_id": notebook_id,
+                "match_count": limit,
+                "candidate_count": candidate_count,
+                "index_precision": self.index_precision,
+                "rerank": rerank,
+                "match_embedding_model": embedding_model or embedding_service.model_name,
+                "exact_scan_threshold": self.exact_scan_max_chunks,
+                "ef_search": ef_search
+            }).execute()
+
+            return response.data or []
+
+        except Exception as e:
+            logger.error(f"Vector search failed for notebook {notebook_id}: {e}")
+            raise VectorSearchError(f"Failed to search chunks: {str(e)}")
+
+    def match_text(
+        self,
+        notebook_id: str,
+        query: str,
+        limit: int = 10,
+        ef_search: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Blocking implementation of search_text, for callers running it in a thread
+
+        With EMBEDDING_PREVIOUS_MODELS set, each model's results are merged by
+        similarity as is: scores from different models are compared directly,
+        which is an approximation that only lasts until the backfill finishes.
+        """
+        results = []
+        for model_name in [embedding_service.model_name, *self.previous_models]:
+            query_embedding = embedding_service.generate_query_embedding(query, model_name=model_name)
+            results.extend(self.match(
+                notebook_id, query_embedding, limit=limit, embedding_model=model_name,
+                ef_search=ef_search
+            ))
+
+        if not self.previous_models:
+            return results
+
+        # Each chunk carries exactly one model's embedding, so result sets are disjoint
+        results.sort(key=lambda chunk: chunk["similarity"], reverse=True)
+        return results[:limit]
+
+
+# Singleton instance
+vector_search_service = VectorSearchService()
@@ -1,4 +1,16 @@
 """Celery tasks"""
-from app.tasks.material_processing import process_material
+from app.tasks.material_processing import (
+    process_material,
+    embed_material_shard,
+    finalize_material,
+    rechunk_material,
+    backfill_rechunk,
+    backfill_embeddings,
+    sync_vector_indexes,
+)
 
-__all__ = ["process_material"]
+__all__ = [
+    "process_material", "embed_material_shard", "finalize_material",
+    "rechunk_material", "backfill_rechunk", "backfill_embeddings",
+    "sync_vector_indexes"
+]
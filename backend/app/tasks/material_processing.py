@@ -1,21 +1,44 @@
 """Material processing Celery tasks"""
+import hashlib
+import io
 import logging
-from typing import Dict, Any
-from celery import Task
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import tempfile
+import uuid
+from array import array
+from itertools import chain, islice
+from typing import BinaryIO, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import quote
+
+import httpx
+from celery import Task, chord
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
 from supabase import Client, create_client
 
 from app.core.celery_app import celery_app
 from app.core.config import settings
+from app.db.copy import CHUNK_COPY_SQL, ChunkRow, encode_chunk_rows
 from app.services.text_extraction import text_extraction_service, TextExtractionError
-from app.services.text_chunking import text_chunking_service, ChunkingError
+from app.services.text_chunking import text_chunking_service, ChunkingError, TextChunk
 from app.services.embedding import embedding_service, EmbeddingError
+from app.services.embedding_cache import content_hash, embedding_cache
+from app.services.near_duplicates import drop_near_duplicate_chunks, strip_page_boilerplate
+from app.services.processing_checkpoint import ChunkBatch, ProcessingCheckpoint, load_checkpoint
+from app.tasks.routing import LARGE_MATERIALS_QUEUE, MAX_PRIORITY, material_queue_router
+from app.tasks.vector_indexes import (
+    NOTEBOOK_INDEX_PREFIX,
+    create_notebook_index_sql,
+    notebook_index_options,
+    parse_notebook_index_name,
+    plan_vector_indexes
+)
 from app.models.material import ProcessingStatus
 
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 # Database session for Celery tasks
 engine = create_engine(settings.DATABASE_URL_SYNC)
@@ -26,6 +49,25 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 supabase_client: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
 
+# Storage download settings
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = httpx.Timeout(30.0, read=120.0)
+
+# Chunks embedded and stored per step of the streaming pipeline
+STREAM_BATCH_SIZE = embedding_service.batch_size * embedding_service.max_concurrency
+
+# Chunker and duplicate-suppression configuration recorded on every stored chunk
+CHUNKER_VERSION = (
+    f"{text_chunking_service.config_version}:"
+    f"dup{settings.BOILERPLATE_MIN_PAGES}/{settings.NEAR_DUPLICATE_MAX_DISTANCE}"
+)
+
+# Configuration that determines a material's chunks and embeddings, as
+# "{embedding model}|{chunker version}"; identical uploads only share chunks when
+# this matches, and the re-chunk backfill picks up other chunker versions
+PROCESSING_SIGNATURE = f"{embedding_service.model_name}|{CHUNKER_VERSION}"
+
+
 class MaterialProcessingTask(Task):
     """Base task for material processing with error handling"""
     
@@ -56,6 +98,7 @@ def process_material(self, material_id: str) -> Dict[str, Any]:
     logger.info(f"Starting material processing for material_id={material_id}")
     
     db = SessionLocal()
+    file_content = None
     
     try:
         # Update status to processing
@@ -71,68 +114,52 @@ def process_material(self, material_id: str) -> Dict[str, Any]:
             f"({material_info['mime_type']}, {material_info['file_size']} bytes)"
         )
         
-        # Step 2: Download file from Supabase Storage
-        file_content = _download_file_from_storage(material_info['file_path'])
-        
-        # Step 3: Extract text from file
-        logger.info("Extracting text from file...")
-        extracted_text, extraction_metadata = text_extraction_service.extract_text(
-            file_content=file_content,
-            mime_type=material_info['mime_type'],
-            filename=material_info['filename']
-        )
-        
-        logger.info(
-            f"Text extraction complete: {len(extracted_text)} characters, "
-            f"metadata: {extraction_metadata}"
-        )
-        
-        # Step 4: Chunk text
-        logger.info("Chunking text...")
-        chunks = text_chunking_service.chunk_text(
-            text=extracted_text,
-            material_metadata=extraction_metadata
-        )
-        
-        logger.info(f"Created {len(chunks)} chunks")
-        
-        # Step 5: Generate embeddings for all chunks
-        logger.info("Generating embeddings...")
-        chunk_texts = [chunk.content for chunk in chunks]
-        embeddings = embedding_service.generate_embeddings_batch(
-            texts=chunk_texts,
-            retry_on_failure=True
-        )
-        
-        # Count successful embeddings
-        successful_embeddings = sum(1 for e in embeddings if e is not None)
-        logger.info(
-            f"Generated {successful_embeddings}/{len(chunks)} embeddings"
-        )
-        
-        # Step 6: Store chunks and embeddings in database
-        logger.info("Storing chunks in database...")
-        stored_count = _store_chunks(
-            material_id=material_id,
-            chunks=chunks,
-            embeddings=embeddings
-        )
+        # Progress of earlier attempts: embedded batches are replayed rather
+        # than re-embedded, and chunks already in the database are kept
+        checkpoint = load_checkpoint(material_id)
         
-        logger.info(f"Stored {stored_count} chunks in database")
+        if checkpoint.is_embedded:
+            # Every chunk was embedded by an earlier attempt, so the file is not needed
+            logger.info("All chunks embedded by an earlier attempt, resuming at storage")
+            extraction_metadata = checkpoint.extraction_metadata
+            batches = checkpoint.iter_batches()
+        else:
+            # Step 2: Download file from Supabase Storage to a temporary file
+            file_content, file_hash = _download_file_from_storage(material_info['file_path'])
+            _update_material_status(
+                material_id, ProcessingStatus.PROCESSING, {"content_hash": file_hash}
+            )
+            
+            # Identical bytes already processed with the same configuration:
+            # copy that material's chunks instead of recomputing them
+            source_material_id = _find_processed_duplicate(material_id, file_hash)
+            if source_material_id:
+                result = _clone_processed_duplicate(db, material_id, source_material_id)
+                if result:
+                    checkpoint.clear()
+                    return result
+            
+            checkpoint.begin(file_hash)
+            
+            # Steps 3-5 run as a stream: extraction yields pages, the chunker yields
+            # chunks as token windows fill, and chunks are embedded in bounded
+            # batches, so memory does not grow with document size
+            logger.info("Extracting, chunking and embedding text...")
+            chunk_stream, extraction_metadata = _chunk_stream(file_content, material_info)
+            
+            # Large materials are embedded by sub-tasks across the worker fleet
+            if _should_fan_out(checkpoint):
+                chunk_stream, is_large = _peek_large(chunk_stream)
+                if is_large:
+                    return _fan_out_embedding(
+                        material_id, chunk_stream, extraction_metadata, checkpoint
+                    )
+            
+            batches = _embed_batches(chunk_stream, extraction_metadata, checkpoint)
         
+        # Step 6: Store batches as they are embedded
         # Step 7: Update material status to completed
-        _update_material_status(material_id, ProcessingStatus.COMPLETED)
-        
-        result = {
-            "material_id": material_id,
-            "status": "completed",
-            "chunks_created": stored_count,
-            "embeddings_generated": successful_embeddings,
-            "extraction_metadata": extraction_metadata
-        }
-        
-        logger.info(f"Material processing complete: {result}")
-        return result
+        return _store_and_complete(material_id, batches, extraction_metadata, checkpoint)
         
     except TextExtractionError as e:
         logger.error(f"Text extraction failed for material {material_id}: {e}")
@@ -155,14 +182,639 @@ def process_material(self, material_id: str) -> Dict[str, Any]:
         raise
         
     finally:
+        if file_content is not None:
+            file_content.close()
         db.close()
 
 
+@celery_app.task(
+    base=MaterialProcessingTask,
+    bind=True,
+    name="app.tasks.embed_material_shard"
+)
+def embed_material_shard(
+    self,
+    material_id: str,
+    file_hash: str,
+    shard_index: int
+) -> Dict[str, Any]:
+    """
+    Embed one shard of a fanned-out material and write the embeddings back
+    
+    Args:
+        material_id: UUID of the material being processed
+        file_hash: sha256 of the file the shards were written under
+        shard_index: Index of the shard to embed
+        
+    Returns:
+        Shard statistics (chunks, embeddings and embedding cache counts)
+    """
+    checkpoint = load_checkpoint(material_id)
+    checkpoint.begin(file_hash)
+    
+    shard = checkpoint.get_shard(shard_index)
+    embeddings, cache_stats = _generate_embeddings([chunk.content for chunk in shard.chunks])
+    checkpoint.put_shard(shard_index, ChunkBatch(shard.chunks, embeddings, cache_stats))
+    
+    logger.info(
+        f"Embedded shard {shard_index} of material {material_id}: "
+        f"{sum(1 for e in embeddings if e is not None)}/{len(embeddings)} chunks"
+    )
+    return {"shard_index": shard_index, "chunks": len(shard.chunks)}
+
+
+@celery_app.task(
+    base=MaterialProcessingTask,
+    bind=True,
+    name="app.tasks.finalize_material"
+)
+def finalize_material(
+    self,
+    shard_results: List[Dict[str, Any]],
+    material_id: str,
+    file_hash: str,
+    extraction_metadata: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Chord callback: store every embedded shard and complete the material
+    
+    Args:
+        shard_results: Results of the embed_material_shard tasks
+        material_id: UUID of the material being processed
+        file_hash: sha256 of the file the shards were written under
+        extraction_metadata: Metadata from text extraction
+        
+    Returns:
+        Processing result dictionary
+    """
+    checkpoint = load_checkpoint(material_id)
+    checkpoint.begin(file_hash)
+    
+    try:
+        batches = (checkpoint.get_shard(i) for i in range(len(shard_results)))
+        return _store_and_complete(material_id, batches, extraction_metadata, checkpoint)
+        
+    except Exception as e:
+        logger.error(f"Storing fanned-out material {material_id} failed: {e}")
+        _update_material_status(material_id, ProcessingStatus.FAILED)
+        raise
+
+
+@celery_app.task(name="app.tasks.mark_material_failed")
+def mark_material_failed(request, exc, traceback, material_id: str) -> None:
+    """Error callback of the fan-out chord: a shard failed after all its retries"""
+    logger.error(f"Embedding shard failed for material {material_id}: {exc}")
+    _update_material_status(material_id, ProcessingStatus.FAILED)
+
+
+@celery_app.task(
+    base=MaterialProcessingTask,
+    bind=True,
+    name="app.tasks.rechunk_material"
+)
+def rechunk_material(self, material_id: str) -> Dict[str, Any]:
+    """
+    Re-chunk a completed material under the current chunker configuration
+    
+    The material stays completed and its existing chunks stay searchable while
+    the new version is written; chunks of the old version are deleted only once
+    the new one is stored. Embeddings of old chunks whose text is unchanged are
+    reused when they were produced by the current embedding model.
+    
+    Args:
+        material_id: UUID of the material to re-chunk
+        
+    Returns:
+        Processing result dictionary, or a skip reason
+    """
+    material_info = _get_material_info(material_id)
+    if not material_info or material_info.get("processing_status") != ProcessingStatus.COMPLETED.value:
+        logger.info(f"Skipping re-chunk of material {material_id}: not completed")
+        return {"material_id": material_id, "status": "skipped"}
+    
+    signature = material_info.get("processing_signature")
+    if (signature or "").split("|", 1)[-1] == CHUNKER_VERSION:
+        logger.info(f"Skipping re-chunk of material {material_id}: already current")
+        return {"material_id": material_id, "status": "skipped"}
+    
+    reuse = _load_reusable_embeddings(material_id)
+    
+    logger.info(
+        f"Re-chunking material {material_id} ({signature or 'unversioned'} -> "
+        f"{PROCESSING_SIGNATURE}), {len(reuse)} embeddings reusable"
+    )
+    
+    # Re-chunking is not checkpointed: a failed attempt leaves the old chunks
+    # in place and the next attempt starts over
+    checkpoint = ProcessingCheckpoint(None, material_id)
+    file_content, _ = _download_file_from_storage(material_info['file_path'])
+    
+    try:
+        chunk_stream, extraction_metadata = _chunk_stream(file_content, material_info)
+        batches = _embed_batches(chunk_stream, extraction_metadata, checkpoint, reuse=reuse)
+        result = _store_and_complete(material_id, batches, extraction_metadata, checkpoint)
+        
+    finally:
+        file_content.close()
+    
+    result["embeddings_reused"] = result["embedding_cache"].get("reused", 0)
+    return result
+
+
+@celery_app.task(name="app.tasks.backfill_rechunk")
+def backfill_rechunk(after: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Queue re-chunking of completed materials processed under another chunker configuration
+    
+    Materials are walked in id order, RECHUNK_BACKFILL_BATCH_SIZE at a time, and
+    spaced RECHUNK_MATERIALS_PER_MINUTE apart on the large-materials queue at the
+    lowest priority, so user uploads are never starved. The task reschedules
+    itself for the next page once the current one has been released.
+    
+    Args:
+        after: Material id to continue after (None starts from the beginning)
+        
+    Returns:
+        Number of materials queued and the id to continue after
+    """
+    batch_size = max(settings.RECHUNK_BACKFILL_BATCH_SIZE, 1)
+    interval = 60.0 / max(settings.RECHUNK_MATERIALS_PER_MINUTE, 1)
+    
+    with SessionLocal() as db:
+        material_ids = db.execute(
+            text(
+                "SELECT id::text FROM materials "
+                "WHERE processing_status = 'completed' "
+                "AND split_part(processing_signature, '|', 2) IS DISTINCT FROM :chunker_version "
+                "AND (CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)) "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"chunker_version": CHUNKER_VERSION, "after": after, "limit": batch_size}
+        ).scalars().all()
+    
+    for i, material_id in enumerate(material_ids):
+        rechunk_material.apply_async(
+            args=[material_id],
+            queue=LARGE_MATERIALS_QUEUE,
+            priority=MAX_PRIORITY,
+            countdown=i * interval
+        )
+    
+    if len(material_ids) == batch_size:
+        backfill_rechunk.apply_async(
+            kwargs={"after": material_ids[-1]},
+            countdown=len(material_ids) * interval
+        )
+    
+    logger.info(f"Queued re-chunking of {len(material_ids)} materials after {after}")
+    return {"queued": len(material_ids), "after": material_ids[-1] if material_ids else None}
+
+
+@celery_app.task(
+    base=MaterialProcessingTask,
+    bind=True,
+    name="app.tasks.backfill_embeddings"
+)
+def backfill_embeddings(self, after: Optional[str] = None, passes: int = 0) -> Dict[str, Any]:
+    """
+    Re-embed chunks produced by another embedding model, one page at a time
+    
+    Chunks are walked in id order, EMBEDDING_BACKFILL_BATCH_SIZE at a time, and
+    each is updated in place together with its embedding_model tag. Search only
+    compares a query with chunks of the query's model and also queries the
+    models in EMBEDDING_PREVIOUS_MODELS, so every chunk stays searchable while
+    the backfill runs. The task reschedules itself on the large-materials queue
+    at the lowest priority, paced by EMBEDDING_BACKFILL_CHUNKS_PER_MINUTE.
+    
+    Chunks whose embedding failed are passed over; when a pass ends with such
+    chunks left, another pass starts from the beginning, up to
+    EMBEDDING_BACKFILL_MAX_PASSES. Material signatures are only moved to the
+    new model once no chunk of another model remains.
+    
+    Args:
+        after: Chunk id to continue after (None starts from the beginning)
+        passes: Passes over the table already completed
+        
+    Returns:
+        Number of chunks re-embedded and the id to continue after
+    """
+    batch_size = max(settings.EMBEDDING_BACKFILL_BATCH_SIZE, 1)
+    model_name = embedding_service.model_name
+    
+    with SessionLocal() as db:
+        rows = db.execute(
+            text(
+                "SELECT id::text, content FROM chunks "
+                "WHERE embedding IS NOT NULL "
+                "AND embedding_model IS DISTINCT FROM :embedding_model "
+                "AND (CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)) "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"embedding_model": model_name, "after": after, "limit": batch_size}
+        ).all()
+        
+        if not rows and after is not None:
+            # The pass has ended, but it skipped chunks whose embedding failed
+            remaining = db.execute(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM chunks WHERE embedding IS NOT NULL "
+                    "AND embedding_model IS DISTINCT FROM :embedding_model)"
+                ),
+                {"embedding_model": model_name}
+            ).scalar()
+            
+            if remaining:
+                passes += 1
+                if passes >= settings.EMBEDDING_BACKFILL_MAX_PASSES:
+                    logger.error(
+                        f"Embedding backfill to {model_name} left chunks on other models after "
+                        f"{passes} passes; keep EMBEDDING_PREVIOUS_MODELS and queue it again"
+                    )
+                    return {"updated": 0, "after": None, "passes": passes}
+                
+                backfill_embeddings.apply_async(
+                    kwargs={"after": None, "passes": passes},
+                    queue=LARGE_MATERIALS_QUEUE,
+                    priority=MAX_PRIORITY,
+                    countdown=batch_size * 60.0 / max(settings.EMBEDDING_BACKFILL_CHUNKS_PER_MINUTE, 1)
+                )
+                logger.warning(f"Embedding backfill to {model_name} retrying failed chunks (pass {passes + 1})")
+                return {"updated": 0, "after": None, "passes": passes}
+        
+        if not rows:
+            # Every chunk is on the new model, so completed materials can be
+            # deduplicated against under the new processing signature
+            db.execute(
+                text(
+                    "UPDATE materials SET processing_signature = "
+                    ":embedding_model || '|' || split_part(processing_signature, '|', 2) "
+                    "WHERE processing_status = 'completed' "
+                    "AND split_part(processing_signature, '|', 1) <> :embedding_model"
+                ),
+                {"embedding_model": model_name}
+            )
+            db.commit()
+            logger.info(f"Embedding backfill to {model_name} complete")
+            return {"updated": 0, "after": None}
+        
+        embeddings, cache_stats = _generate_embeddings([content for _, content in rows])
+        
+        # Rows re-chunked or deleted meanwhile are simply not matched
+        updates = [
+            {
+                "id": chunk_id,
+                "embedding": "[" + ",".join(map(str, embedding)) + "]",
+                "embedding_model": model_name
+            }
+            for (chunk_id, _), embedding in zip(rows, embeddings)
+            if embedding is not None
+        ]
+        if updates:
+            db.execute(
+                text(
+                    "UPDATE chunks SET embedding = CAST(:embedding AS vector), "
+                    "embedding_model = :embedding_model "
+                    "WHERE id = CAST(:id AS uuid) "
+                    "AND embedding_model IS DISTINCT FROM :embedding_model"
+                ),
+                updates
+            )
+            db.commit()
+    
+    last_id = rows[-1][0]
+    backfill_embeddings.apply_async(
+        kwargs={"after": last_id, "passes": passes},
+        queue=LARGE_MATERIALS_QUEUE,
+        priority=MAX_PRIORITY,
+        countdown=len(rows) * 60.0 / max(settings.EMBEDDING_BACKFILL_CHUNKS_PER_MINUTE, 1)
+    )
+    
+    logger.info(
+        f"Re-embedded {len(updates)}/{len(rows)} chunks with {model_name} "
+        f"(cache: {cache_stats}), continuing after {last_id}"
+    )
+    return {"updated": len(updates), "after": last_id}
+
+
+@celery_app.task(name="app.tasks.sync_vector_indexes")
+def sync_vector_indexes(notebook_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Create or drop per-notebook partial HNSW indexes on chunks.embedding
+    
+    match_chunks scans notebooks of up to VECTOR_EXACT_SCAN_MAX_CHUNKS chunks
+    exactly and searches larger ones through their own partial index, so a
+    notebook's search never probes the whole table. Indexes are built and
+    dropped CONCURRENTLY, so uploads and searches are not blocked; until a
+    notebook's index is valid its searches stay exact. Indexes built with
+    other HNSW_M/HNSW_EF_CONSTRUCTION values are rebuilt.
+    
+    Args:
+        notebook_id: Notebook to check after its materials changed (None
+            checks every notebook and removes indexes of deleted notebooks)
+        
+    Notebooks are synced under a per-notebook advisory lock, and a notebook
+    another sync holds is skipped: its index may still be building, which
+    reads as invalid, and would otherwise be dropped and rebuilt.
+    
+    Returns:
+        Names of the indexes created and dropped, and ids of skipped notebooks
+    """
+    precision = settings.EMBEDDING_INDEX_PRECISION
+    options = notebook_index_options(settings.HNSW_M, settings.HNSW_EF_CONSTRUCTION)
+    threshold = settings.VECTOR_EXACT_SCAN_MAX_CHUNKS
+    created: List[str] = []
+    dropped: List[str] = []
+    skipped: List[str] = []
+    
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        existing = _notebook_vector_indexes(connection, options, notebook_id)
+        
+        if notebook_id is None:
+            chunk_counts = dict(connection.execute(
+                text("SELECT notebook_id::text, count(*) FROM chunks GROUP BY notebook_id")
+            ).all())
+        else:
+            chunk_counts = {notebook_id: connection.execute(
+                text("SELECT count(*) FROM chunks WHERE notebook_id = CAST(:notebook_id AS uuid)"),
+                {"notebook_id": notebook_id}
+            ).scalar()}
+        
+        plan = plan_vector_indexes(chunk_counts, existing, precision, threshold)
+        notebook_ids = sorted(
+            {parse_notebook_index_name(name)[0] for name in plan.drop}
+            | {index_notebook_id for _, index_notebook_id in plan.create}
+        )
+        
+        for index_notebook_id in notebook_ids:
+            # A build in progress reads as an invalid index, so a second sync of the
+            # same notebook would drop and rebuild it; whoever holds the lock owns it
+            lock = {"key": f"sync_vector_indexes:{uuid.UUID(index_notebook_id)}"}
+            if not connection.execute(text("SELECT pg_try_advisory_lock(hashtext(:key))"), lock).scalar():
+                logger.info(f"Vector indexes of notebook {index_notebook_id} are being synced elsewhere")
+                skipped.append(index_notebook_id)
+                continue
+            
+            try:
+                # Re-read under the lock: a build that just finished is valid now
+                notebook_plan = plan_vector_indexes(
+                    {index_notebook_id: chunk_counts.get(index_notebook_id, 0)},
+                    _notebook_vector_indexes(connection, options, index_notebook_id),
+                    precision,
+                    threshold
+                )
+                for name in notebook_plan.drop:
+                    connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+                    dropped.append(name)
+                for name, _ in notebook_plan.create:
+                    logger.info(
+                        f"Building vector index {name} ({chunk_counts[index_notebook_id]} chunks)"
+                    )
+                    connection.execute(text(create_notebook_index_sql(
+                        index_notebook_id, precision, settings.HNSW_M, settings.HNSW_EF_CONSTRUCTION
+                    )))
+                    created.append(name)
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), lock)
+    
+    return {"created": created, "dropped": dropped, "skipped": skipped}
+
+
+def _notebook_vector_indexes(
+    connection: Any,
+    options: List[str],
+    notebook_id: Optional[str] = None
+) -> Dict[str, bool]:
+    """Usable flag per partial vector index, of one notebook or of all of them"""
+    # Indexes built with other HNSW parameters count as unusable and are rebuilt
+    existing = dict(connection.execute(
+        text(
+            "SELECT i.relname, x.indisvalid AND "
+            "coalesce(i.reloptions, '{}') @> CAST(:options AS text[]) AND "
+            "coalesce(i.reloptions, '{}') <@ CAST(:options AS text[]) "
+            "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = 'chunks'::regclass AND starts_with(i.relname, :prefix)"
+        ),
+        {"prefix": NOTEBOOK_INDEX_PREFIX, "options": options}
+    ).all())
+    
+    if notebook_id is None:
+        return existing
+    notebook_hex = uuid.UUID(notebook_id).hex
+    return {name: valid for name, valid in existing.items() if name.endswith(notebook_hex)}
+
+
+def _store_and_complete(
+    material_id: str,
+    batches: Iterable[ChunkBatch],
+    extraction_metadata: Dict[str, Any],
+    checkpoint: ProcessingCheckpoint
+) -> Dict[str, Any]:
+    """
+    Store embedded batches, mark the material completed and build the result
+    
+    Chunks left behind by a failed attempt beyond the last checkpointed batch
+    are cleared first, and batches stored by that attempt are skipped. Chunks
+    of other chunker versions stay searchable until the new version is stored.
+    """
+    _delete_chunks(material_id, from_index=checkpoint.stored_chunks)
+    
+    chunk_count = 0
+    successful_embeddings = 0
+    stored_count = checkpoint.stored_count
+    cache_stats = {"hits": 0, "misses": 0}
+    
+    for batch in batches:
+        chunk_count += len(batch.chunks)
+        successful_embeddings += sum(1 for e in batch.embeddings if e is not None)
+        for key, count in batch.cache_stats.items():
+            cache_stats[key] = cache_stats.get(key, 0) + count
+        
+        if batch.end <= checkpoint.stored_chunks:
+            continue
+        
+        if any(e is not None for e in batch.embeddings):
+            stored_count += _store_chunks(
+                material_id=material_id,
+                chunks=batch.chunks,
+                embeddings=batch.embeddings
+            )
+        checkpoint.mark_stored(batch.end, stored_count)
+    
+    logger.info(
+        f"Text extraction complete, metadata: {extraction_metadata}"
+    )
+    logger.info(
+        f"Generated {successful_embeddings}/{chunk_count} embeddings, "
+        f"stored {stored_count} chunks in database"
+    )
+    
+    if stored_count == 0:
+        raise ValueError("No chunks with embeddings to store")
+    
+    _delete_stale_chunks(material_id)
+    _update_material_status(
+        material_id, ProcessingStatus.COMPLETED, {"processing_signature": PROCESSING_SIGNATURE}
+    )
+    checkpoint.clear()
+    
+    result = {
+        "material_id": material_id,
+        "status": "completed",
+        "chunks_created": stored_count,
+        "embeddings_generated": successful_embeddings,
+        "embedding_cache": cache_stats,
+        "deduplicated": False,
+        "near_duplicates": extraction_metadata.get("near_duplicates", {}),
+        "extraction_metadata": extraction_metadata
+    }
+    
+    logger.info(f"Material processing complete: {result}")
+    return result
+
+
+def _find_processed_duplicate(material_id: str, file_hash: str) -> Optional[str]:
+    """Find a completed material with the same file content and processing configuration"""
+    try:
+        response = supabase_client.table("materials").select("id").eq(
+            "content_hash", file_hash
+        ).eq("processing_signature", PROCESSING_SIGNATURE).eq(
+            "processing_status", ProcessingStatus.COMPLETED.value
+        ).neq("id", material_id).limit(1).execute()
+        
+        return response.data[0]["id"] if response.data else None
+        
+    except Exception as e:
+        logger.warning(f"Duplicate material lookup failed: {e}")
+        return None
+
+
+def _clone_processed_duplicate(
+    db: Session,
+    material_id: str,
+    source_material_id: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Copy the chunks and embeddings of an identical material and complete this one
+    
+    The copy is a single INSERT ... SELECT, so no chunk data leaves the database.
+    
+    Returns:
+        Processing result, or None if nothing was cloned and the material
+        should be processed normally
+    """
+    try:
+        db.execute(
+            text("DELETE FROM chunks WHERE material_id = :material_id"),
+            {"material_id": material_id}
+        )
+        cloned = db.execute(
+            text(
+                "INSERT INTO chunks (id, material_id, content, embedding, chunk_index, metadata, "
+                "chunker_version, embedding_model, created_at) "
+                "SELECT gen_random_uuid(), :material_id, content, embedding, chunk_index, metadata, "
+                "chunker_version, embedding_model, now() "
+                "FROM chunks WHERE material_id = :source_material_id"
+            ),
+            {"material_id": material_id, "source_material_id": source_material_id}
+        ).rowcount
+        
+        if not cloned:
+            db.rollback()
+            return None
+        
+        db.commit()
+        
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Cloning chunks from material {source_material_id} failed: {e}")
+        return None
+    
+    _update_material_status(
+        material_id, ProcessingStatus.COMPLETED, {"processing_signature": PROCESSING_SIGNATURE}
+    )
+    
+    result = {
+        "material_id": material_id,
+        "status": "completed",
+        "chunks_created": cloned,
+        "embeddings_generated": 0,
+        "deduplicated": True,
+        "dedup_source_material_id": source_material_id
+    }
+    
+    logger.info(f"Material processing complete (duplicate content): {result}")
+    return result
+
+
+def _should_fan_out(checkpoint: ProcessingCheckpoint) -> bool:
+    """Fan-out hands shards over through Redis and only starts from scratch"""
+    return (
+        settings.EMBEDDING_FANOUT_MIN_CHUNKS > 0
+        and checkpoint.enabled
+        and checkpoint.embedded_chunks == 0
+    )
+
+
+def _peek_large(chunk_stream: Iterator[TextChunk]) -> Tuple[Iterator[TextChunk], bool]:
+    """
+    Check whether a chunk stream reaches the fan-out threshold
+    
+    Returns:
+        Tuple of (stream including the peeked chunks, whether it is large)
+    """
+    head = list(islice(chunk_stream, settings.EMBEDDING_FANOUT_MIN_CHUNKS))
+    return chain(head, chunk_stream), len(head) >= settings.EMBEDDING_FANOUT_MIN_CHUNKS
+
+
+def _fan_out_embedding(
+    material_id: str,
+    chunk_stream: Iterable[TextChunk],
+    extraction_metadata: Dict[str, Any],
+    checkpoint: ProcessingCheckpoint
+) -> Dict[str, Any]:
+    """
+    Split chunk embedding into a chord of shard sub-tasks
+    
+    Shards are written to the checkpoint as the chunk stream is consumed; the
+    chord callback stores them in order and completes the material.
+    """
+    shard_count = 0
+    chunk_count = 0
+    
+    for shard_chunks in _batched(chunk_stream, settings.EMBEDDING_FANOUT_SHARD_SIZE):
+        checkpoint.put_shard(shard_count, ChunkBatch(shard_chunks, [None] * len(shard_chunks)))
+        shard_count += 1
+        chunk_count += len(shard_chunks)
+    
+    callback = finalize_material.s(
+        material_id, checkpoint.content_hash, extraction_metadata
+    ).on_error(mark_material_failed.s(material_id=material_id))
+    
+    chord([
+        embed_material_shard.s(material_id, checkpoint.content_hash, i)
+        for i in range(shard_count)
+    ])(callback)
+    
+    logger.info(
+        f"Fanned out {chunk_count} chunks of material {material_id} "
+        f"into {shard_count} embedding shards"
+    )
+    
+    return {
+        "material_id": material_id,
+        "status": "embedding",
+        "chunks_created": 0,
+        "chunks_queued": chunk_count,
+        "embedding_shards": shard_count,
+        "extraction_metadata": extraction_metadata
+    }
+
+
 def _get_material_info(material_id: str) -> Dict[str, Any]:
     """Get material information from database"""
     try:
         response = supabase_client.table("materials").select(
-            "id, filename, file_path, file_size, mime_type"
+            "id, filename, file_path, file_size, mime_type, processing_status, processing_signature"
         ).eq("id", material_id).execute()
         
         if response.data and len(response.data) > 0:
@@ -175,24 +827,220 @@ def _get_material_info(material_id: str) -> Dict[str, Any]:
         raise
 
 
-def _download_file_from_storage(file_path: str) -> bytes:
-    """Download file from Supabase Storage"""
+def _load_reusable_embeddings(material_id: str) -> Dict[str, array]:
+    """Current-model embeddings of a material's chunks from other chunker versions, by content hash"""
+    reuse = {}
+    with SessionLocal() as db:
+        rows = db.execute(
+            text(
+                "SELECT content, embedding::text FROM chunks "
+                "WHERE material_id = :material_id AND embedding_model = :embedding_model "
+                "AND chunker_version IS DISTINCT FROM :chunker_version"
+            ).execution_options(yield_per=STREAM_BATCH_SIZE),
+            {
+                "material_id": material_id,
+                "embedding_model": embedding_service.model_name,
+                "chunker_version": CHUNKER_VERSION
+            }
+        )
+        for content, embedding in rows:
+            reuse[content_hash(content)] = array("f", map(float, embedding[1:-1].split(",")))
+    return reuse
+
+
+def _chunk_stream(
+    file_content: BinaryIO,
+    material_info: Dict[str, Any]
+) -> Tuple[Iterator[TextChunk], Dict[str, Any]]:
+    """
+    Extract and chunk a material as a stream, suppressing repeated content
+    
+    Header/footer lines repeated across PDF pages are stripped before chunking
+    and chunks that nearly duplicate an earlier chunk are dropped, so neither
+    costs an embedding. Counts accumulate in extraction_metadata["near_duplicates"]
+    as the stream is consumed.
+    """
+    segments, extraction_metadata = text_extraction_service.extract_text_stream(
+        file_content=file_content,
+        mime_type=material_info['mime_type'],
+        filename=material_info['filename']
+    )
+    stats = extraction_metadata.setdefault("near_duplicates", {})
+    
+    if settings.BOILERPLATE_MIN_PAGES > 0:
+        segments = strip_page_boilerplate(segments, stats, min_pages=settings.BOILERPLATE_MIN_PAGES)
+    
+    chunk_stream = text_chunking_service.iter_chunks(
+        segments,
+        material_metadata=extraction_metadata
+    )
+    
+    if settings.NEAR_DUPLICATE_MAX_DISTANCE >= 0:
+        chunk_stream = drop_near_duplicate_chunks(
+            chunk_stream, stats, max_distance=settings.NEAR_DUPLICATE_MAX_DISTANCE
+        )
+    
+    return chunk_stream, extraction_metadata
+
+
+def _embed_batches(
+    chunk_stream: Iterable[TextChunk],
+    extraction_metadata: Dict[str, Any],
+    checkpoint: ProcessingCheckpoint,
+    reuse: Optional[Dict[str, Sequence[float]]] = None
+) -> Iterator[ChunkBatch]:
+    """
+    Embed chunks in bounded batches, checkpointing each batch
+    
+    Batches embedded by an earlier attempt are replayed from the checkpoint and
+    the matching chunks are skipped in the stream, which is deterministic for
+    the same file content. `reuse` maps content hashes to known embeddings.
+    """
+    for batch in checkpoint.iter_batches():
+        yield batch
+    
+    remaining = islice(chunk_stream, checkpoint.embedded_chunks, None)
+    
+    for chunk_batch in _batched(remaining, STREAM_BATCH_SIZE):
+        embeddings, cache_stats = _generate_embeddings(
+            [chunk.content for chunk in chunk_batch], reuse=reuse
+        )
+        batch = ChunkBatch(chunk_batch, embeddings, cache_stats)
+        checkpoint.add_batch(batch)
+        yield batch
+    
+    checkpoint.mark_embedded(extraction_metadata)
+
+
+def _download_file_from_storage(file_path: str) -> Tuple[BinaryIO, str]:
+    """
+    Stream a file from Supabase Storage into an unnamed temporary file
+    
+    The download is written to disk in fixed-size chunks, so memory use does
+    not depend on the file size. The caller must close the returned file.
+    
+    Returns:
+        Tuple of (file positioned at the start, sha256 hex digest of the content)
+    """
+    # file_path format: "user_id/material_id.ext" inside the "materials" bucket
+    url = f"{settings.SUPABASE_URL}/storage/v1/object/materials/{quote(file_path)}"
+    headers = {
+        "Authorization": f"Bearer {settings.SUPABASE_KEY}",
+        "apikey": settings.SUPABASE_KEY
+    }
+    max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+    
+    file = tempfile.TemporaryFile()
+    digest = hashlib.sha256()
+    
     try:
-        # Extract bucket and path
-        # file_path format: "materials/user_id/material_id/filename"
-        response = supabase_client.storage.from_("materials").download(file_path)
-        return response
+        downloaded = 0
+        
+        with httpx.stream("GET", url, headers=headers, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            
+            for data in response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                downloaded += len(data)
+                if downloaded > max_size:
+                    raise ValueError(f"File exceeds {settings.MAX_FILE_SIZE_MB}MB limit")
+                digest.update(data)
+                file.write(data)
+        
+        file.flush()
+        file.seek(0)
+        return file, digest.hexdigest()
         
     except Exception as e:
+        file.close()
         logger.error(f"Failed to download file from storage: {e}")
         raise ValueError(f"Failed to download file: {str(e)}")
 
 
-def _update_material_status(material_id: str, status: ProcessingStatus) -> None:
-    """Update material processing status"""
+def _batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Group an iterable into lists of at most size items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _generate_embeddings(
+    texts: List[str],
+    reuse: Optional[Dict[str, Sequence[float]]] = None
+) -> Tuple[List[Optional[List[float]]], Dict[str, int]]:
+    """
+    Generate document embeddings, calling Gemini only for cache misses
+    
+    Args:
+        texts: Chunk texts to embed
+        reuse: Known embeddings by content hash (e.g. a material's previous
+            chunks when re-chunking), checked before the cache
+    
+    Returns:
+        Tuple of (embeddings aligned with texts, {"hits": n, "misses": m}),
+        plus a "reused" count when reuse is given
+    """
+    model_name = embedding_service.model_name
+    task_type = embedding_service.document_task_type
+    
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    reused = 0
+    
+    if reuse:
+        for i, text in enumerate(texts):
+            known = reuse.get(content_hash(text))
+            if known is not None:
+                embeddings[i] = list(known)
+                reused += 1
+    
+    lookup_indices = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if lookup_indices:
+        cached = embedding_cache.get_many(model_name, task_type, [texts[i] for i in lookup_indices])
+        for i, embedding in zip(lookup_indices, cached):
+            embeddings[i] = embedding
+    
+    miss_indices = [
+        i for i, embedding in enumerate(embeddings)
+        if embedding is None and texts[i] and texts[i].strip()
+    ]
+    cache_stats = {
+        "hits": sum(1 for e in embeddings if e is not None) - reused,
+        "misses": len(miss_indices)
+    }
+    if reuse is not None:
+        cache_stats["reused"] = reused
+    
+    logger.info(
+        f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses"
+    )
+    
+    if miss_indices:
+        miss_texts = [texts[i] for i in miss_indices]
+        miss_embeddings = embedding_service.generate_embeddings_batch(
+            texts=miss_texts,
+            retry_on_failure=True
+        )
+        
+        for i, embedding in zip(miss_indices, miss_embeddings):
+            embeddings[i] = embedding
+        
+        embedding_cache.set_many(model_name, task_type, miss_texts, miss_embeddings)
+    
+    return embeddings, cache_stats
+
+
+def _update_material_status(
+    material_id: str,
+    status: ProcessingStatus,
+    fields: Optional[Dict[str, Any]] = None
+) -> None:
+    """Update material processing status, along with any other material fields"""
     try:
         supabase_client.table("materials").update({
-            "processing_status": status.value
+            "processing_status": status.value,
+            **(fields or {})
         }).eq("id", material_id).execute()
         
         logger.info(f"Updated material {material_id} status to {status.value}")
@@ -200,6 +1048,57 @@ def _update_material_status(material_id: str, status: ProcessingStatus) -> None:
     except Exception as e:
         logger.error(f"Failed to update material status: {e}")
         # Don't raise - status update failure shouldn't stop processing
+    
+    # Finished materials no longer lower their owner's queue priority
+    if status in (ProcessingStatus.COMPLETED, ProcessingStatus.FAILED):
+        material_queue_router.release(material_id)
+    
+    if status == ProcessingStatus.COMPLETED:
+        _queue_vector_index_sync(material_id)
+
+
+def _queue_vector_index_sync(material_id: str) -> None:
+    """Queue sync_vector_indexes for the notebook of a material whose chunks changed"""
+    try:
+        response = supabase_client.table("materials").select("notebook_id").eq(
+            "id", material_id
+        ).execute()
+        if response.data:
+            sync_vector_indexes.apply_async(
+                kwargs={"notebook_id": response.data[0]["notebook_id"]},
+                queue=LARGE_MATERIALS_QUEUE
+            )
+        
+    except Exception as e:
+        # Searches fall back to an exact scan until the index exists
+        logger.warning(f"Failed to queue vector index sync for material {material_id}: {e}")
+
+
+def _delete_chunks(material_id: str, from_index: int = 0) -> None:
+    """Delete a material's chunks of the current chunker version from a chunk index onwards"""
+    try:
+        query = supabase_client.table("chunks").delete().eq(
+            "material_id", material_id
+        ).eq("chunker_version", CHUNKER_VERSION)
+        if from_index > 0:
+            query = query.gte("chunk_index", from_index)
+        query.execute()
+        
+    except Exception as e:
+        logger.error(f"Failed to delete chunks: {e}")
+        raise ValueError(f"Failed to delete existing chunks: {str(e)}")
+
+
+def _delete_stale_chunks(material_id: str) -> None:
+    """Delete a material's chunks produced by any other chunker version"""
+    try:
+        supabase_client.table("chunks").delete().eq("material_id", material_id).or_(
+            f'chunker_version.is.null,chunker_version.neq."{CHUNKER_VERSION}"'
+        ).execute()
+        
+    except Exception as e:
+        logger.error(f"Failed to delete stale chunks: {e}")
+        raise ValueError(f"Failed to delete stale chunks: {str(e)}")
 
 
 def _store_chunks(
@@ -207,35 +1106,30 @@ def _store_chunks(
     chunks: list,
     embeddings: list
 ) -> int:
-    """Store chunks and embeddings in database"""
+    """
+    Store chunks and embeddings in database
+    
+    By default rows are bulk-loaded with binary COPY over the worker's direct
+    Postgres connection; CHUNK_STORE_METHOD=postgrest inserts through Supabase
+    for deployments without direct database access.
+    """
     stored_count = 0
     
     try:
-        # Prepare chunk data for batch insert
-        chunk_data = []
+        # Only store chunks with successful embeddings
+        rows = [
+            (chunk.content, embedding, chunk.chunk_index, chunk.metadata)
+            for chunk, embedding in zip(chunks, embeddings)
+            if embedding is not None
+        ]
         
-        for i, chunk in enumerate(chunks):
-            embedding = embeddings[i] if i < len(embeddings) else None
-            
-            # Only store chunks with successful embeddings
-            if embedding is not None:
-                chunk_dict = {
-                    "material_id": material_id,
-                    "content": chunk.content,
-                    "embedding": embedding,
-                    "chunk_index": chunk.chunk_index,
-                    "metadata": chunk.metadata
-                }
-                chunk_data.append(chunk_dict)
-        
-        if not chunk_data:
+        if not rows:
             raise ValueError("No chunks with embeddings to store")
         
-        # Batch insert chunks
-        response = supabase_client.table("chunks").insert(chunk_data).execute()
-        
-        if response.data:
-            stored_count = len(response.data)
+        if settings.CHUNK_STORE_METHOD == "postgrest":
+            stored_count = _insert_chunk_rows(material_id, rows)
+        else:
+            stored_count = _copy_chunk_rows(material_id, rows)
         
         logger.info(f"Stored {stored_count} chunks for material {material_id}")
         return stored_count
@@ -245,6 +1139,58 @@ def _store_chunks(
         raise ValueError(f"Failed to store chunks in database: {str(e)}")
 
 
+def _copy_chunk_rows(material_id: str, rows: List[ChunkRow]) -> int:
+    """Bulk-load chunk rows with binary COPY in bounded batches, in one transaction"""
+    connection = engine.raw_connection()
+    
+    try:
+        cursor = connection.cursor()
+        try:
+            for batch in _batched(rows, settings.CHUNK_COPY_BATCH_SIZE):
+                payload = encode_chunk_rows(
+                    material_id,
+                    batch,
+                    chunker_version=CHUNKER_VERSION,
+                    embedding_model=embedding_service.model_name
+                )
+                cursor.copy_expert(CHUNK_COPY_SQL, io.BytesIO(payload))
+        finally:
+            cursor.close()
+        
+        connection.commit()
+        return len(rows)
+        
+    except Exception:
+        connection.rollback()
+        raise
+        
+    finally:
+        connection.close()
+
+
+def _insert_chunk_rows(material_id: str, rows: List[ChunkRow]) -> int:
+    """Insert chunk rows through the Supabase REST API"""
+    chunk_data = [
+        {
+            "material_id": material_id,
+            "content": content,
+            "embedding": embedding,
+            "chunk_index": chunk_index,
+            "metadata": metadata,
+            "chunker_version": CHUNKER_VERSION,
+            "embedding_model": embedding_service.model_name
+        }
+        for content, embedding, chunk_index, metadata in rows
+    ]
+    
+    response = supabase_client.table("chunks").insert(chunk_data).execute()
+    return len(response.data) if response.data else 0
+
+
 # Export task for easy import
-__all__ = ["process_material"]
+__all__ = [
+    "process_material", "embed_material_shard", "finalize_material",
+    "rechunk_material", "backfill_rechunk", "backfill_embeddings",
+    "sync_vector_indexes"
+]
 
@@ -0,0 +1,161 @@
+"""Queue routing for material processing tasks"""
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+import redis
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# Queues consumed by separate worker pools (see docker-compose.yml)
+SMALL_MATERIALS_QUEUE = "materials"
+LARGE_MATERIALS_QUEUE = "materials_large"
+
+# Redis transport priorities run from 0 (first) to 9 (last)
+MAX_PRIORITY = 9
+
+# Extracted text per file byte relative to PDF/DOCX: plain text is all content,
+# while document formats are mostly layout, fonts and compression
+MATERIAL_COST_WEIGHTS = {
+    "text/plain": 4,
+    "text/markdown": 4,
+}
+
+
+def estimate_processing_cost(file_size: int, mime_type: str) -> int:
+    """Estimate processing work for a material in weighted bytes"""
+    return file_size * MATERIAL_COST_WEIGHTS.get(mime_type, 1)
+
+
+class MaterialQueueRouter:
+    """
+    Route material processing tasks by size and per-user load
+
+    Materials whose estimated cost reaches the large threshold go to a separate
+    queue so a big PDF never blocks small notes. Within a queue, each user's
+    materials are prioritized by how many of that user's materials are already
+    pending: a bulk import queues behind other users' single uploads instead of
+    in front of them.
+
+    Pending materials are tracked per user in a Redis sorted set scored by
+    enqueue time; entries are removed when processing finishes and expire after
+    a window so a lost task cannot penalize a user forever. Redis failures fall
+    back to size routing at top priority.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        large_threshold_bytes: int = 10 * 1024 * 1024,
+        window_seconds: int = 60 * 60,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize router
+
+        Args:
+            redis_client: Redis client for per-user tracking (None disables fairness)
+            large_threshold_bytes: Estimated cost at which materials use the large queue
+            window_seconds: How long a pending material counts against its user
+            clock: Wall clock, injectable for tests
+        """
+        self.redis = redis_client
+        self.large_threshold_bytes = large_threshold_bytes
+        self.window_seconds = window_seconds
+        self._clock = clock
+
+    @staticmethod
+    def _user_key(user_id: str) -> str:
+        return f"material_queue:user:{user_id}"
+
+    @staticmethod
+    def _material_key(material_id: str) -> str:
+        return f"material_queue:material:{material_id}"
+
+    def route(
+        self,
+        material_id: str,
+        file_size: int,
+        mime_type: str,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Choose the queue and priority for a material and record it as pending
+
+        Args:
+            material_id: Material UUID
+            file_size: File size in bytes
+            mime_type: MIME type of the file
+            user_id: Owner of the material (None skips fairness)
+
+        Returns:
+            apply_async options: {"queue": ..., "priority": ...}
+        """
+        large = estimate_processing_cost(file_size, mime_type) >= self.large_threshold_bytes
+        options = {
+            "queue": LARGE_MATERIALS_QUEUE if large else SMALL_MATERIALS_QUEUE,
+            "priority": 0
+        }
+
+        if self.redis is None or not user_id:
+            return options
+
+        try:
+            now = self._clock()
+            user_key = self._user_key(user_id)
+
+            pipeline = self.redis.pipeline(transaction=True)
+            pipeline.zremrangebyscore(user_key, "-inf", now - self.window_seconds)
+            pipeline.zcard(user_key)
+            pipeline.zadd(user_key, {material_id: now})
+            pipeline.expire(user_key, self.window_seconds)
+            pipeline.set(self._material_key(material_id), user_id, ex=self.window_seconds)
+            pending = pipeline.execute()[1]
+
+            options["priority"] = min(pending, MAX_PRIORITY)
+        except Exception as e:
+            logger.warning(f"Material queue fairness unavailable: {e}")
+
+        return options
+
+    def release(self, material_id: str) -> None:
+        """Stop counting a material against its user (idempotent)"""
+        if self.redis is None:
+            return
+
+        try:
+            material_key = self._material_key(material_id)
+            user_id = self.redis.get(material_key)
+            if user_id is None:
+                return
+
+            if isinstance(user_id, bytes):
+                user_id = user_id.decode('utf-8')
+
+            pipeline = self.redis.pipeline(transaction=True)
+            pipeline.zrem(self._user_key(user_id), material_id)
+            pipeline.delete(material_key)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Failed to release material {material_id} from queue tracking: {e}")
+
+
+def _create_material_queue_router() -> MaterialQueueRouter:
+    """Build the shared router from settings"""
+    return MaterialQueueRouter(
+        redis_client=redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5
+        ),
+        large_threshold_bytes=settings.MATERIAL_LARGE_QUEUE_MB * 1024 * 1024,
+        window_seconds=settings.MATERIAL_FAIRNESS_WINDOW_SECONDS
+    )
+
+
+# Singleton instance
+material_queue_router = _create_material_queue_router()
@@ -0,0 +1,112 @@
+"""Per-notebook partial vector indexes on chunks.embedding"""
+import uuid
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# Index name prefix; match_chunks builds the same name to find a notebook's index
+NOTEBOOK_INDEX_PREFIX = "ix_chunks_emb_"
+
+# Partial HNSW index per EMBEDDING_INDEX_PRECISION, over the expression
+# match_chunks orders by (see migration 004), built with HNSW_M and
+# HNSW_EF_CONSTRUCTION; needs pgvector >= 0.5 (0.7 for half and binary)
+NOTEBOOK_INDEX_DEFINITIONS = {
+    "full": "USING hnsw (embedding vector_cosine_ops)",
+    "half": "USING hnsw ((embedding::halfvec(768)) halfvec_cosine_ops)",
+    "binary": "USING hnsw ((binary_quantize(embedding)::bit(768)) bit_hamming_ops)",
+}
+
+
+class VectorIndexPlan(NamedTuple):
+    """Index changes for sync_vector_indexes: names to drop, (name, notebook id) to create"""
+    drop: List[str]
+    create: List[Tuple[str, str]]
+
+
+def notebook_index_name(notebook_id: str, precision: str) -> str:
+    """Name of a notebook's partial index, e.g. ix_chunks_emb_full_<32 hex digits>"""
+    return f"{NOTEBOOK_INDEX_PREFIX}{precision}_{uuid.UUID(notebook_id).hex}"
+
+
+def parse_notebook_index_name(name: str) -> Optional[Tuple[str, str]]:
+    """(notebook id, precision) of a partial index name, or None for other indexes"""
+    if not name.startswith(NOTEBOOK_INDEX_PREFIX):
+        return None
+    precision, _, notebook_hex = name[len(NOTEBOOK_INDEX_PREFIX):].rpartition("_")
+    try:
+        return str(uuid.UUID(hex=notebook_hex)), precision
+    except ValueError:
+        return None
+
+
+def notebook_index_options(m: int, ef_construction: int) -> List[str]:
+    """Storage parameters of a partial index, as listed in pg_class.reloptions"""
+    return [f"m={int(m)}", f"ef_construction={int(ef_construction)}"]
+
+
+def create_notebook_index_sql(
+    notebook_id: str,
+    precision: str,
+    m: int = 16,
+    ef_construction: int = 64
+) -> str:
+    """CREATE INDEX CONCURRENTLY statement for a notebook's partial index"""
+    # uuid.UUID validates the id before it is inlined into the predicate
+    notebook_id = str(uuid.UUID(notebook_id))
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {notebook_index_name(notebook_id, precision)} "
+        f"ON chunks {NOTEBOOK_INDEX_DEFINITIONS[precision]} "
+        f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)}) "
+        f"WHERE notebook_id = '{notebook_id}'"
+    )
+
+
+def plan_vector_indexes(
+    chunk_counts: Dict[str, int],
+    existing: Dict[str, bool],
+    precision: str,
+    exact_scan_max_chunks: int
+) -> VectorIndexPlan:
+    """
+    Decide which notebook indexes to create and drop
+
+    Notebooks with more than exact_scan_max_chunks chunks get an index for the
+    current precision. An index is dropped when its notebook has shrunk to half
+    the threshold (so a notebook near the threshold is not rebuilt repeatedly)
+    or when it was built for another precision. Indexes marked unusable (a
+    concurrent build failed, or they were built with other HNSW parameters)
+    are rebuilt.
+
+    Args:
+        chunk_counts: Chunk count per notebook id in scope; indexes of notebooks
+            missing from it are dropped, so pass only the indexes in scope too
+        existing: Usable flag per existing partial index name
+        precision: EMBEDDING_INDEX_PRECISION
+        exact_scan_max_chunks: VECTOR_EXACT_SCAN_MAX_CHUNKS
+
+    Returns:
+        Indexes to drop and to create
+    """
+    keep = set()
+    drop = []
+
+    for name, is_usable in existing.items():
+        parsed = parse_notebook_index_name(name)
+        if parsed is None:
+            continue
+        notebook_id, index_precision = parsed
+        if (
+            is_usable
+            and index_precision == precision
+            and chunk_counts.get(notebook_id, 0) > exact_scan_max_chunks // 2
+        ):
+            keep.add(name)
+        else:
+            drop.append(name)
+
+    create = []
+    for notebook_id, count in sorted(chunk_counts.items()):
+        name = notebook_index_name(notebook_id, precision)
+        if count > exact_scan_max_chunks and name not in keep:
+            create.append((name, notebook_id))
+
+    return VectorIndexPlan(drop=sorted(drop), create=create)
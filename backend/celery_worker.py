@@ -1,5 +1,7 @@
 """Celery worker entry point"""
 from app.core.celery_app import celery_app
+# Registers every model first; importing app.models directly is circular
+import app.db.base  # noqa: F401
 from app.tasks import process_material  # noqa: F401
 
 
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Embedding Index Precision Benchmark
+
+Compares recall, latency and index size of the full, half (halfvec) and binary
+(binary_quantize) ANN indexes supported by EMBEDDING_INDEX_PRECISION.
+
+Embeddings are copied from the chunks table (or generated with --synthetic)
+into a scratch table, each index type is built in turn, and queries are scored
+against an exact full-precision scan. Quantized indexes are measured both with
+and without full-precision re-ranking of the over-fetched candidates.
+
+Usage:
+    python scripts/benchmark_embedding_precision.py [--sample 20000] [--queries 200]
+    python scripts/benchmark_embedding_precision.py --synthetic 50000
+
+Requires pgvector >= 0.7 on the database. The scratch table is dropped on exit.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+
+
+DIMENSION = 768
+TABLE = "bench_embedding_precision"
+
+INDEXES = {
+    "full": (
+        "USING ivfflat (embedding vector_cosine_ops) WITH (lists = %(lists)s)",
+        "embedding <=> %(q)s::vector",
+    ),
+    "half": (
+        f"USING ivfflat ((embedding::halfvec({DIMENSION})) halfvec_cosine_ops) WITH (lists = %(lists)s)",
+        f"embedding::halfvec({DIMENSION}) <=> %(q)s::vector::halfvec({DIMENSION})",
+    ),
+    "binary": (
+        f"USING ivfflat ((binary_quantize(embedding)::bit({DIMENSION})) bit_hamming_ops) WITH (lists = %(lists)s)",
+        f"binary_quantize(embedding)::bit({DIMENSION}) <~> binary_quantize(%(q)s::vector)",
+    ),
+}
+
+
+def vector_literal(vector) -> str:
+    return "[" + ",".join(f"{x:.7g}" for x in vector) + "]"
+
+
+def load_embeddings(cursor, args) -> np.ndarray:
+    """Sample chunk embeddings, or generate clustered synthetic ones"""
+    if args.synthetic:
+        rng = np.random.default_rng(42)
+        centers = rng.normal(size=(max(args.synthetic // 200, 1), DIMENSION))
+        vectors = centers[rng.integers(len(centers), size=args.synthetic)]
+        vectors += rng.normal(scale=0.6, size=vectors.shape)
+    else:
+        cursor.execute(
+            "SELECT embedding::text FROM chunks WHERE embedding IS NOT NULL "
+            "ORDER BY random() LIMIT %s",
+            (args.sample,)
+        )
+        vectors = np.array([row[0][1:-1].split(",") for row in cursor.fetchall()], dtype=np.float64)
+
+    if len(vectors) == 0:
+        print("Error: no embeddings found (use --synthetic N to generate some)")
+        sys.exit(1)
+
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """Ground truth: top-k ids by exact cosine similarity (ids are 1-based rows)"""
+    similarities = queries @ vectors.T
+    return [set((np.argsort(-row)[:k] + 1).tolist()) for row in similarities]
+
+
+def run_queries(cursor, precision: str, queries, k: int, candidates: int, rerank: bool):
+    """Return (latencies in ms, result id sets) for one index configuration"""
+    order_by = INDEXES[precision][1]
+    limit = candidates if precision != "full" else k
+    inner = f"SELECT id, embedding FROM {TABLE} ORDER BY {order_by} LIMIT {limit}"
+
+    if rerank and precision != "full":
+        sql = f"SELECT id FROM ({inner}) c ORDER BY c.embedding <=> %(q)s::vector LIMIT {k}"
+    else:
+        sql = f"SELECT id FROM ({inner}) c LIMIT {k}"
+
+    latencies, results = [], []
+    for query in queries:
+        params = {"q": vector_literal(query)}
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append({row[0] for row in rows})
+
+    return latencies, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark embedding index precision")
+    parser.add_argument("--sample", type=int, default=20000, help="Chunk embeddings to sample")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic embeddings instead")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to run per configuration")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (recall@k)")
+    parser.add_argument("--rerank-factor", type=int, default=settings.EMBEDDING_RERANK_FACTOR)
+    parser.add_argument("--probes", type=int, default=10, help="ivfflat.probes for every index")
+    args = parser.parse_args()
+
+    connection = psycopg2.connect(settings.DATABASE_URL_SYNC)
+    connection.autocommit = True
+    cursor = connection.cursor()
+
+    vectors = load_embeddings(cursor, args)
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    truth = exact_neighbours(vectors, queries, args.k)
+    lists = max(int(np.sqrt(len(vectors))), 1)
+
+    print(f"Embeddings: {len(vectors)}, queries: {len(queries)}, k={args.k}, "
+          f"lists={lists}, probes={args.probes}, rerank factor={args.rerank_factor}\n")
+
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} (id serial PRIMARY KEY, embedding vector({DIMENSION}))")
+        for start in range(0, len(vectors), 1000):
+            batch = vectors[start:start + 1000]
+            cursor.execute(
+                f"INSERT INTO {TABLE} (embedding) SELECT unnest(%s::vector[])",
+                ([vector_literal(v) for v in batch],)
+            )
+        cursor.execute(f"ANALYZE {TABLE}")
+        cursor.execute(f"SELECT pg_size_pretty(pg_relation_size('{TABLE}'))")
+        print(f"Table size: {cursor.fetchone()[0]}\n")
+
+        print(f"{'index':<8} {'rerank':<7} {'index size':>11} {'build s':>8} "
+              f"{'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+        for precision, (definition, _) in INDEXES.items():
+            cursor.execute(f"DROP INDEX IF EXISTS {TABLE}_ann")
+            started = time.perf_counter()
+            cursor.execute(f"CREATE INDEX {TABLE}_ann ON {TABLE} {definition}", {"lists": lists})
+            build_seconds = time.perf_counter() - started
+            cursor.execute(f"SELECT pg_size_pretty(pg_relation_size('{TABLE}_ann'))")
+            index_size = cursor.fetchone()[0]
+            cursor.execute(f"SET ivfflat.probes = {args.probes}")
+
+            for rerank in ([False] if precision == "full" else [False, True]):
+                latencies, results = run_queries(
+                    cursor, precision, queries, args.k, args.k * args.rerank_factor, rerank
+                )
+                recall = statistics.mean(
+                    len(found & expected) / args.k for found, expected in zip(results, truth)
+                )
+                latencies.sort()
+                print(f"{precision:<8} {str(rerank).lower():<7} {index_size:>11} {build_seconds:>8.1f} "
+                      f"{recall:>9.3f} {statistics.median(latencies):>8.2f} "
+                      f"{latencies[int(len(latencies) * 0.95) - 1]:>8.2f}")
+
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Notebook HNSW Index Benchmark
+
+Measures recall@k and latency of the per-notebook partial HNSW indexes that
+sync_vector_indexes builds for notebooks past VECTOR_EXACT_SCAN_MAX_CHUNKS,
+queried the way match_chunks queries them:
+
+- exact scan:  the notebook's rows sorted by exact distance, as match_chunks
+               does for notebooks at or below the threshold
+- hnsw:        a partial index WHERE notebook_id = <notebook>, built with
+               HNSW_M / HNSW_EF_CONSTRUCTION, queried at each --ef-search value
+
+The benchmarked notebook's embeddings are copied from the largest notebook in
+the chunks table (or generated with --synthetic) into a scratch table, next
+to --other-rows rows of other notebooks that the partial index leaves out.
+Queries are scored against an exact scan. The ef_search rows show the
+trade-off between the chat (HNSW_EF_SEARCH_CHAT) and study
+(HNSW_EF_SEARCH_STUDY) profiles; like match_chunks, ef_search is never set
+below k.
+
+Usage:
+    python scripts/benchmark_hnsw.py [--sample 20000] [--queries 200]
+    python scripts/benchmark_hnsw.py --synthetic 50000 --ef-search 20,40,100,200,400
+
+Requires pgvector >= 0.5 on the database. The scratch table is dropped on exit.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+
+
+DIMENSION = 768
+TABLE = "bench_hnsw"
+INDEX = f"{TABLE}_ann"
+NOTEBOOK = 1
+
+
+def vector_literal(vector) -> str:
+    return "[" + ",".join(f"{x:.7g}" for x in vector) + "]"
+
+
+def load_embeddings(cursor, args) -> np.ndarray:
+    """Sample the largest notebook's chunk embeddings, or generate clustered synthetic ones"""
+    if args.synthetic:
+        rng = np.random.default_rng(42)
+        centers = rng.normal(size=(max(args.synthetic // 200, 1), DIMENSION))
+        vectors = centers[rng.integers(len(centers), size=args.synthetic)]
+        vectors += rng.normal(scale=0.6, size=vectors.shape)
+    else:
+        cursor.execute(
+            "SELECT embedding::text FROM chunks WHERE embedding IS NOT NULL AND notebook_id = ("
+            "SELECT notebook_id FROM chunks GROUP BY notebook_id ORDER BY count(*) DESC LIMIT 1"
+            ") ORDER BY random() LIMIT %s",
+            (args.sample,)
+        )
+        vectors = np.array([row[0][1:-1].split(",") for row in cursor.fetchall()], dtype=np.float64)
+
+    if len(vectors) == 0:
+        print("Error: no embeddings found (use --synthetic N to generate some)")
+        sys.exit(1)
+
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """Ground truth: top-k ids by exact cosine similarity (ids are 1-based rows)"""
+    similarities = queries @ vectors.T
+    return [set((np.argsort(-row)[:k] + 1).tolist()) for row in similarities]
+
+
+def load_rows(cursor, vectors: np.ndarray, other_rows: int) -> None:
+    """Insert the notebook's embeddings in id order, then rows of other notebooks"""
+    for start in range(0, len(vectors), 1000):
+        batch = vectors[start:start + 1000]
+        cursor.execute(
+            f"INSERT INTO {TABLE} (notebook_id, embedding) SELECT %s, unnest(%s::vector[])",
+            (NOTEBOOK, [vector_literal(v) for v in batch])
+        )
+
+    rng = np.random.default_rng(11)
+    for start in range(0, other_rows, 1000):
+        batch = rng.normal(size=(min(1000, other_rows - start), DIMENSION))
+        cursor.execute(
+            f"INSERT INTO {TABLE} (notebook_id, embedding) "
+            f"SELECT {NOTEBOOK} + 1 + n % 100, v FROM unnest(%s::vector[]) WITH ORDINALITY AS t(v, n)",
+            ([vector_literal(v) for v in batch],)
+        )
+
+    cursor.execute(f"CREATE INDEX {TABLE}_notebook ON {TABLE} (notebook_id)")
+    cursor.execute(f"ANALYZE {TABLE}")
+
+
+def run_queries(cursor, queries, k: int, exact: bool):
+    """Return (latencies in ms, result id sets) for the notebook under the current settings"""
+    if exact:
+        # Same shape as match_chunks' exact scan: filter first, then sort
+        sql = (
+            f"WITH notebook_rows AS MATERIALIZED (SELECT id, embedding FROM {TABLE} "
+            f"WHERE notebook_id = {NOTEBOOK}) "
+            f"SELECT id FROM notebook_rows ORDER BY embedding <=> %(q)s::vector LIMIT {k}"
+        )
+    else:
+        sql = (
+            f"SELECT id FROM {TABLE} WHERE notebook_id = {NOTEBOOK} "
+            f"ORDER BY embedding <=> %(q)s::vector LIMIT {k}"
+        )
+
+    latencies, results = [], []
+    for query in queries:
+        params = {"q": vector_literal(query)}
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append({row[0] for row in rows})
+
+    return latencies, results
+
+
+def report(label: str, setting: str, build_seconds: float, cursor, queries, truth, k: int,
+           exact: bool = False) -> None:
+    """Run the queries and print one result row"""
+    if exact:
+        index_size = "-"
+    else:
+        cursor.execute(f"SELECT pg_size_pretty(pg_relation_size('{INDEX}'))")
+        index_size = cursor.fetchone()[0]
+    latencies, results = run_queries(cursor, queries, k, exact)
+    recall = statistics.mean(len(found & expected) / k for found, expected in zip(results, truth))
+    latencies.sort()
+    print(f"{label:<16} {setting:<15} {index_size:>11} {build_seconds:>8.1f} "
+          f"{recall:>9.3f} {statistics.median(latencies):>8.2f} "
+          f"{latencies[int(len(latencies) * 0.95) - 1]:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-notebook HNSW indexes against an exact scan")
+    parser.add_argument("--sample", type=int, default=20000, help="Chunk embeddings to sample")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic embeddings instead")
+    parser.add_argument("--other-rows", type=int, default=50000, help="Rows of other notebooks in the table")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to run per configuration")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (recall@k)")
+    parser.add_argument("--m", type=int, default=settings.HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=settings.HNSW_EF_CONSTRUCTION)
+    parser.add_argument(
+        "--ef-search",
+        default=f"{settings.HNSW_EF_SEARCH_CHAT},{settings.HNSW_EF_SEARCH_STUDY}",
+        help="Comma-separated hnsw.ef_search values"
+    )
+    args = parser.parse_args()
+
+    ef_search_values = sorted(int(value) for value in args.ef_search.split(","))
+
+    connection = psycopg2.connect(settings.DATABASE_URL_SYNC)
+    connection.autocommit = True
+    cursor = connection.cursor()
+
+    vectors = load_embeddings(cursor, args)
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    truth = exact_neighbours(vectors, queries, args.k)
+
+    print(f"Notebook embeddings: {len(vectors)}, other rows: {args.other_rows}, "
+          f"queries: {len(queries)}, k={args.k}, m={args.m}, ef_construction={args.ef_construction}")
+    if len(vectors) <= settings.VECTOR_EXACT_SCAN_MAX_CHUNKS:
+        print(f"Note: match_chunks scans notebooks of up to {settings.VECTOR_EXACT_SCAN_MAX_CHUNKS} "
+              f"chunks exactly; this one would not use its index")
+    print()
+
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (id serial PRIMARY KEY, notebook_id int NOT NULL, "
+            f"embedding vector({DIMENSION}))"
+        )
+        load_rows(cursor, vectors, args.other_rows)
+
+        print(f"{'index':<16} {'setting':<15} {'index size':>11} {'build s':>8} "
+              f"{'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+        report("exact scan", "-", 0.0, cursor, queries, truth, args.k, exact=True)
+
+        started = time.perf_counter()
+        cursor.execute(
+            f"CREATE INDEX {INDEX} ON {TABLE} USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {args.m}, ef_construction = {args.ef_construction}) "
+            f"WHERE notebook_id = {NOTEBOOK}"
+        )
+        build_seconds = time.perf_counter() - started
+        for ef_search in ef_search_values:
+            cursor.execute(f"SET hnsw.ef_search = {max(ef_search, args.k)}")
+            report("hnsw (notebook)", f"ef_search={ef_search}", build_seconds, cursor, queries, truth, args.k)
+
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Notebook Search Benchmark
+
+Compares latency of the three ways notebook search has matched chunk text:
+
+- ilike:    the previous unindexed leading-wildcard ILIKE scan
+- fulltext: tsvector column with a GIN index (migration 007)
+- trigram:  pg_trgm GIN index with ILIKE and word_similarity (migration 008)
+
+Synthetic chunks with code identifiers are spread over several notebooks in a
+scratch table. Each mode is queried with identifier substrings, misspelled
+words and plain words, and timed at growing table sizes, so the ILIKE scan's
+linear growth shows against the indexed modes.
+
+Usage:
+    python scripts/benchmark_notebook_search.py [--sizes 10000,40000,160000] [--queries 100]
+
+Requires the pg_trgm extension. The scratch table is dropped on exit.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import settings  # noqa: E402
+
+
+TABLE = "bench_notebook_search"
+NOTEBOOKS = 8
+
+WORDS = (
+    "photosynthesis chlorophyll membrane gradient enzyme substrate catalyst "
+    "equilibrium derivative integral matrix eigenvalue recursion algorithm "
+    "pointer allocation buffer overflow latency throughput transaction index"
+).split()
+
+IDENTIFIERS = [
+    f"{prefix}_{noun}{suffix}"
+    for prefix in ("parse", "load", "encode", "flush", "merge")
+    for noun in ("chunk", "buffer", "row", "page", "token")
+    for suffix in ("", "_rows", "_batch")
+]
+
+# mode -> SQL with %(notebook)s, %(q)s and %(pattern)s parameters
+MODES = {
+    "ilike": (
+        f"SELECT id FROM {TABLE} WHERE notebook_id = %(notebook)s "
+        f"AND content ILIKE %(pattern)s ORDER BY created_at DESC LIMIT 20"
+    ),
+    "fulltext": (
+        f"SELECT id FROM {TABLE}, websearch_to_tsquery('english', %(q)s) tsq "
+        f"WHERE notebook_id = %(notebook)s AND content_tsv @@ tsq "
+        f"ORDER BY ts_rank_cd(content_tsv, tsq) DESC LIMIT 20"
+    ),
+    "trigram": (
+        f"SELECT id FROM {TABLE} WHERE notebook_id = %(notebook)s "
+        f"AND (content ILIKE %(pattern)s OR %(q)s <%% content) "
+        f"ORDER BY CASE WHEN content ILIKE %(pattern)s THEN 1.0 "
+        f"ELSE word_similarity(%(q)s, content) END DESC LIMIT 20"
+    ),
+}
+
+
+def synthetic_chunk(rng: random.Random) -> str:
+    """~150 words of prose with a few code identifiers mixed in"""
+    words = [rng.choice(WORDS) for _ in range(150)]
+    for _ in range(3):
+        words[rng.randrange(len(words))] = rng.choice(IDENTIFIERS) + "()"
+    return " ".join(words)
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Swap two adjacent letters"""
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def load_rows(cursor, rng: random.Random, count: int) -> None:
+    """Append synthetic chunks to the scratch table"""
+    for start in range(0, count, 1000):
+        batch = [
+            ((start + i) % NOTEBOOKS, synthetic_chunk(rng))
+            for i in range(min(1000, count - start))
+        ]
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (notebook_id, content) VALUES (%s, %s)",
+            batch
+        )
+
+
+def run_queries(cursor, mode: str, queries) -> list:
+    """Return latencies in ms for one mode"""
+    latencies = []
+    for notebook, query in queries:
+        params = {"notebook": notebook, "q": query, "pattern": f"%{query}%"}
+        started = time.perf_counter()
+        cursor.execute(MODES[mode], params)
+        cursor.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark notebook search modes")
+    parser.add_argument("--sizes", default="10000,40000,160000", help="Comma-separated total chunk counts")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per mode and size")
+    parser.add_argument("--threshold", type=float, default=settings.SEARCH_TRIGRAM_THRESHOLD)
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    rng = random.Random(42)
+
+    connection = psycopg2.connect(settings.DATABASE_URL_SYNC)
+    connection.autocommit = True
+    cursor = connection.cursor()
+
+    try:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(f"SET pg_trgm.word_similarity_threshold = {args.threshold}")
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} ("
+            f"id serial PRIMARY KEY, notebook_id int, content text, "
+            f"created_at timestamp DEFAULT now(), "
+            f"content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED)"
+        )
+        cursor.execute(f"CREATE INDEX {TABLE}_tsv ON {TABLE} USING gin (content_tsv)")
+        cursor.execute(f"CREATE INDEX {TABLE}_trgm ON {TABLE} USING gin (content gin_trgm_ops)")
+
+        print(f"{'chunks':>8} {'per notebook':>13} {'mode':<9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+
+        loaded = 0
+        for size in sizes:
+            load_rows(cursor, rng, size - loaded)
+            loaded = size
+            cursor.execute(f"ANALYZE {TABLE}")
+
+            queries = []
+            for i in range(args.queries):
+                kind = i % 3
+                if kind == 0:
+                    query = rng.choice(IDENTIFIERS)[:rng.randint(6, 11)]  # Identifier prefix
+                elif kind == 1:
+                    query = misspell(rng.choice(WORDS), rng)  # Typo
+                else:
+                    query = rng.choice(WORDS)
+                queries.append((rng.randrange(NOTEBOOKS), query))
+
+            for mode in MODES:
+                latencies = sorted(run_queries(cursor, mode, queries))
+                print(f"{size:>8} {size // NOTEBOOKS:>13} {mode:<9} "
+                      f"{statistics.median(latencies):>8.2f} "
+                      f"{latencies[int(len(latencies) * 0.95) - 1]:>8.2f} {latencies[-1]:>8.2f}")
+
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
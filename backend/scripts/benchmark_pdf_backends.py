@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+PDF Backend Benchmark
+
+Compares the installed PDF extraction backends on a fixed corpus of PDFs.
+Each backend runs in a fresh process so its peak resident memory is measured
+in isolation.
+
+Usage:
+    python scripts/benchmark_pdf_backends.py path/to/corpus [--repeat 3]
+
+Reports pages/sec and peak RSS per backend. Pick the fastest backend that also
+passes tests/test_text_extraction.py (the PDF tests run once per installed
+backend), then set PDF_BACKEND accordingly.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.text_extraction import PDF_BACKENDS, available_pdf_backends  # noqa: E402
+
+
+def run_backend(backend_name: str, paths: list, repeat: int, results) -> None:
+    """Extract every page of every corpus file with one backend (child process)"""
+    backend = PDF_BACKENDS[backend_name]
+    baseline_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    pages = 0
+    chars = 0
+    failed_pages = 0
+    started = time.perf_counter()
+
+    for _ in range(repeat):
+        for path in paths:
+            with backend(Path(path).read_bytes()) as document:
+                for index in range(document.page_count):
+                    pages += 1
+                    try:
+                        chars += len(document.extract_page(index) or "")
+                    except Exception:
+                        failed_pages += 1
+
+    elapsed = time.perf_counter() - started
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    results.put({
+        "backend": backend_name,
+        "pages": pages,
+        "chars": chars,
+        "failed_pages": failed_pages,
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "rss_growth_mb": (peak_rss_kb - baseline_rss_kb) / 1024,
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction backends")
+    parser.add_argument("corpus", help="Directory containing the benchmark PDFs")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus")
+    parser.add_argument(
+        "--backends",
+        nargs="*",
+        default=None,
+        help="Backends to compare (default: all installed)"
+    )
+    args = parser.parse_args()
+
+    paths = sorted(str(p) for p in Path(args.corpus).glob("**/*.pdf"))
+    if not paths:
+        print(f"Error: no PDF files found in {args.corpus}")
+        sys.exit(1)
+
+    backends = args.backends or available_pdf_backends()
+    corpus_mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+    print(f"Corpus: {len(paths)} PDFs, {corpus_mb:.1f} MB, {args.repeat} pass(es)")
+    print(f"Backends: {', '.join(backends)}\n")
+
+    # spawn so each backend starts from a clean interpreter for memory numbers
+    context = multiprocessing.get_context("spawn")
+    rows = []
+
+    for backend_name in backends:
+        results = context.Queue()
+        process = context.Process(
+            target=run_backend,
+            args=(backend_name, paths, args.repeat, results)
+        )
+        process.start()
+        rows.append(results.get())
+        process.join()
+
+    print(f"{'backend':<12} {'pages/sec':>10} {'pages':>8} {'failed':>7} "
+          f"{'chars':>12} {'peak RSS MB':>12} {'RSS growth MB':>14}")
+    for row in sorted(rows, key=lambda r: r["seconds"]):
+        pages_per_sec = row["pages"] / row["seconds"] if row["seconds"] else 0.0
+        print(f"{row['backend']:<12} {pages_per_sec:>10.1f} {row['pages']:>8} "
+              f"{row['failed_pages']:>7} {row['chars']:>12} "
+              f"{row['peak_rss_mb']:>12.1f} {row['rss_growth_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
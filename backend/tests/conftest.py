@@ -41,3 +41,96 @@ def client() -> Generator:
     """Create a test client"""
     with TestClient(app) as c:
         yield c
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the Redis commands the app uses
+
+    Values come back as bytes, as from a real client without decode_responses.
+    """
+
+    def __init__(self):
+        self.strings = {}
+        self.hashes = {}
+        self.lists = {}
+        self.sorted_sets = {}
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key):
+        return self.strings.get(key)
+
+    def mget(self, keys):
+        return [self.strings.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.strings[key] = self._encode(value)
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(self._encode(field))
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        entry = self.hashes.setdefault(key, {})
+        if field is not None:
+            entry[self._encode(field)] = self._encode(value)
+        for name, item in (mapping or {}).items():
+            entry[self._encode(name)] = self._encode(item)
+
+    def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(self._encode(value))
+
+    def lrange(self, key, start, end):
+        return self.lists.get(key, [])[start:None if end == -1 else end + 1]
+
+    def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+
+    def zcard(self, key):
+        return len(self.sorted_sets.get(key, {}))
+
+    def zrem(self, key, member):
+        self.sorted_sets.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        entries = self.sorted_sets.get(key, {})
+        for member in [m for m, score in entries.items() if float(low) <= score <= float(high)]:
+            del entries[member]
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, *keys):
+        for key in keys:
+            for store in (self.strings, self.hashes, self.lists, self.sorted_sets):
+                store.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queues commands and runs them against the FakeRedis on execute"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return command
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    """Empty in-memory Redis"""
+    return FakeRedis()
@@ -0,0 +1,80 @@
+"""Tests for binary COPY encoding of chunks"""
+import json
+import struct
+import uuid
+from datetime import datetime
+
+import pytest
+from pgvector.utils import from_db_binary
+
+from app.db.copy import CHUNK_COPY_COLUMNS, encode_chunk_rows
+
+
+MATERIAL_ID = "6f1c2f0e-8a54-4a7e-9a51-1f2d3c4b5a69"
+
+
+def decode_payload(payload):
+    """Split a binary COPY payload into rows of raw field bytes"""
+    assert payload.startswith(b"PGCOPY\n\xff\r\n\x00")
+    position = 19  # signature, flags and header extension length
+    rows = []
+
+    while True:
+        (field_count,) = struct.unpack_from("!h", payload, position)
+        position += 2
+        if field_count == -1:
+            break
+
+        fields = []
+        for _ in range(field_count):
+            (length,) = struct.unpack_from("!i", payload, position)
+            position += 4
+            if length == -1:
+                fields.append(None)
+                continue
+            fields.append(payload[position:position + length])
+            position += length
+        rows.append(fields)
+
+    assert position == len(payload)
+    return rows
+
+
+def test_encode_chunk_rows_round_trip():
+    """Test that every column decodes back to the values that were encoded"""
+    created_at = datetime(2026, 10, 17, 12, 30, 0, 250)
+    rows = decode_payload(encode_chunk_rows(
+        MATERIAL_ID,
+        [
+            ("Photosynthèse", [0.5, -1.25, 3.0], 7, {"page_number": 2}),
+            ("second", [0.0, 0.0, 1.0], 8, None),
+        ],
+        chunker_version="1:cl100k_base:500-1000/100",
+        embedding_model="models/embedding-001",
+        created_at=created_at
+    ))
+
+    assert len(rows) == 2
+    first = dict(zip(CHUNK_COPY_COLUMNS, rows[0]))
+
+    assert len(first["id"]) == 16
+    assert uuid.UUID(bytes=first["material_id"]) == uuid.UUID(MATERIAL_ID)
+    assert first["content"].decode("utf-8") == "Photosynthèse"
+    assert list(from_db_binary(first["embedding"])) == pytest.approx([0.5, -1.25, 3.0])
+    assert struct.unpack("!i", first["chunk_index"]) == (7,)
+    assert first["metadata"][:1] == b"\x01"
+    assert json.loads(first["metadata"][1:]) == {"page_number": 2}
+    assert first["chunker_version"] == b"1:cl100k_base:500-1000/100"
+    assert first["embedding_model"] == b"models/embedding-001"
+
+    (microseconds,) = struct.unpack("!q", first["created_at"])
+    assert microseconds == int((created_at - datetime(2000, 1, 1)).total_seconds() * 1_000_000)
+
+    second = dict(zip(CHUNK_COPY_COLUMNS, rows[1]))
+    assert second["metadata"] is None
+    assert second["id"] != first["id"]
+
+
+def test_encode_empty_batch():
+    """Test that an empty batch is a valid payload with no rows"""
+    assert decode_payload(encode_chunk_rows(MATERIAL_ID, [])) == []
@@ -0,0 +1,194 @@
+"""Tests for embedding service"""
+import pytest
+from app.services import embedding as embedding_module
+from app.services.embedding import EmbeddingService, EmbeddingError, TokenBucketRateLimiter
+
+
+DIMENSION = 768
+
+
+class FakeEmbedContent:
+    """Stand-in for genai.embed_content that records every request"""
+
+    def __init__(self, fail_texts=()):
+        self.calls = []
+        self.fail_texts = set(fail_texts)
+
+    def __call__(self, model, content, task_type=None):
+        self.calls.append(content)
+
+        if isinstance(content, list):
+            if self.fail_texts.intersection(content):
+                raise RuntimeError("batch rejected")
+            return {"embedding": [self._vector(text) for text in content]}
+
+        if content in self.fail_texts:
+            raise RuntimeError("text rejected")
+        return {"embedding": self._vector(content)}
+
+    @staticmethod
+    def _vector(text):
+        return [float(len(text))] * DIMENSION
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Embedding service with the Gemini client replaced and no retry delay"""
+    fake = FakeEmbedContent()
+    monkeypatch.setattr(embedding_module.genai, "embed_content", fake)
+
+    svc = EmbeddingService()
+    svc.base_retry_delay = 0
+    svc.rate_limiter = TokenBucketRateLimiter(requests_per_minute=0, tokens_per_minute=0)
+    svc.shared_query_cache = None
+    svc.fake = fake
+    return svc
+
+
+def test_batch_sends_one_request_per_batch(service):
+    """Test that texts are embedded with one API request per batch"""
+    service.batch_size = 10
+    texts = [f"chunk {i}" for i in range(25)]
+
+    embeddings = service.generate_embeddings_batch(texts)
+
+    assert len(service.fake.calls) == 3
+    assert all(isinstance(call, list) for call in service.fake.calls)
+    assert [e[0] for e in embeddings] == [float(len(t)) for t in texts]
+
+
+def test_batch_maps_empty_texts_to_none(service):
+    """Test that empty texts are skipped and keep their position"""
+    texts = ["first", "", "third", "   "]
+
+    embeddings = service.generate_embeddings_batch(texts)
+
+    assert embeddings[0] is not None
+    assert embeddings[1] is None
+    assert embeddings[2] is not None
+    assert embeddings[3] is None
+    assert service.fake.calls == [["first", "third"]]
+
+
+def test_batch_failure_falls_back_to_single_requests(service):
+    """Test that a failing batch isolates the bad text"""
+    service.fake.fail_texts = {"bad"}
+    texts = ["good", "bad", "also good"]
+
+    embeddings = service.generate_embeddings_batch(texts)
+
+    assert embeddings[0] is not None
+    assert embeddings[1] is None
+    assert embeddings[2] is not None
+
+
+def test_batch_all_failures_raise(service):
+    """Test that an error is raised when nothing could be embedded"""
+    service.fake.fail_texts = {"bad"}
+
+    with pytest.raises(EmbeddingError):
+        service.generate_embeddings_batch(["bad"], retry_on_failure=False)
+
+
+def test_concurrent_batches_keep_input_order(service):
+    """Test that batches dispatched concurrently map back to their inputs"""
+    service.batch_size = 3
+    service.max_concurrency = 4
+    texts = ["x" * (i + 1) for i in range(20)]
+
+    embeddings = service.generate_embeddings_batch(texts)
+
+    assert len(service.fake.calls) == 7
+    assert [e[0] for e in embeddings] == [float(i + 1) for i in range(20)]
+
+
+def test_repeated_query_embedding_is_cached(service):
+    """Test that repeated queries skip the API"""
+    first = service.generate_query_embedding("What is photosynthesis?")
+    second = service.generate_query_embedding("  What is   photosynthesis? ")
+
+    assert first == second
+    assert len(service.fake.calls) == 1
+
+
+def test_query_cache_is_keyed_by_model(service):
+    """Test that switching models does not reuse cached query embeddings"""
+    service.generate_query_embedding("What is osmosis?")
+    service.model_name = "models/other-embedding"
+    service.generate_query_embedding("What is osmosis?")
+
+    assert len(service.fake.calls) == 2
+
+
+class FakeClock:
+    """Manually advanced clock whose sleep moves time forward"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter_waits_for_request_quota():
+    """Test that requests beyond the per-minute quota wait for refill"""
+    clock = FakeClock()
+    limiter = TokenBucketRateLimiter(60, 0, clock=clock, sleep=clock.sleep)
+
+    for _ in range(60):
+        limiter.acquire()
+    assert clock.slept == []
+
+    limiter.acquire()
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_rate_limiter_charges_batches_per_text():
+    """Test that a batch call uses one request of quota per text"""
+    clock = FakeClock()
+    limiter = TokenBucketRateLimiter(60, 0, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire(requests=40)
+    limiter.acquire(requests=20)
+    assert clock.slept == []
+
+    limiter.acquire(requests=30)
+    assert clock.now == pytest.approx(30.0)
+
+
+def test_batch_charges_rate_limiter_per_text(service):
+    """Test that _embed_batch charges the limiter for every text it sends"""
+    charged = []
+    service.rate_limiter.acquire = lambda tokens=0, requests=1: charged.append(requests)
+    service.batch_size = 10
+
+    service.generate_embeddings_batch([f"chunk {i}" for i in range(25)])
+
+    assert charged == [10, 10, 5]
+
+
+def test_rate_limiter_waits_for_token_quota():
+    """Test that large requests wait until enough tokens have refilled"""
+    clock = FakeClock()
+    limiter = TokenBucketRateLimiter(0, 600, clock=clock, sleep=clock.sleep)
+
+    limiter.acquire(tokens=600)
+    limiter.acquire(tokens=300)
+
+    assert clock.now == pytest.approx(30.0)
+
+
+def test_rate_limiter_pause_holds_back_callers():
+    """Test that a pause delays the next request"""
+    clock = FakeClock()
+    limiter = TokenBucketRateLimiter(0, 0, clock=clock, sleep=clock.sleep)
+
+    limiter.pause(2.5)
+    limiter.acquire()
+
+    assert clock.now == pytest.approx(2.5)
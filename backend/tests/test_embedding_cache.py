@@ -0,0 +1,138 @@
+"""Tests for embedding cache"""
+import pytest
+from app.services.embedding_cache import (
+    EmbeddingCache,
+    LRUTTLCache,
+    content_hash,
+    normalize_text
+)
+
+
+MODEL = "models/embedding-001"
+TASK = "retrieval_document"
+
+
+class BrokenRedis:
+    """Redis stand-in that fails every call"""
+
+    def mget(self, keys):
+        raise ConnectionError("redis down")
+
+    def pipeline(self, transaction=True):
+        raise ConnectionError("redis down")
+
+
+class FakeSupabase:
+    """Records embedding_cache lookups and answers them from stored rows"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.lookups = []
+
+    def table(self, name):
+        return FakeQuery(self)
+
+
+class FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.hashes = []
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self
+
+    def in_(self, column, values):
+        self.hashes = list(values)
+        return self
+
+    def execute(self):
+        self.client.lookups.append(self.hashes)
+        rows = [
+            {"content_hash": text_hash, "embedding": self.client.rows[text_hash]}
+            for text_hash in self.hashes
+            if text_hash in self.client.rows
+        ]
+        return type("Response", (), {"data": rows})()
+
+
+def test_normalize_text_collapses_whitespace():
+    """Test that whitespace-only differences share a hash"""
+    assert normalize_text("  Hello\n\n  world\t") == "Hello world"
+    assert content_hash("Hello world") == content_hash("Hello \n world ")
+    assert content_hash("Hello world") != content_hash("hello world")
+
+
+def test_cache_round_trip(fake_redis):
+    """Test that stored embeddings are returned and misses stay None"""
+    cache = EmbeddingCache(redis_client=fake_redis)
+    embedding = [0.25, -0.5, 1.0]
+
+    cache.set_many(MODEL, TASK, ["cached text"], [embedding])
+    results = cache.get_many(MODEL, TASK, ["cached  text", "new text"])
+
+    assert results[0] == pytest.approx(embedding)
+    assert results[1] is None
+
+
+def test_cache_keys_include_model_and_task(fake_redis):
+    """Test that other models or task types do not share entries"""
+    cache = EmbeddingCache(redis_client=fake_redis)
+    cache.set_many(MODEL, TASK, ["text"], [[1.0, 2.0]])
+
+    assert cache.get_many("models/other", TASK, ["text"]) == [None]
+    assert cache.get_many(MODEL, "retrieval_query", ["text"]) == [None]
+
+
+def test_cache_failures_are_misses():
+    """Test that an unavailable Redis never raises"""
+    cache = EmbeddingCache(redis_client=BrokenRedis())
+
+    cache.set_many(MODEL, TASK, ["text"], [[1.0]])
+
+    assert cache.get_many(MODEL, TASK, ["text"]) == [None]
+
+
+def test_postgres_lookups_are_batched(fake_redis):
+    """Test that many Redis misses are looked up in Postgres in bounded batches"""
+    texts = [f"chunk {i}" for i in range(130)]
+    supabase = FakeSupabase({content_hash(text): "[0.5,1.5]" for text in texts[::2]})
+    cache = EmbeddingCache(redis_client=fake_redis, supabase=supabase)
+
+    results = cache.get_many(MODEL, TASK, texts)
+
+    assert [len(hashes) for hashes in supabase.lookups] == [50, 50, 30]
+    assert all(len(hashes) <= EmbeddingCache.POSTGRES_LOOKUP_BATCH_SIZE for hashes in supabase.lookups)
+    assert results[::2] == [pytest.approx([0.5, 1.5])] * 65
+    assert results[1::2] == [None] * 65
+    # Postgres hits are promoted into Redis
+    assert len(fake_redis.strings) == 65
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the oldest untouched entry is evicted first"""
+    cache = LRUTTLCache(max_size=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_lru_cache_entries_expire():
+    """Test that entries are dropped after their TTL"""
+    now = [0.0]
+    cache = LRUTTLCache(max_size=10, ttl_seconds=5, clock=lambda: now[0])
+    cache.set("query", [1.0])
+
+    now[0] = 4.9
+    assert cache.get("query") == [1.0]
+
+    now[0] = 5.0
+    assert cache.get("query") is None
+    assert len(cache) == 0
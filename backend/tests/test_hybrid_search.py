@@ -0,0 +1,113 @@
+"""Tests for hybrid search service"""
+import asyncio
+import threading
+
+import pytest
+from app.services import hybrid_search
+from app.services.hybrid_search import (
+    HybridSearchService,
+    HybridSearchError,
+    reciprocal_rank_fusion
+)
+
+
+class FakeRpc:
+    """Stand-in for supabase.rpc that records calls"""
+
+    def __init__(self, data=None, error=None):
+        self.calls = []
+        self.data = data or []
+        self.error = error
+
+    def __call__(self, name, params):
+        self.calls.append((name, params))
+        return self
+
+    def execute(self):
+        if self.error:
+            raise self.error
+        return type("Response", (), {"data": self.data})()
+
+
+def chunk(chunk_id, **extra):
+    return {"id": chunk_id, "material_id": "m1", "content": chunk_id, "chunk_index": 0, **extra}
+
+
+@pytest.fixture
+def service():
+    svc = HybridSearchService.__new__(HybridSearchService)
+    svc.candidates = 50
+    svc.rrf_k = 60
+    svc.supabase = type("Supabase", (), {})()
+    svc.supabase.rpc = FakeRpc(data=[chunk("b", rank=0.8), chunk("c", rank=0.5)])
+    return svc
+
+
+def test_reciprocal_rank_fusion_scores_and_order():
+    """Test that items ranked by both lists outrank items ranked highly by one"""
+    fused = reciprocal_rank_fusion([
+        [{"id": "a"}, {"id": "b"}],
+        [{"id": "b"}, {"id": "c"}],
+    ], k=60)
+
+    assert [entry["id"] for entry in fused] == ["b", "a", "c"]
+    assert fused[0]["score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[0]["ranks"] == [2, 1]
+    assert fused[1]["ranks"] == [1, None]
+    assert fused[2]["ranks"] == [None, 2]
+
+
+def test_search_runs_legs_concurrently_and_fuses(service, monkeypatch):
+    """Test that both legs run at once and results carry per-leg ranks"""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fake_match_text(notebook_id, query, limit, ef_search=None):
+        barrier.wait()  # Deadlocks (times out) unless the lexical leg runs concurrently
+        return [chunk("a", similarity=0.9), chunk("b", similarity=0.7)]
+
+    original_match_text = service._match_text
+
+    def lexical(notebook_id, query, limit):
+        barrier.wait()
+        return original_match_text(notebook_id, query, limit)
+
+    monkeypatch.setattr(hybrid_search.vector_search_service, "match_text", fake_match_text)
+    monkeypatch.setattr(service, "_match_text", lexical)
+
+    results = asyncio.run(service.search("nb", "photosynthesis", limit=2))
+
+    assert [r["id"] for r in results] == ["b", "a"]
+    assert results[0]["semantic_rank"] == 2
+    assert results[0]["lexical_rank"] == 1
+    assert results[0]["similarity"] == 0.7
+    assert results[0]["text_rank"] == 0.8
+    assert results[1]["lexical_rank"] is None
+    assert service.supabase.rpc.calls[0] == (
+        "match_chunks_text",
+        {"match_notebook_id": "nb", "search_query": "photosynthesis", "match_count": 50}
+    )
+
+
+def test_search_falls_back_to_one_leg(service, monkeypatch):
+    """Test that a failing semantic leg leaves the lexical results"""
+    def failing_match_text(notebook_id, query, limit, ef_search=None):
+        raise RuntimeError("embedding quota exceeded")
+
+    monkeypatch.setattr(hybrid_search.vector_search_service, "match_text", failing_match_text)
+
+    results = asyncio.run(service.search("nb", "photosynthesis"))
+
+    assert [r["id"] for r in results] == ["b", "c"]
+    assert all(r["semantic_rank"] is None for r in results)
+
+
+def test_search_raises_when_both_legs_fail(service, monkeypatch):
+    """Test that HybridSearchError is raised only when no leg succeeds"""
+    def failing_match_text(notebook_id, query, limit, ef_search=None):
+        raise RuntimeError("embedding quota exceeded")
+
+    monkeypatch.setattr(hybrid_search.vector_search_service, "match_text", failing_match_text)
+    service.supabase.rpc = FakeRpc(error=RuntimeError("connection reset"))
+
+    with pytest.raises(HybridSearchError):
+        asyncio.run(service.search("nb", "photosynthesis"))
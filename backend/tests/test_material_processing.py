@@ -0,0 +1,719 @@
+"""Tests for the material processing tasks"""
+import hashlib
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from celery.exceptions import Retry
+
+import app.tasks.material_processing as mp
+from app.core.config import settings
+from app.services.embedding import EmbeddingError
+from app.services.embedding_cache import EmbeddingCache
+from app.services.processing_checkpoint import ProcessingCheckpoint
+
+
+NOTEBOOK_ID = "8f7c3a52-2d1e-4c7b-9a57-3f0e6b1d4c21"
+
+
+def make_text(seed, words=4000):
+    """Deterministic prose whose chunks are far from near-duplicates of each other"""
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+        for _ in range(2000)
+    ]
+    sentences = []
+    for _ in range(words // 10):
+        sentences.append(" ".join(rng.choice(vocabulary) for _ in range(10)).capitalize() + ".")
+    return " ".join(sentences)
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable PostgREST query over the in-memory tables of FakeSupabase"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.payload = None
+        self.filters = []
+        self.limit_count = None
+
+    def select(self, columns):
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def update(self, fields):
+        self.action, self.payload = "update", fields
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) >= value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def or_(self, condition):
+        # Only the form _delete_stale_chunks sends: "<col>.is.null,<col>.neq."<value>""
+        column, value = re.fullmatch(r'(\w+)\.is\.null,\1\.neq\."(.*)"', condition).groups()
+        self.filters.append(lambda row: row.get(column) is None or row.get(column) != value)
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def execute(self):
+        rows = self.client.tables.setdefault(self.table, [])
+        self.client.operations.append((self.action, self.table))
+
+        if self.action == "insert":
+            inserted = [dict(row, id=f"{self.table}-{next(self.client.ids)}") for row in self.payload]
+            rows.extend(inserted)
+            return FakeResponse(inserted)
+
+        matched = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.action == "update":
+            for row in matched:
+                row.update(self.payload)
+        elif self.action == "delete":
+            self.client.tables[self.table] = [row for row in rows if row not in matched]
+        return FakeResponse(matched[:self.limit_count] if self.limit_count else matched)
+
+
+class FakeSupabase:
+    """In-memory materials and chunks tables with a log of executed operations"""
+
+    def __init__(self):
+        self.tables = {"materials": [], "chunks": []}
+        self.operations = []
+        self.ids = iter(range(1, 1_000_000))
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def material(self, material_id):
+        return next(row for row in self.tables["materials"] if row["id"] == material_id)
+
+    def chunks(self, material_id):
+        return sorted(
+            (row for row in self.tables["chunks"] if row["material_id"] == material_id),
+            key=lambda row: row["chunk_index"]
+        )
+
+
+class FakeResult:
+    def __init__(self, rows=(), rowcount=0):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return FakeResult([row[0] for row in self.rows])
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeSession:
+    """SQLAlchemy session stand-in answering statements through a handler(sql, params)"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.commits = 0
+        self.rollbacks = 0
+
+    def execute(self, statement, params=None):
+        return self.handler(str(statement), params) or FakeResult()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeEmbeddingService:
+    """Embeds texts deterministically and can fail after a number of calls"""
+
+    def __init__(self):
+        self.calls = []
+        self.fail_after = None
+        self.failing_texts = set()
+
+    def generate_embeddings_batch(self, texts, retry_on_failure=True):
+        if self.fail_after is not None and len(self.calls) >= self.fail_after:
+            raise EmbeddingError("quota exhausted")
+        self.calls.append(list(texts))
+        return [None if text in self.failing_texts else [float(len(text)), 1.0] for text in texts]
+
+    @property
+    def embedded_texts(self):
+        return [text for call in self.calls for text in call]
+
+
+class FakeQueueRouter:
+    def __init__(self):
+        self.released = []
+
+    def release(self, material_id):
+        self.released.append(material_id)
+
+
+class Harness:
+    """Fakes for every service the material processing tasks talk to"""
+
+    def __init__(self, monkeypatch, redis):
+        self.supabase = FakeSupabase()
+        self.redis = redis
+        self.embeddings = FakeEmbeddingService()
+        self.router = FakeQueueRouter()
+        self.files = {}
+        self.index_syncs = []
+        self.sql_handler = lambda sql, params: None
+        self.sessions = []
+
+        monkeypatch.setattr(settings, "CHUNK_STORE_METHOD", "postgrest")
+        monkeypatch.setattr(settings, "EMBEDDING_FANOUT_MIN_CHUNKS", 0)
+        monkeypatch.setattr(mp, "STREAM_BATCH_SIZE", 2)
+        monkeypatch.setattr(mp, "supabase_client", self.supabase)
+        monkeypatch.setattr(mp, "SessionLocal", self.session)
+        monkeypatch.setattr(mp, "load_checkpoint", self.load_checkpoint)
+        monkeypatch.setattr(mp, "_download_file_from_storage", self.download)
+        monkeypatch.setattr(mp, "embedding_cache", EmbeddingCache())
+        monkeypatch.setattr(mp.embedding_service, "generate_embeddings_batch",
+                            self.embeddings.generate_embeddings_batch)
+        monkeypatch.setattr(mp, "material_queue_router", self.router)
+        monkeypatch.setattr(mp, "_queue_vector_index_sync", self.index_syncs.append)
+
+    def session(self):
+        session = FakeSession(lambda sql, params: self.sql_handler(sql, params))
+        self.sessions.append(session)
+        return session
+
+    def load_checkpoint(self, material_id):
+        return ProcessingCheckpoint(self.redis, material_id).load()
+
+    def download(self, file_path):
+        file = tempfile.TemporaryFile()
+        file.write(self.files[file_path])
+        file.seek(0)
+        return file, hashlib.sha256(self.files[file_path]).hexdigest()
+
+    def add_material(self, material_id, text, **fields):
+        file_path = f"user/{material_id}.txt"
+        self.files[file_path] = text.encode("utf-8")
+        self.supabase.tables["materials"].append({
+            "id": material_id,
+            "notebook_id": NOTEBOOK_ID,
+            "filename": f"{material_id}.txt",
+            "file_path": file_path,
+            "file_size": len(self.files[file_path]),
+            "mime_type": "text/plain",
+            "processing_status": "pending",
+            "processing_signature": None,
+            "content_hash": None,
+            **fields
+        })
+        return file_path
+
+    def status(self, material_id):
+        return self.supabase.material(material_id)["processing_status"]
+
+
+@pytest.fixture
+def harness(monkeypatch, fake_redis):
+    return Harness(monkeypatch, fake_redis)
+
+
+def test_worker_imports_and_registers_tasks():
+    """Test that the worker entry point imports in a fresh interpreter and registers every task"""
+    script = (
+        "import celery_worker, app.tasks.material_processing as mp\n"
+        "missing = [n for n in mp.__all__ if getattr(mp, n).name not in celery_worker.celery_app.tasks]\n"
+        "assert not missing, missing\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=Path(__file__).resolve().parents[1],
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_process_material_stores_chunks_in_order(harness):
+    """Test that a material is chunked, embedded in batches, stored and completed"""
+    harness.add_material("material-1", make_text(1))
+
+    result = mp.process_material("material-1")
+
+    chunks = harness.supabase.chunks("material-1")
+    assert result["status"] == "completed"
+    assert result["chunks_created"] == len(chunks) > 2
+    assert [c["chunk_index"] for c in chunks] == list(range(len(chunks)))
+    assert all(c["chunker_version"] == mp.CHUNKER_VERSION for c in chunks)
+    assert [c["content"] for c in chunks] == harness.embeddings.embedded_texts
+    assert all(len(call) <= 2 for call in harness.embeddings.calls)
+
+    material = harness.supabase.material("material-1")
+    assert material["processing_status"] == "completed"
+    assert material["processing_signature"] == mp.PROCESSING_SIGNATURE
+    assert material["content_hash"] == hashlib.sha256(make_text(1).encode()).hexdigest()
+    assert harness.router.released == ["material-1"]
+    assert harness.index_syncs == ["material-1"]
+    assert harness.redis.hashes == {} and harness.redis.lists == {}
+
+
+def test_retry_resumes_without_re_embedding(harness):
+    """Test that a retry replays checkpointed batches and keeps stored chunks"""
+    harness.add_material("material-1", make_text(1))
+    harness.embeddings.fail_after = 2
+
+    with pytest.raises(EmbeddingError):
+        mp.process_material("material-1")
+
+    assert harness.status("material-1") == "failed"
+    first_attempt = harness.embeddings.embedded_texts
+    assert len(first_attempt) == 4
+    assert [c["chunk_index"] for c in harness.supabase.chunks("material-1")] == [0, 1, 2, 3]
+
+    # A row written after the last checkpointed batch, as if the worker died mid-insert
+    harness.supabase.tables["chunks"].append({
+        "material_id": "material-1", "chunk_index": 4, "content": "orphan",
+        "chunker_version": mp.CHUNKER_VERSION
+    })
+    harness.embeddings.fail_after = None
+
+    result = mp.process_material("material-1")
+
+    chunks = harness.supabase.chunks("material-1")
+    retried = harness.embeddings.embedded_texts[len(first_attempt):]
+    assert not set(retried) & set(first_attempt)
+    assert [c["content"] for c in chunks] == first_attempt + retried
+    assert [c["chunk_index"] for c in chunks] == list(range(len(chunks)))
+    assert result["chunks_created"] == len(chunks)
+    assert result["embeddings_generated"] == len(chunks)
+    assert harness.status("material-1") == "completed"
+    assert harness.redis.hashes == {} and harness.redis.lists == {}
+
+
+def test_changed_content_resets_checkpoint(harness):
+    """Test that a retry after the file changed starts over and replaces stored chunks"""
+    file_path = harness.add_material("material-1", make_text(1))
+    harness.embeddings.fail_after = 1
+
+    with pytest.raises(EmbeddingError):
+        mp.process_material("material-1")
+
+    old_chunks = [c["content"] for c in harness.supabase.chunks("material-1")]
+    assert len(old_chunks) == 2
+
+    harness.files[file_path] = make_text(2).encode("utf-8")
+    harness.embeddings.fail_after = None
+    harness.embeddings.calls.clear()
+
+    result = mp.process_material("material-1")
+
+    chunks = [c["content"] for c in harness.supabase.chunks("material-1")]
+    assert chunks == harness.embeddings.embedded_texts
+    assert not set(chunks) & set(old_chunks)
+    assert result["chunks_created"] == len(chunks)
+    assert harness.supabase.material("material-1")["content_hash"] == (
+        hashlib.sha256(make_text(2).encode()).hexdigest()
+    )
+    # Batches checkpointed for the old content are discarded too
+    assert harness.redis.hashes == {} and harness.redis.lists == {}
+
+
+@pytest.fixture
+def eager_fan_out(harness, monkeypatch):
+    """Run fan-out chords in-process: materials of 3+ chunks split into shards of 2"""
+    from app.core.celery_app import celery_app
+
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(celery_app.conf, "task_eager_propagates", True)
+    monkeypatch.setattr(settings, "EMBEDDING_FANOUT_MIN_CHUNKS", 3)
+    monkeypatch.setattr(settings, "EMBEDDING_FANOUT_SHARD_SIZE", 2)
+    return harness
+
+
+def test_fan_out_stores_shards_in_order(eager_fan_out):
+    """Test that a large material is embedded by shard tasks and stored in chunk order"""
+    harness = eager_fan_out
+    harness.add_material("material-1", make_text(1))
+
+    result = mp.process_material("material-1")
+
+    chunks = harness.supabase.chunks("material-1")
+    assert result["status"] == "embedding"
+    assert result["chunks_queued"] == len(chunks) > 3
+    assert result["embedding_shards"] == (len(chunks) + 1) // 2
+    assert len(harness.embeddings.calls) == result["embedding_shards"]
+    assert [c["chunk_index"] for c in chunks] == list(range(len(chunks)))
+    # Rows are inserted shard by shard in chunk order, whatever order shards finish in
+    assert [c["chunk_index"] for c in harness.supabase.tables["chunks"]] == list(range(len(chunks)))
+    assert sorted(c["content"] for c in chunks) == sorted(harness.embeddings.embedded_texts)
+    assert harness.status("material-1") == "completed"
+    assert harness.redis.hashes == {} and harness.redis.lists == {}
+
+
+def test_failing_shard_fails_material(eager_fan_out):
+    """Test that a shard failing after its retries leaves the material failed without chunks"""
+    harness = eager_fan_out
+    harness.add_material("material-1", make_text(1))
+    harness.embeddings.fail_after = 1
+
+    # Eager retries surface as Retry once the shard's own retries are exhausted
+    with pytest.raises((EmbeddingError, Retry)):
+        mp.process_material("material-1")
+
+    assert harness.status("material-1") == "failed"
+    assert harness.supabase.chunks("material-1") == []
+
+
+def test_fan_out_chord_marks_material_failed_on_error(harness, monkeypatch):
+    """Test that the chord's error callback marks the material failed"""
+    chords = []
+    monkeypatch.setattr(settings, "EMBEDDING_FANOUT_MIN_CHUNKS", 3)
+    monkeypatch.setattr(settings, "EMBEDDING_FANOUT_SHARD_SIZE", 2)
+    monkeypatch.setattr(mp, "chord", lambda header: lambda callback: chords.append((header, callback)))
+    harness.add_material("material-1", make_text(1))
+
+    result = mp.process_material("material-1")
+
+    header, callback = chords[0]
+    assert [shard.args[2] for shard in header] == list(range(result["embedding_shards"]))
+    assert callback.task == mp.finalize_material.name
+
+    errback = callback.options["link_error"][0]
+    assert errback["task"] == mp.mark_material_failed.name
+    mp.mark_material_failed(None, EmbeddingError("quota exhausted"), None, **errback["kwargs"])
+
+    assert harness.status("material-1") == "failed"
+    assert harness.router.released == ["material-1"]
+
+
+def add_processed_source(harness, text, **fields):
+    """A material with identical content, completed under the current configuration"""
+    harness.add_material(
+        "source-1", text,
+        processing_status="completed",
+        processing_signature=mp.PROCESSING_SIGNATURE,
+        content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        **fields
+    )
+
+
+def record_clones(harness, rowcount):
+    """Answer the clone INSERT ... SELECT with rowcount and record its parameters"""
+    clones = []
+
+    def handler(sql, params):
+        if sql.startswith("INSERT INTO chunks"):
+            clones.append(params)
+            return FakeResult(rowcount=rowcount)
+
+    harness.sql_handler = handler
+    return clones
+
+
+def test_duplicate_content_is_cloned(harness):
+    """Test that identical processed content is copied instead of embedded"""
+    add_processed_source(harness, make_text(1))
+    harness.add_material("material-1", make_text(1))
+    clones = record_clones(harness, rowcount=7)
+
+    result = mp.process_material("material-1")
+
+    assert clones == [{"material_id": "material-1", "source_material_id": "source-1"}]
+    assert result["deduplicated"] is True
+    assert result["dedup_source_material_id"] == "source-1"
+    assert result["chunks_created"] == 7
+    assert harness.embeddings.calls == []
+    assert harness.sessions[0].commits == 1
+    material = harness.supabase.material("material-1")
+    assert material["processing_status"] == "completed"
+    assert material["processing_signature"] == mp.PROCESSING_SIGNATURE
+
+
+@pytest.mark.parametrize("fields", [
+    {"processing_signature": "models/embedding-001|chunker-v0"},
+    {"processing_status": "processing"},
+    {"processing_status": "failed"},
+])
+def test_duplicate_source_must_be_processed_alike(harness, fields):
+    """Test that sources with another configuration, or not completed, are not cloned"""
+    add_processed_source(harness, make_text(1))
+    harness.supabase.material("source-1").update(fields)
+    harness.add_material("material-1", make_text(1))
+    clones = record_clones(harness, rowcount=7)
+
+    result = mp.process_material("material-1")
+
+    assert clones == []
+    assert result["deduplicated"] is False
+    assert result["chunks_created"] == len(harness.embeddings.embedded_texts) > 0
+
+
+def test_empty_clone_falls_back_to_processing(harness):
+    """Test that a source whose chunks are gone is rolled back and the material processed"""
+    add_processed_source(harness, make_text(1))
+    harness.add_material("material-1", make_text(1))
+    clones = record_clones(harness, rowcount=0)
+
+    result = mp.process_material("material-1")
+
+    assert len(clones) == 1
+    assert harness.sessions[0].rollbacks == 1
+    assert harness.sessions[0].commits == 0
+    assert result["deduplicated"] is False
+    assert result["chunks_created"] == len(harness.supabase.chunks("material-1")) > 0
+
+
+def process_under_old_chunker(harness, material_id, text):
+    """Process a material, then relabel it as produced by an older chunker version"""
+    harness.add_material(material_id, text)
+    mp.process_material(material_id)
+    for chunk in harness.supabase.chunks(material_id):
+        chunk["chunker_version"] = "chunker-v0"
+    harness.supabase.material(material_id)["processing_signature"] = (
+        f"{mp.embedding_service.model_name}|chunker-v0"
+    )
+    harness.embeddings.calls.clear()
+    harness.supabase.operations.clear()
+    return harness.supabase.chunks(material_id)
+
+
+def serve_reusable_embeddings(harness, chunks):
+    """Answer _load_reusable_embeddings with the given old chunks"""
+    def handler(sql, params):
+        if sql.startswith("SELECT content, embedding::text FROM chunks"):
+            assert params["chunker_version"] == mp.CHUNKER_VERSION
+            return FakeResult([
+                (c["content"], "[" + ",".join(map(str, c["embedding"])) + "]") for c in chunks
+            ])
+
+    harness.sql_handler = handler
+
+
+def test_rechunk_reuses_embeddings_and_replaces_old_chunks_last(harness):
+    """Test that re-chunking embeds only changed text and deletes old chunks after storing"""
+    old_chunks = process_under_old_chunker(harness, "material-1", make_text(1))
+    # The first chunk's text changed under the new chunker, the rest did not
+    serve_reusable_embeddings(harness, old_chunks[1:])
+
+    result = mp.rechunk_material("material-1")
+
+    new_chunks = harness.supabase.chunks("material-1")
+    assert result["status"] == "completed"
+    assert result["embeddings_reused"] == len(old_chunks) - 1
+    assert harness.embeddings.embedded_texts == [old_chunks[0]["content"]]
+    assert [c["embedding"] for c in new_chunks[1:]] == [c["embedding"] for c in old_chunks[1:]]
+    assert all(c["chunker_version"] == mp.CHUNKER_VERSION for c in new_chunks)
+    assert len(new_chunks) == len(old_chunks)
+
+    # Old-version chunks stay searchable until every new chunk is inserted
+    chunk_operations = [action for action, table in harness.supabase.operations if table == "chunks"]
+    assert chunk_operations[-1] == "delete"
+    assert chunk_operations[:-1].count("delete") == 1
+    assert chunk_operations.index("insert") > chunk_operations.index("delete")
+    material = harness.supabase.material("material-1")
+    assert material["processing_status"] == "completed"
+    assert material["processing_signature"] == mp.PROCESSING_SIGNATURE
+
+
+def test_failed_rechunk_keeps_old_chunks(harness):
+    """Test that a re-chunk failing midway leaves the old version in place"""
+    old_chunks = process_under_old_chunker(harness, "material-1", make_text(1))
+    serve_reusable_embeddings(harness, [])
+    harness.embeddings.fail_after = 1
+
+    with pytest.raises(EmbeddingError):
+        mp.rechunk_material("material-1")
+
+    remaining = [c for c in harness.supabase.chunks("material-1") if c["chunker_version"] == "chunker-v0"]
+    assert remaining == old_chunks
+    assert harness.status("material-1") == "completed"
+
+
+def test_rechunk_skips_current_materials(harness):
+    """Test that materials already on the current chunker version are not re-chunked"""
+    harness.add_material("material-1", make_text(1))
+    mp.process_material("material-1")
+
+    assert mp.rechunk_material("material-1") == {"material_id": "material-1", "status": "skipped"}
+
+
+class FakeChunkTable:
+    """Answers the backfill_embeddings statements from (id, content, embedding_model) rows"""
+
+    def __init__(self, rows):
+        self.rows = {chunk_id: {"content": content, "embedding_model": model, "embedding": None}
+                     for chunk_id, content, model in rows}
+        self.signature_updates = []
+
+    def __call__(self, sql, params):
+        if sql.startswith("SELECT id::text, content FROM chunks"):
+            rows = [
+                (chunk_id, row["content"]) for chunk_id, row in sorted(self.rows.items())
+                if row["embedding_model"] != params["embedding_model"]
+                and (params["after"] is None or chunk_id > params["after"])
+            ]
+            return FakeResult(rows[:params["limit"]])
+        if sql.startswith("SELECT EXISTS"):
+            return FakeResult([(any(
+                row["embedding_model"] != params["embedding_model"] for row in self.rows.values()
+            ),)])
+        if sql.startswith("UPDATE chunks"):
+            for update in params:
+                row = self.rows[update["id"]]
+                if row["embedding_model"] != update["embedding_model"]:
+                    row.update(embedding=update["embedding"], embedding_model=update["embedding_model"])
+        if sql.startswith("UPDATE materials"):
+            self.signature_updates.append(params["embedding_model"])
+
+
+def test_backfill_embeddings_pages_through_old_chunks(harness, monkeypatch):
+    """Test that the backfill re-embeds old-model chunks page by page, then updates signatures"""
+    model_name = mp.embedding_service.model_name
+    chunks = FakeChunkTable(
+        [(f"0000000{i}", f"text {i}", "models/old") for i in range(5)]
+        + [("00000009", "current", model_name)]
+    )
+    harness.sql_handler = chunks
+    scheduled = []
+    monkeypatch.setattr(settings, "EMBEDDING_BACKFILL_BATCH_SIZE", 2)
+    monkeypatch.setattr(mp.backfill_embeddings, "apply_async",
+                        lambda kwargs, **options: scheduled.append(kwargs))
+
+    results = [mp.backfill_embeddings()]
+    while len(scheduled) == len(results):
+        results.append(mp.backfill_embeddings(**scheduled[-1]))
+
+    assert results == [
+        {"updated": 2, "after": "00000001"},
+        {"updated": 2, "after": "00000003"},
+        {"updated": 1, "after": "00000004"},
+        {"updated": 0, "after": None},
+    ]
+    assert harness.embeddings.calls == [["text 0", "text 1"], ["text 2", "text 3"], ["text 4"]]
+    assert all(row["embedding_model"] == model_name for row in chunks.rows.values())
+    assert chunks.rows["00000000"]["embedding"] == "[6.0,1.0]"
+    assert chunks.rows["00000009"]["embedding"] is None
+    assert chunks.signature_updates == [model_name]
+
+
+def test_backfill_embeddings_retries_chunks_whose_embedding_failed(harness, monkeypatch):
+    """Test that a pass leaving failed chunks behind is followed by another before signatures move"""
+    model_name = mp.embedding_service.model_name
+    chunks = FakeChunkTable([(f"0000000{i}", f"text {i}", "models/old") for i in range(5)])
+    harness.sql_handler = chunks
+    scheduled = []
+    monkeypatch.setattr(settings, "EMBEDDING_BACKFILL_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "EMBEDDING_BACKFILL_MAX_PASSES", 3)
+    monkeypatch.setattr(mp.backfill_embeddings, "apply_async",
+                        lambda kwargs, **options: scheduled.append(kwargs))
+    harness.embeddings.failing_texts = {"text 1", "text 3"}
+
+    first_pass = [mp.backfill_embeddings()]
+    while first_pass[-1]["after"] is not None:
+        first_pass.append(mp.backfill_embeddings(**scheduled[-1]))
+
+    assert first_pass[-1] == {"updated": 0, "after": None, "passes": 1}
+    assert scheduled[-1] == {"after": None, "passes": 1}
+    assert chunks.signature_updates == []
+
+    # The next pass only finds the chunks that failed
+    harness.embeddings.failing_texts = set()
+    calls_before = len(harness.embeddings.calls)
+    assert mp.backfill_embeddings(**scheduled[-1]) == {"updated": 2, "after": "00000003"}
+    assert harness.embeddings.calls[calls_before:] == [["text 1", "text 3"]]
+    assert mp.backfill_embeddings(**scheduled[-1]) == {"updated": 0, "after": None}
+    assert all(row["embedding_model"] == model_name for row in chunks.rows.values())
+    assert chunks.signature_updates == [model_name]
+
+
+def test_backfill_embeddings_stops_after_max_passes(harness, monkeypatch):
+    """Test that chunks failing every pass keep their signatures on the old model"""
+    chunks = FakeChunkTable([(f"0000000{i}", f"text {i}", "models/old") for i in range(3)])
+    harness.sql_handler = chunks
+    scheduled = []
+    monkeypatch.setattr(settings, "EMBEDDING_BACKFILL_MAX_PASSES", 2)
+    monkeypatch.setattr(mp.backfill_embeddings, "apply_async",
+                        lambda kwargs, **options: scheduled.append(kwargs))
+    harness.embeddings.failing_texts = {"text 2"}
+
+    results = [mp.backfill_embeddings()]
+    while len(scheduled) == len(results):
+        results.append(mp.backfill_embeddings(**scheduled[-1]))
+
+    assert [result["after"] for result in results] == ["00000002", None, "00000002", None]
+    assert results[-1] == {"updated": 0, "after": None, "passes": 2}
+    assert chunks.rows["00000002"]["embedding_model"] == "models/old"
+    assert chunks.signature_updates == []
+
+
+def test_backfill_embeddings_resumes_after_failed_page(harness, monkeypatch):
+    """Test that a failed page is retried from the same position without losing earlier pages"""
+    chunks = FakeChunkTable([(f"0000000{i}", f"text {i}", "models/old") for i in range(4)])
+    harness.sql_handler = chunks
+    scheduled = []
+    monkeypatch.setattr(settings, "EMBEDDING_BACKFILL_BATCH_SIZE", 2)
+    monkeypatch.setattr(mp.backfill_embeddings, "apply_async",
+                        lambda kwargs, **options: scheduled.append(kwargs))
+    harness.embeddings.fail_after = 1
+
+    mp.backfill_embeddings()
+    with pytest.raises(EmbeddingError):
+        mp.backfill_embeddings(**scheduled[-1])
+
+    harness.embeddings.fail_after = None
+    assert mp.backfill_embeddings(**scheduled[-1]) == {"updated": 2, "after": "00000003"}
+    assert harness.embeddings.calls == [["text 0", "text 1"], ["text 2", "text 3"]]
+    assert chunks.signature_updates == []
@@ -0,0 +1,73 @@
+"""Tests for material processing queue routing"""
+from app.tasks.routing import (
+    LARGE_MATERIALS_QUEUE,
+    SMALL_MATERIALS_QUEUE,
+    MaterialQueueRouter
+)
+
+
+MB = 1024 * 1024
+PDF = "application/pdf"
+
+
+class BrokenRedis:
+    def pipeline(self, transaction=True):
+        raise ConnectionError("redis down")
+
+    def get(self, key):
+        raise ConnectionError("redis down")
+
+
+def test_routes_by_weighted_size():
+    """Test that large files, and smaller plain-text files, use the large queue"""
+    router = MaterialQueueRouter(large_threshold_bytes=10 * MB)
+
+    assert router.route("m1", 2 * MB, PDF)["queue"] == SMALL_MATERIALS_QUEUE
+    assert router.route("m2", 12 * MB, PDF)["queue"] == LARGE_MATERIALS_QUEUE
+    assert router.route("m3", 3 * MB, "text/plain")["queue"] == LARGE_MATERIALS_QUEUE
+
+
+def test_bulk_uploads_lose_priority_per_user(fake_redis):
+    """Test that each pending upload lowers the priority of the user's next one"""
+    router = MaterialQueueRouter(redis_client=fake_redis)
+
+    priorities = [router.route(f"bulk-{i}", MB, PDF, user_id="bulk")["priority"] for i in range(12)]
+    other = router.route("single", MB, PDF, user_id="other")
+
+    assert priorities[:4] == [0, 1, 2, 3]
+    assert priorities[-1] == 9
+    assert other["priority"] == 0
+
+
+def test_release_restores_priority(fake_redis):
+    """Test that finished materials stop counting, and release is idempotent"""
+    router = MaterialQueueRouter(redis_client=fake_redis)
+    router.route("m1", MB, PDF, user_id="u1")
+    router.route("m2", MB, PDF, user_id="u1")
+
+    router.release("m1")
+    router.release("m1")
+    router.release("m2")
+
+    assert router.route("m3", MB, PDF, user_id="u1")["priority"] == 0
+
+
+def test_pending_entries_expire(fake_redis):
+    """Test that lost tasks stop penalizing their user after the window"""
+    now = [0.0]
+    router = MaterialQueueRouter(redis_client=fake_redis, window_seconds=60, clock=lambda: now[0])
+    router.route("lost", MB, PDF, user_id="u1")
+
+    now[0] = 61.0
+    assert router.route("m2", MB, PDF, user_id="u1")["priority"] == 0
+
+
+def test_redis_failure_falls_back_to_size_routing():
+    """Test that an unavailable Redis never blocks uploads"""
+    router = MaterialQueueRouter(redis_client=BrokenRedis(), large_threshold_bytes=10 * MB)
+
+    assert router.route("m1", 20 * MB, PDF, user_id="u1") == {
+        "queue": LARGE_MATERIALS_QUEUE,
+        "priority": 0
+    }
+    router.release("m1")
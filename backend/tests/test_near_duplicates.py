@@ -0,0 +1,104 @@
+"""Tests for near-duplicate suppression"""
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import Settings
+from app.services.near_duplicates import (
+    MAX_DISTANCE,
+    SimHashIndex,
+    drop_near_duplicate_chunks,
+    simhash,
+    strip_page_boilerplate
+)
+from app.services.text_chunking import TextChunk
+
+
+LECTURE = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "The light reactions take place in the thylakoid membranes and produce ATP and NADPH, "
+    "which the Calvin cycle then uses in the stroma to fix carbon dioxide into sugars."
+)
+
+
+def test_simhash_near_duplicates_are_close():
+    """Test that a small edit moves the fingerprint by few bits and unrelated text by many"""
+    edited = LECTURE.replace("glucose", "sugar")
+    unrelated = "Mitochondria are the site of cellular respiration and oxidative phosphorylation in eukaryotes."
+
+    assert bin(simhash(LECTURE) ^ simhash(edited)).count("1") <= 12
+    assert bin(simhash(LECTURE) ^ simhash(unrelated)).count("1") > 12
+
+
+def test_simhash_index_finds_within_distance():
+    """Test that lookups match fingerprints within the distance only"""
+    index = SimHashIndex(max_distance=3)
+    index.add(0b1011)
+
+    assert index.find(0b1011 ^ 0b111)
+    assert not index.find(0b1011 ^ (0b1111 << 40))
+
+
+def test_simhash_index_at_max_distance():
+    """Test that the largest distance still leaves one band intact to match on"""
+    index = SimHashIndex(max_distance=MAX_DISTANCE)
+    fingerprint = 0x0123456789ABCDEF
+    index.add(fingerprint)
+
+    # One flipped bit in each of seven of the eight bands
+    seven_bands = sum(1 << (band * 8) for band in range(7))
+    assert index.find(fingerprint ^ seven_bands)
+    assert not index.find(fingerprint ^ (seven_bands | 1 << 56))
+
+
+def test_max_distance_beyond_band_limit_is_rejected():
+    """Test that distances the band lookup cannot guarantee are refused"""
+    with pytest.raises(ValueError):
+        SimHashIndex(max_distance=MAX_DISTANCE + 1)
+
+    assert Settings(NEAR_DUPLICATE_MAX_DISTANCE=MAX_DISTANCE).NEAR_DUPLICATE_MAX_DISTANCE == 7
+    with pytest.raises(ValidationError):
+        Settings(NEAR_DUPLICATE_MAX_DISTANCE=MAX_DISTANCE + 1)
+
+
+def test_drop_near_duplicate_chunks_renumbers():
+    """Test that repeated chunks are dropped and the rest renumbered"""
+    chunks = [
+        TextChunk(LECTURE, 0, {"chunk_index": 0}),
+        TextChunk("Slide 2: the Calvin cycle fixes carbon in three stages.", 1, {"chunk_index": 1}),
+        TextChunk(LECTURE, 2, {"chunk_index": 2}),
+        TextChunk("Slide 4: photorespiration wastes fixed carbon.", 3, {"chunk_index": 3}),
+    ]
+    stats = {}
+
+    kept = list(drop_near_duplicate_chunks(chunks, stats, max_distance=3))
+
+    assert [c.content[:8] for c in kept] == ["Photosyn", "Slide 2:", "Slide 4:"]
+    assert [c.chunk_index for c in kept] == [0, 1, 2]
+    assert kept[2].metadata["chunk_index"] == 2
+    assert stats == {"duplicate_chunks_removed": 1}
+
+
+def test_strip_page_boilerplate_removes_repeated_edges():
+    """Test that per-page headers and footers go, including from the first pages"""
+    pages = [
+        f"{'' if n == 1 else chr(10) * 2}[PAGE {n}]\nBIO 101 - Lecture Notes\nTopic {n} body text.\n"
+        f"Page {n} of 12"
+        for n in range(1, 13)
+    ]
+    stats = {}
+
+    stripped = list(strip_page_boilerplate(pages, stats, min_pages=3, sample_pages=4))
+
+    assert len(stripped) == 12
+    assert stripped[0] == "[PAGE 1]\nTopic 1 body text."
+    assert stripped[11] == "\n\n[PAGE 12]\nTopic 12 body text."
+    assert stats == {"boilerplate_lines_removed": 24}
+
+
+def test_strip_page_boilerplate_ignores_unpaged_text():
+    """Test that segments without page markers pass through unchanged"""
+    segments = ["Header\nBody one\nFooter", "\n\nHeader\nBody two\nFooter"] * 3
+    stats = {}
+
+    assert list(strip_page_boilerplate(segments, stats)) == segments
+    assert stats == {"boilerplate_lines_removed": 0}
@@ -31,3 +31,103 @@ def test_notebook_api_imports():
     from app.api.notebooks import router
     assert router is not None
     assert router.prefix == "/notebooks"
+
+
+def test_search_notebook_uses_full_text_function():
+    """Test that notebook search runs the ranked full-text database function"""
+    import asyncio
+    from app.services.notebooks import NotebookService
+
+    calls = []
+
+    class Rpc:
+        def __init__(self, name, params):
+            calls.append((name, params))
+
+        def execute(self):
+            return type("Response", (), {"data": [{"id": "c1", "rank": 0.4}]})()
+
+    service = NotebookService.__new__(NotebookService)
+    service.supabase = type("Supabase", (), {"rpc": staticmethod(Rpc)})()
+
+    results = asyncio.run(service.search_notebook("nb", "light reactions", limit=5))
+
+    assert calls == [("search_notebook_content", {
+        "search_notebook_id": "nb",
+        "search_query": "light reactions",
+        "match_count": 5
+    })]
+    assert results == [{"id": "c1", "rank": 0.4}]
+
+
+def test_search_notebook_trigram_mode_highlights_substring():
+    """Test that trigram mode runs the trigram function and marks the literal match"""
+    import asyncio
+    from app.services.notebooks import NotebookService
+
+    calls = []
+    content = "Call parse_chunk_rows() before flushing the COPY buffer to the server."
+
+    class Rpc:
+        def __init__(self, name, params):
+            calls.append((name, params))
+
+        def execute(self):
+            return type("Response", (), {"data": [{"id": "c1", "content": content, "rank": 1.0}]})()
+
+    service = NotebookService.__new__(NotebookService)
+    service.supabase = type("Supabase", (), {"rpc": staticmethod(Rpc)})()
+
+    results = asyncio.run(service.search_notebook("nb", "PARSE_CHUNK", mode="trigram"))
+
+    assert calls[0][0] == "search_notebook_trigram"
+    assert calls[0][1]["search_query"] == "PARSE_CHUNK"
+    assert "<mark>parse_chunk</mark>_rows()" in results[0]["highlight"]
+
+
+def test_search_notebook_rejects_unknown_mode():
+    """Test that an unknown search mode is a client error"""
+    import asyncio
+    from fastapi import HTTPException
+    from app.services.notebooks import NotebookService
+
+    service = NotebookService.__new__(NotebookService)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(service.search_notebook("nb", "query", mode="regex"))
+    assert exc_info.value.status_code == 400
+
+
+def test_delete_notebook_queues_vector_index_sync(monkeypatch):
+    """Test that deleting a notebook queues the sync that drops its vector index"""
+    import asyncio
+    from app.services.notebooks import NotebookService
+    from app.tasks import material_processing
+
+    queued = []
+    monkeypatch.setattr(
+        material_processing.sync_vector_indexes, "apply_async",
+        lambda **options: queued.append(options)
+    )
+
+    class Query:
+        def delete(self):
+            return self
+
+        def eq(self, column, value):
+            return self
+
+        def execute(self):
+            return type("Response", (), {"data": []})()
+
+    service = NotebookService.__new__(NotebookService)
+    service.supabase = type("Supabase", (), {"table": staticmethod(lambda name: Query())})()
+
+    async def get_notebook(notebook_id, user_id):
+        return {"id": notebook_id}
+
+    service.get_notebook = get_notebook
+
+    asyncio.run(service.delete_notebook("nb", "user"))
+
+    assert queued == [{"kwargs": {"notebook_id": "nb"}}]
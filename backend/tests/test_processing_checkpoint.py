@@ -0,0 +1,126 @@
+"""Tests for material processing checkpoints"""
+import pytest
+from app.services.processing_checkpoint import ChunkBatch, ProcessingCheckpoint
+from app.services.text_chunking import TextChunk
+
+
+def make_batch(start, size):
+    chunks = [
+        TextChunk(f"chunk {i}", i, {"chunk_index": i, "page_number": 1})
+        for i in range(start, start + size)
+    ]
+    embeddings = [[float(i), 0.5] for i in range(start, start + size)]
+    embeddings[0] = None
+    return ChunkBatch(chunks, embeddings, {"hits": 1, "misses": size - 1})
+
+
+def test_batches_round_trip(fake_redis):
+    """Test that checkpointed batches are replayed in order after a reload"""
+    checkpoint = ProcessingCheckpoint(fake_redis, "material-1").load()
+    checkpoint.begin("hash-a")
+    checkpoint.add_batch(make_batch(0, 3))
+    checkpoint.add_batch(make_batch(3, 2))
+    checkpoint.mark_stored(3, 2)
+
+    resumed = ProcessingCheckpoint(fake_redis, "material-1").load()
+    batches = list(resumed.iter_batches())
+
+    assert resumed.content_hash == "hash-a"
+    assert resumed.embedded_chunks == 5
+    assert resumed.stored_chunks == 3
+    assert resumed.stored_count == 2
+    assert not resumed.is_embedded
+    assert [batch.end for batch in batches] == [3, 5]
+    assert [chunk.content for chunk in batches[1].chunks] == ["chunk 3", "chunk 4"]
+    assert batches[0].chunks[1].metadata == {"chunk_index": 1, "page_number": 1}
+    assert batches[0].embeddings[0] is None
+    assert batches[0].embeddings[1] == pytest.approx([1.0, 0.5])
+    assert batches[1].cache_stats == {"hits": 1, "misses": 1}
+
+
+def test_mark_embedded_allows_skipping_extraction(fake_redis):
+    """Test that a fully embedded checkpoint carries the extraction metadata"""
+    checkpoint = ProcessingCheckpoint(fake_redis, "material-1").load()
+    checkpoint.begin("hash-a")
+    checkpoint.add_batch(make_batch(0, 2))
+    checkpoint.mark_embedded({"format": "pdf", "page_count": 2})
+
+    resumed = ProcessingCheckpoint(fake_redis, "material-1").load()
+
+    assert resumed.is_embedded
+    assert resumed.extraction_metadata == {"format": "pdf", "page_count": 2}
+
+
+def test_changed_content_discards_checkpoint(fake_redis):
+    """Test that progress recorded for other file content is not reused"""
+    checkpoint = ProcessingCheckpoint(fake_redis, "material-1").load()
+    checkpoint.begin("hash-a")
+    checkpoint.add_batch(make_batch(0, 2))
+
+    resumed = ProcessingCheckpoint(fake_redis, "material-1").load()
+    resumed.begin("hash-b")
+
+    assert resumed.embedded_chunks == 0
+    assert list(resumed.iter_batches()) == []
+    assert "material_pipeline:material-1:hash-a:batches" not in fake_redis.lists
+
+
+def test_clear_removes_checkpoint(fake_redis):
+    """Test that a completed material leaves no checkpoint behind"""
+    checkpoint = ProcessingCheckpoint(fake_redis, "material-1").load()
+    checkpoint.begin("hash-a")
+    checkpoint.add_batch(make_batch(0, 2))
+    checkpoint.clear()
+
+    assert fake_redis.hashes == {}
+    assert fake_redis.lists == {}
+
+
+def test_write_failure_disables_checkpoint(fake_redis, monkeypatch):
+    """Test that Redis failures never raise and stop further checkpointing"""
+    def broken_pipeline(transaction=True):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(fake_redis, "pipeline", broken_pipeline)
+    checkpoint = ProcessingCheckpoint(fake_redis, "material-1").load()
+    checkpoint.begin("hash-a")
+    checkpoint.add_batch(make_batch(0, 2))
+
+    assert not checkpoint.enabled
+    assert checkpoint.embedded_chunks == 0
+
+
+def test_disabled_checkpoint_is_a_no_op():
+    """Test that checkpointing without Redis keeps the pipeline running"""
+    checkpoint = ProcessingCheckpoint(None, "material-1").load()
+    checkpoint.begin("hash-a")
+    checkpoint.add_batch(make_batch(0, 2))
+
+    assert list(checkpoint.iter_batches()) == []
+    assert not checkpoint.is_embedded
+
+
+def test_shards_round_trip_and_clear(fake_redis):
+    """Test that fan-out shards are handed between tasks and cleared on completion"""
+    checkpoint = ProcessingCheckpoint(fake_redis, "material-1").load()
+    checkpoint.begin("hash-a")
+    checkpoint.put_shard(1, make_batch(4, 2))
+
+    shard = ProcessingCheckpoint(fake_redis, "material-1").load().get_shard(1)
+    assert [chunk.chunk_index for chunk in shard.chunks] == [4, 5]
+    assert shard.embeddings[1] == pytest.approx([5.0, 0.5])
+
+    checkpoint.clear()
+    assert fake_redis.hashes == {}
+
+
+def test_missing_shard_raises(fake_redis):
+    """Test that shards, unlike progress records, fail loudly"""
+    checkpoint = ProcessingCheckpoint(fake_redis, "material-1").load()
+    checkpoint.begin("hash-a")
+
+    with pytest.raises(RuntimeError):
+        checkpoint.get_shard(0)
+
+    with pytest.raises(RuntimeError):
+        ProcessingCheckpoint(None, "material-1").put_shard(0, make_batch(0, 1))
@@ -1,7 +1,11 @@
 """Tests for text chunking service"""
+import random
+import textwrap
+
 import pytest
 from app.services.text_chunking import (
     text_chunking_service,
+    TextChunkingService,
     ChunkingError,
     TextChunk
 )
@@ -54,6 +58,8 @@ def test_chunk_with_page_markers():
     for chunk in chunks:
         if 'page_number' in chunk.metadata:
             assert isinstance(chunk.metadata['page_number'], int)
+    assert chunks[0].metadata['page_number'] == 1
+    assert chunks[0].metadata['page_end'] == 2
 
 
 def test_count_tokens():
@@ -82,3 +88,230 @@ def test_chunk_overlap():
         assert len(chunks[0].content) > 0
         assert len(chunks[1].content) > 0
 
+
+
+def test_chunk_offsets_point_into_source_text():
+    """Test that chunk character offsets locate the chunk in the original text"""
+    sentence = "Überblick: naïve café façade — ünïcödé text № {}. "
+    text = "".join([sentence.format(i) for i in range(300)])
+    
+    chunks = text_chunking_service.chunk_text(text)
+    
+    assert len(chunks) > 1
+    for chunk in chunks:
+        start = chunk.metadata['char_start']
+        end = chunk.metadata['char_end']
+        assert text[start:end] == chunk.content
+    
+    # Consecutive chunks overlap or meet; only whitespace is left out
+    for previous, current in zip(chunks, chunks[1:]):
+        assert not text[previous.metadata['char_end']:current.metadata['char_start']].strip()
+
+
+def test_chunk_token_counts_stay_in_band():
+    """Test that full windows end between the minimum and maximum token counts"""
+    sentence = "This is sentence number {}. "
+    text = "".join([sentence.format(i) for i in range(500)])
+    
+    chunks = text_chunking_service.chunk_text(text)
+    
+    for chunk in chunks[:-1]:
+        assert text_chunking_service.min_chunk_tokens <= chunk.metadata['token_count']
+        assert chunk.metadata['token_count'] <= text_chunking_service.max_chunk_tokens
+    assert 0 < chunks[-1].metadata['token_count'] <= text_chunking_service.max_chunk_tokens
+
+
+def test_chunks_snap_to_sentence_boundaries():
+    """Test that chunks start and end on whole sentences"""
+    sentence = "This is sentence number {}. "
+    text = "".join([sentence.format(i) for i in range(500)])
+    
+    chunks = text_chunking_service.chunk_text(text)
+    
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.content.startswith("This is sentence")
+        assert chunk.content.endswith(".")
+
+
+def test_chunks_break_before_headings():
+    """Test that a heading inside the token band starts a new chunk and names its section"""
+    text = (
+        "INTRODUCTION\n\n" + "Plants convert light into energy. " * 120
+        + "\n\n# Methods\n\n" + "We measured the leaves carefully. " * 120
+    )
+    
+    chunks = text_chunking_service.chunk_text(text)
+    
+    methods = [chunk for chunk in chunks if chunk.content.startswith("# Methods")]
+    assert len(methods) == 1
+    assert methods[0].metadata['section_header'] == "Methods"
+    assert chunks[0].metadata['section_header'] == "INTRODUCTION"
+    for chunk in chunks[:chunks.index(methods[0])]:
+        assert "We measured" not in chunk.content
+
+
+def test_iter_chunks_streams_segments():
+    """Test that chunking a stream of segments matches chunking the joined text"""
+    pages = ["Lecture notes for this page. " * 60 for i in range(1, 8)]
+    segments = [pages[0]] + ["\n\n" + page for page in pages[1:]]
+    text = "".join(segments)
+    
+    streamed = list(text_chunking_service.iter_chunks(segments))
+    
+    assert len(streamed) > 1
+    for i, chunk in enumerate(streamed):
+        assert chunk.chunk_index == i
+        start = chunk.metadata['char_start']
+        end = chunk.metadata['char_end']
+        assert text[start:end] == chunk.content
+
+
+def test_iter_chunks_empty_stream_fails():
+    """Test that a stream without text raises error"""
+    with pytest.raises(ChunkingError):
+        list(text_chunking_service.iter_chunks(["", ""]))
+
+
+def test_page_markers_are_stripped_and_indexed():
+    """Test that page markers are removed and chunks map to the pages they span"""
+    pages = [f"Page {i} body text. " * 150 for i in range(1, 6)]
+    segments = [f"[PAGE 1]\n{pages[0]}"] + [
+        f"\n\n[PAGE {i}]\n{page}" for i, page in enumerate(pages[1:], start=2)
+    ]
+    clean_text = "\n\n".join(pages)
+    
+    chunks = list(text_chunking_service.iter_chunks(segments))
+    
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert "[PAGE" not in chunk.content
+        assert clean_text[chunk.metadata['char_start']:chunk.metadata['char_end']] == chunk.content
+        
+        # Expected pages from where each page starts in the marker-free text
+        page_starts = [clean_text.index(f"Page {i} body") for i in range(1, 6)]
+        start, end = chunk.metadata['char_start'], chunk.metadata['char_end']
+        expected_first = sum(1 for p in page_starts if p <= start)
+        expected_last = sum(1 for p in page_starts if p < end)
+        assert chunk.metadata['page_number'] == expected_first
+        assert chunk.metadata['page_end'] == expected_last
+    
+    assert chunks[0].metadata['page_number'] == 1
+    assert chunks[-1].metadata['page_end'] == 5
+
+
+def test_config_version_tracks_settings():
+    """Test that the chunker version changes with any chunking setting"""
+    base = TextChunkingService(min_chunk_tokens=500, max_chunk_tokens=1000, overlap_tokens=100)
+    same = TextChunkingService(min_chunk_tokens=500, max_chunk_tokens=1000, overlap_tokens=100)
+    wider = TextChunkingService(min_chunk_tokens=500, max_chunk_tokens=1200, overlap_tokens=100)
+    
+    assert base.config_version == same.config_version
+    assert base.config_version != wider.config_version
+
+
+def make_document(chars, seed=7):
+    """Deterministic prose: paragraphs of 2-8 sentences with occasional headings"""
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+        for _ in range(3000)
+    ]
+    blocks, size = [], 0
+    while size < chars:
+        if rng.random() < 0.05:
+            block = "## " + " ".join(rng.choice(vocabulary) for _ in range(4)).title() + "\n\n"
+        else:
+            sentences = [
+                " ".join(rng.choice(vocabulary) for _ in range(rng.randint(6, 28))).capitalize() + "."
+                for _ in range(rng.randint(2, 8))
+            ]
+            block = " ".join(sentences) + "\n\n"
+        blocks.append(block)
+        size += len(block)
+    return "".join(blocks)
+
+
+def test_overlap_repeats_closing_sentence():
+    """Test that a window cut mid-paragraph repeats its last sentence in the next one"""
+    text = "".join(f"This is sentence number {i}. " for i in range(500))
+    
+    chunks = text_chunking_service.chunk_text(text)
+    
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        first_sentence = current.content.split(". ")[0] + "."
+        assert previous.content.endswith(first_sentence)
+
+
+def test_no_overlap_after_paragraph_break():
+    """Test that a window ending at a paragraph break is followed by the next paragraph"""
+    text = "\n\n".join(
+        " ".join(f"Paragraph {p} sentence {i}." for i in range(12)) for p in range(30)
+    )
+    
+    chunks = text_chunking_service.chunk_text(text)
+    
+    paragraph_cuts = [
+        (previous, current) for previous, current in zip(chunks, chunks[1:])
+        if previous.content.endswith("sentence 11.")
+    ]
+    assert paragraph_cuts
+    for previous, current in paragraph_cuts:
+        assert current.content.startswith("Paragraph")
+        assert current.metadata['char_start'] > previous.metadata['char_end']
+
+
+def test_hard_wrapped_prose_has_no_headings():
+    """Test that short wrapped lines of ordinary prose are not taken for headings"""
+    rng = random.Random(3)
+    words = ["see", "you", "later", "The", "cell", "wall", "is", "a", "normal", "short", "line", "Energy"]
+    sentences = [
+        " ".join(rng.choice(words) for _ in range(rng.randint(4, 14))).capitalize() + "."
+        for _ in range(600)
+    ]
+    text = textwrap.fill(" ".join(sentences), width=40)
+    
+    chunks = text_chunking_service.chunk_text(text)
+    
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert 'section_header' not in chunk.metadata
+    for chunk in chunks[:-1]:
+        assert chunk.content.endswith(".")
+
+
+def test_large_document_chunk_count_and_decode_volume():
+    """Test that snapping needs no more chunks than fixed windows and no per-token decoding"""
+    service = TextChunkingService(min_chunk_tokens=500, max_chunk_tokens=1000, overlap_tokens=100)
+    text = make_document(1_000_000)
+    token_count = len(service.encoding.encode(text))
+    
+    decoded = {"bytes": 0, "per_token": 0}
+    encoding = service.encoding
+    
+    class CountingEncoding:
+        name = encoding.name
+        encode = staticmethod(encoding.encode)
+        
+        @staticmethod
+        def decode_bytes(tokens):
+            decoded["bytes"] += len(tokens)
+            return encoding.decode_bytes(tokens)
+        
+        @staticmethod
+        def decode_tokens_bytes(tokens):
+            decoded["per_token"] += len(tokens)
+            return encoding.decode_tokens_bytes(tokens)
+    
+    service.encoding = CountingEncoding()
+    chunks = service.chunk_text(text)
+    service.encoding = encoding
+    
+    # Windows of max_chunk_tokens stepping by max_chunk_tokens - overlap_tokens
+    fixed_windows = 1 + -(-(token_count - 1000) // 900)
+    assert len(chunks) <= fixed_windows
+    
+    # Byte offsets are decoded a slice at a time, for little more than the document
+    assert decoded["per_token"] == 0
+    assert decoded["bytes"] <= 1.5 * token_count
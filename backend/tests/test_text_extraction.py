@@ -1,6 +1,11 @@
 """Tests for text extraction service"""
+import tempfile
 import pytest
+from app.core.config import settings
 from app.services.text_extraction import (
+    available_pdf_backends,
+    get_pdf_backend,
+    PdfBackend,
     text_extraction_service,
     TextExtractionError,
     UnsupportedFormatError,
@@ -62,3 +67,216 @@ def test_extract_markdown():
     assert extracted_text == markdown_content
     assert metadata['format'] == 'text'
 
+
+
+def test_extract_text_stream_matches_full_text():
+    """Test that streamed segments concatenate to the extracted text"""
+    text_content = "".join(f"Line {i} of a long plain text document.\n" for i in range(5000))
+    file_bytes = text_content.encode('utf-8')
+    
+    segments, metadata = text_extraction_service.extract_text_stream(
+        file_content=file_bytes,
+        mime_type='text/plain',
+        filename='long.txt'
+    )
+    segments = list(segments)
+    
+    assert len(segments) > 1
+    assert "".join(segments) == text_content
+    assert metadata['format'] == 'text'
+    assert metadata['char_count'] == len(text_content)
+
+
+def make_pdf(page_texts):
+    """Build a minimal PDF with one line of Helvetica text per page"""
+    page_count = len(page_texts)
+    font_id = 3 + 2 * page_count
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids ["
+        + b" ".join(f"{3 + 2 * i} 0 R".encode() for i in range(page_count))
+        + f"] /Count {page_count} >>".encode(),
+    ]
+    for i, text in enumerate(page_texts):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    
+    xref_offset = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    pdf += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    return pdf
+
+
+@pytest.fixture(params=available_pdf_backends())
+def pdf_backend(request, monkeypatch):
+    """Run a test once per installed PDF backend"""
+    monkeypatch.setattr(settings, "PDF_BACKEND", request.param)
+    return request.param
+
+
+def test_extract_pdf_with_page_markers(pdf_backend):
+    """Test extracting text from PDF file"""
+    file_bytes = make_pdf(["Cell biology basics", "Mitochondria and energy"])
+    
+    extracted_text, metadata = text_extraction_service.extract_text(
+        file_content=file_bytes,
+        mime_type='application/pdf',
+        filename='notes.pdf'
+    )
+    
+    assert "[PAGE 1]" in extracted_text
+    assert "Mitochondria and energy" in extracted_text
+    assert metadata['format'] == 'pdf'
+    assert metadata['pdf_backend'] == pdf_backend
+    assert metadata['page_count'] == 2
+    assert metadata['extracted_pages'] == 2
+
+
+def test_extract_pdf_in_parallel_keeps_page_order(pdf_backend, monkeypatch):
+    """Test that process-pool extraction matches serial extraction"""
+    file_bytes = make_pdf([f"Chapter {i} content" for i in range(1, 31)])
+    
+    serial_text, _ = text_extraction_service.extract_text(
+        file_content=file_bytes,
+        mime_type='application/pdf',
+        filename='book.pdf'
+    )
+    
+    monkeypatch.setattr(settings, "PDF_EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(settings, "PDF_PARALLEL_MIN_PAGES", 10)
+    monkeypatch.setattr(settings, "PDF_PAGES_PER_TASK", 4)
+    
+    parallel_text, metadata = text_extraction_service.extract_text(
+        file_content=file_bytes,
+        mime_type='application/pdf',
+        filename='book.pdf'
+    )
+    
+    assert parallel_text == serial_text
+    assert metadata['extracted_pages'] == 30
+
+
+def _extract_in_daemonic_worker(file_bytes, backend_name):
+    """Extract a PDF in parallel from a pool child, as a prefork Celery worker does"""
+    import multiprocessing
+    from app.services.text_extraction import TextExtractionService
+    
+    def serial_extraction_not_allowed(self, document):
+        raise AssertionError("extracted serially")
+    
+    TextExtractionService._extract_pdf_pages = serial_extraction_not_allowed
+    settings.PDF_BACKEND = backend_name
+    settings.PDF_EXTRACTION_WORKERS = 2
+    settings.PDF_PARALLEL_MIN_PAGES = 10
+    settings.PDF_PAGES_PER_TASK = 4
+    
+    text, metadata = TextExtractionService().extract_text(
+        file_content=file_bytes,
+        mime_type='application/pdf',
+        filename='book.pdf'
+    )
+    return multiprocessing.current_process().daemon, text, metadata['extracted_pages']
+
+
+def test_extract_pdf_in_parallel_from_daemonic_worker(pdf_backend):
+    """Test that parallel extraction runs inside a daemonic Celery prefork child"""
+    from billiard.pool import Pool
+    
+    file_bytes = make_pdf([f"Chapter {i} content" for i in range(1, 31)])
+    serial_text, _ = text_extraction_service.extract_text(
+        file_content=file_bytes,
+        mime_type='application/pdf',
+        filename='book.pdf'
+    )
+    
+    pool = Pool(processes=1)
+    try:
+        daemon, parallel_text, extracted_pages = pool.apply(
+            _extract_in_daemonic_worker, (file_bytes, pdf_backend)
+        )
+    finally:
+        pool.terminate()
+        pool.join()
+    
+    assert daemon
+    assert parallel_text == serial_text
+    assert extracted_pages == 30
+
+
+def test_incomplete_pdf_backend_fails_on_creation():
+    """Test that a backend missing part of the interface cannot be instantiated"""
+    class IncompleteBackend(PdfBackend):
+        name = "incomplete"
+        
+        @classmethod
+        def is_available(cls):
+            return True
+        
+        def __init__(self, source):
+            pass
+        
+        @property
+        def page_count(self):
+            return 1
+    
+    with pytest.raises(TypeError, match="extract_page"):
+        IncompleteBackend(b"%PDF-1.4")
+
+
+def test_unavailable_pdf_backend_falls_back():
+    """Test that an unknown backend name falls back to an installed backend"""
+    backend = get_pdf_backend("not-a-backend")
+    
+    assert backend.name in available_pdf_backends()
+
+
+def test_extract_from_file_object(pdf_backend):
+    """Test extracting from a downloaded temporary file instead of bytes"""
+    text_content = "Première ligne.\n" * 10000 + "Dernière ligne sans saut"
+    
+    with tempfile.TemporaryFile() as text_file:
+        text_file.write(text_content.encode('utf-8'))
+        extracted_text, metadata = text_extraction_service.extract_text(
+            file_content=text_file,
+            mime_type='text/plain',
+            filename='notes.txt'
+        )
+    
+    assert extracted_text == text_content
+    assert metadata['char_count'] == len(text_content)
+    
+    with tempfile.TemporaryFile() as pdf_file:
+        pdf_file.write(make_pdf(["Photosynthesis overview", "Light reactions"]))
+        extracted_text, metadata = text_extraction_service.extract_text(
+            file_content=pdf_file,
+            mime_type='application/pdf',
+            filename='notes.pdf'
+        )
+    
+    assert "Light reactions" in extracted_text
+    assert metadata['extracted_pages'] == 2
+
+
+def test_extract_empty_file_object_fails():
+    """Test that an empty downloaded file raises error"""
+    with tempfile.TemporaryFile() as empty_file:
+        with pytest.raises(ExtractionFailedError):
+            text_extraction_service.extract_text(
+                file_content=empty_file,
+                mime_type='text/plain',
+                filename='empty.txt'
+            )
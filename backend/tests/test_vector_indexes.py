@@ -0,0 +1,197 @@
+"""Tests for per-notebook vector index planning"""
+from app.tasks.vector_indexes import (
+    create_notebook_index_sql,
+    notebook_index_name,
+    parse_notebook_index_name,
+    plan_vector_indexes
+)
+
+
+SMALL = "11111111-1111-1111-1111-111111111111"
+LARGE = "22222222-2222-2222-2222-222222222222"
+
+
+def test_index_name_round_trips():
+    """Test that index names fit Postgres' limit and parse back"""
+    name = notebook_index_name(LARGE, "binary")
+
+    assert len(name) <= 63
+    assert parse_notebook_index_name(name) == (LARGE, "binary")
+    assert parse_notebook_index_name("ix_chunks_embedding") is None
+
+
+def test_create_sql_is_partial_on_notebook():
+    """Test that the index only covers the notebook's chunks"""
+    sql = create_notebook_index_sql(LARGE, "full")
+
+    assert "CONCURRENTLY" in sql
+    assert "USING hnsw (embedding vector_cosine_ops)" in sql
+    assert "WITH (m = 16, ef_construction = 64)" in sql
+    assert sql.endswith(f"WHERE notebook_id = '{LARGE}'")
+
+
+def test_plan_indexes_only_large_notebooks():
+    """Test that notebooks past the exact-scan threshold get an index"""
+    plan = plan_vector_indexes({SMALL: 500, LARGE: 20000}, {}, "full", 10000)
+
+    assert plan.create == [(notebook_index_name(LARGE, "full"), LARGE)]
+    assert plan.drop == []
+
+
+def test_plan_keeps_index_until_notebook_halves():
+    """Test hysteresis: an index is kept down to half the threshold"""
+    existing = {notebook_index_name(LARGE, "full"): True}
+
+    assert plan_vector_indexes({LARGE: 8000}, existing, "full", 10000) == ([], [])
+    assert plan_vector_indexes({LARGE: 4000}, existing, "full", 10000).drop == list(existing)
+
+
+def test_plan_rebuilds_invalid_and_other_precision_indexes():
+    """Test that failed builds and indexes for another precision are replaced"""
+    invalid = notebook_index_name(LARGE, "full")
+    stale = notebook_index_name(SMALL, "half")
+
+    plan = plan_vector_indexes(
+        {LARGE: 20000, SMALL: 20000}, {invalid: False, stale: True}, "full", 10000
+    )
+
+    assert plan.drop == sorted([invalid, stale])
+    assert [name for name, _ in plan.create] == [
+        notebook_index_name(SMALL, "full"), notebook_index_name(LARGE, "full")
+    ]
+
+
+def test_plan_drops_indexes_of_deleted_notebooks():
+    """Test that indexes of notebooks without chunks are dropped"""
+    name = notebook_index_name(LARGE, "full")
+
+    assert plan_vector_indexes({}, {name: True}, "full", 10000).drop == [name]
+
+
+def test_full_sync_is_scheduled_on_the_large_queue():
+    """Test that celery beat runs the full sync that drops indexes of deleted and shrunk notebooks"""
+    from app.core.celery_app import celery_app
+    from app.core.config import settings
+
+    entry = celery_app.conf.beat_schedule["sync-vector-indexes"]
+
+    assert entry["task"] == "app.tasks.sync_vector_indexes"
+    assert "kwargs" not in entry
+    assert entry["schedule"] == settings.VECTOR_INDEX_SYNC_INTERVAL_SECONDS
+    assert celery_app.conf.task_routes[entry["task"]] == {"queue": "materials_large"}
+
+
+def test_migration_011_drops_the_global_index(monkeypatch):
+    """Test that no global embedding index is left once notebooks search their own indexes"""
+    import contextlib
+    import importlib.util
+    from pathlib import Path
+
+    path = Path(__file__).resolve().parent.parent / "alembic" / "versions" / "011_drop_global_embedding_index.py"
+    spec = importlib.util.spec_from_file_location("revision_011", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    statements = []
+    context = type("Context", (), {"autocommit_block": staticmethod(contextlib.nullcontext)})()
+    monkeypatch.setattr(migration, "op", type("Op", (), {
+        "execute": staticmethod(statements.append),
+        "get_context": staticmethod(lambda: context),
+    }))
+
+    migration.upgrade()
+
+    assert statements[0] == "DROP INDEX CONCURRENTLY IF EXISTS ix_chunks_embedding"
+    assert not any("CREATE INDEX" in statement for statement in statements)
+    # Only a notebook's partial index, matched by name, serves an ANN query
+    assert "ix_chunks_emb_%s_%s" in migration.MATCH_CHUNKS_FUNCTION
+
+
+class FakeIndexConnection:
+    """Answers the sync_vector_indexes statements; held_locks are owned by another session"""
+
+    def __init__(self, chunk_counts, index_snapshots, held_locks=()):
+        self.chunk_counts = chunk_counts
+        self.index_snapshots = list(index_snapshots)
+        self.held_locks = set(held_locks)
+        self.statements = []
+
+    def execution_options(self, **options):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if sql.startswith("SELECT i.relname"):
+            # Each read sees the next snapshot, e.g. a concurrent build finishing
+            snapshot = self.index_snapshots.pop(0) if len(self.index_snapshots) > 1 else self.index_snapshots[0]
+            return FakeRows(list(snapshot.items()))
+        if sql.startswith("SELECT count(*)"):
+            return FakeRows([(self.chunk_counts.get(params["notebook_id"], 0),)])
+        if "pg_try_advisory_lock" in sql:
+            return FakeRows([(params["key"] not in self.held_locks,)])
+        return FakeRows([])
+
+
+class FakeRows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+
+def run_sync(monkeypatch, connection, notebook_id):
+    from app.tasks import material_processing
+
+    monkeypatch.setattr(material_processing, "engine", type("Engine", (), {
+        "connect": staticmethod(lambda: connection)
+    }))
+    return material_processing.sync_vector_indexes(notebook_id)
+
+
+def test_sync_skips_notebook_locked_by_another_sync(monkeypatch):
+    """Test that a second sync leaves an index another sync is still building alone"""
+    name = notebook_index_name(LARGE, "full")
+    connection = FakeIndexConnection(
+        {LARGE: 20000}, [{name: False}], held_locks={f"sync_vector_indexes:{LARGE}"}
+    )
+
+    result = run_sync(monkeypatch, connection, LARGE)
+
+    assert result == {"created": [], "dropped": [], "skipped": [LARGE]}
+    assert not any(sql.startswith(("DROP", "CREATE")) for sql in connection.statements)
+
+
+def test_sync_replans_under_the_lock(monkeypatch):
+    """Test that an index whose build finished while waiting for the lock is kept"""
+    name = notebook_index_name(LARGE, "full")
+    connection = FakeIndexConnection({LARGE: 20000}, [{name: False}, {name: True}])
+
+    result = run_sync(monkeypatch, connection, LARGE)
+
+    assert result == {"created": [], "dropped": [], "skipped": []}
+    assert not any(sql.startswith(("DROP", "CREATE")) for sql in connection.statements)
+    assert "pg_advisory_unlock" in connection.statements[-1]
+
+
+def test_sync_rebuilds_invalid_index_when_unlocked(monkeypatch):
+    """Test that a failed build is dropped and rebuilt by the sync holding the lock"""
+    name = notebook_index_name(LARGE, "full")
+    connection = FakeIndexConnection({LARGE: 20000}, [{name: False}])
+
+    result = run_sync(monkeypatch, connection, LARGE)
+
+    assert result == {"created": [name], "dropped": [name], "skipped": []}
+    assert [sql.split(" ")[0] for sql in connection.statements if sql.startswith(("DROP", "CREATE"))] == [
+        "DROP", "CREATE"
+    ]
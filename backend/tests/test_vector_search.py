@@ -0,0 +1,170 @@
+"""Tests for vector search service"""
+import asyncio
+import threading
+
+import pytest
+from app.services.vector_search import VectorSearchService, VectorSearchError
+
+
+class FakeRpc:
+    """Stand-in for supabase.rpc that records calls"""
+
+    def __init__(self, data=None, error=None):
+        self.calls = []
+        self.data = data or []
+        self.error = error
+
+    def __call__(self, name, params):
+        self.calls.append((name, params))
+        return self
+
+    def execute(self):
+        if self.error:
+            raise self.error
+        return type("Response", (), {"data": self.data})()
+
+
+@pytest.fixture
+def service():
+    svc = VectorSearchService.__new__(VectorSearchService)
+    svc.rerank = True
+    svc.rerank_factor = 4
+    svc.exact_scan_max_chunks = 10000
+    svc.ef_search_profiles = {"chat": 40, "study": 200}
+    svc.supabase = type("Supabase", (), {})()
+    svc.supabase.rpc = FakeRpc(data=[{"id": "c1", "similarity": 0.9}])
+    return svc
+
+
+def test_full_precision_fetches_only_requested_rows(service):
+    """Test that the exact index is not over-fetched"""
+    service.index_precision = "full"
+
+    results = asyncio.run(service.search("nb", [0.1] * 768, limit=5))
+
+    name, params = service.supabase.rpc.calls[0]
+    assert name == "match_chunks"
+    assert params["match_count"] == 5
+    assert params["candidate_count"] == 5
+    assert params["ef_search"] == 40
+    assert results == [{"id": "c1", "similarity": 0.9}]
+
+
+def test_ef_search_is_passed_per_query(service):
+    """Test that a recall-sensitive caller can raise ef_search for one query"""
+    service.index_precision = "full"
+
+    asyncio.run(service.search(
+        "nb", [0.1] * 768, limit=5, ef_search=service.ef_search_profiles["study"]
+    ))
+
+    assert service.supabase.rpc.calls[0][1]["ef_search"] == 200
+
+
+def test_quantized_index_over_fetches_for_rerank(service):
+    """Test that quantized indexes fetch extra candidates and pass rerank through"""
+    service.index_precision = "binary"
+
+    asyncio.run(service.search("nb", [0.1] * 768, limit=5, rerank=False))
+
+    params = service.supabase.rpc.calls[0][1]
+    assert params["candidate_count"] == 20
+    assert params["index_precision"] == "binary"
+    assert params["rerank"] is False
+    assert params["exact_scan_threshold"] == 10000
+
+
+def test_search_failure_raises(service):
+    """Test that database errors surface as VectorSearchError"""
+    service.index_precision = "half"
+    service.supabase.rpc = FakeRpc(error=RuntimeError("function does not exist"))
+
+    with pytest.raises(VectorSearchError):
+        asyncio.run(service.search("nb", [0.1] * 768))
+
+
+def test_search_filters_by_embedding_model(service):
+    """Test that query embeddings are only compared with chunks of their model"""
+    service.index_precision = "full"
+
+    asyncio.run(service.search("nb", [0.1] * 768, embedding_model="models/text-embedding-004"))
+
+    params = service.supabase.rpc.calls[0][1]
+    assert params["match_embedding_model"] == "models/text-embedding-004"
+
+
+def test_search_text_merges_previous_models(service, monkeypatch):
+    """Test that chunks not yet backfilled stay searchable under their old model"""
+    from app.services import vector_search
+
+    service.index_precision = "full"
+    service.previous_models = ["models/old"]
+    monkeypatch.setattr(
+        vector_search.embedding_service, "generate_query_embedding",
+        lambda query, model_name=None: [0.1] * 768
+    )
+
+    results_by_model = {
+        vector_search.embedding_service.model_name: [{"id": "new", "similarity": 0.7}],
+        "models/old": [{"id": "old", "similarity": 0.8}],
+    }
+
+    def fake_match(notebook_id, query_embedding, limit=10, rerank=None, embedding_model=None, ef_search=None):
+        return results_by_model[embedding_model]
+
+    service.match = fake_match
+
+    results = asyncio.run(service.search_text("nb", "photosynthesis", limit=1))
+
+    assert results == [{"id": "old", "similarity": 0.8}]
+
+
+def test_search_runs_blocking_calls_off_the_event_loop(service):
+    """Test that search and search_text keep the PostgREST round trip off the event loop"""
+    threads = []
+    service.match = lambda *args: threads.append(threading.get_ident()) or []
+    service.match_text = lambda *args: threads.append(threading.get_ident()) or []
+
+    asyncio.run(service.search("nb", [0.1] * 768))
+    asyncio.run(service.search_text("nb", "photosynthesis"))
+
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+
+
+def test_match_text_merges_results_across_models(service, monkeypatch):
+    """Test that each model is queried with its own embedding and results merge by similarity"""
+    from app.services import vector_search
+
+    current = vector_search.embedding_service.model_name
+    service.previous_models = ["models/old", "models/older"]
+    embedded = []
+
+    def fake_query_embedding(query, model_name=None):
+        embedded.append(model_name)
+        return [float(len(embedded))] * 768
+
+    monkeypatch.setattr(vector_search.embedding_service, "generate_query_embedding", fake_query_embedding)
+
+    results_by_model = {
+        current: [{"id": "new-1", "similarity": 0.9}, {"id": "new-2", "similarity": 0.5}],
+        "models/old": [{"id": "old-1", "similarity": 0.7}],
+        "models/older": [{"id": "older-1", "similarity": 0.8}, {"id": "older-2", "similarity": 0.4}],
+    }
+    queried = []
+
+    def fake_match(notebook_id, query_embedding, limit=10, rerank=None, embedding_model=None, ef_search=None):
+        queried.append((embedding_model, query_embedding[0], limit, ef_search))
+        return results_by_model[embedding_model]
+
+    service.match = fake_match
+
+    results = service.match_text("nb", "photosynthesis", limit=3, ef_search=200)
+
+    assert [chunk["id"] for chunk in results] == ["new-1", "older-1", "old-1"]
+    assert embedded == [current, "models/old", "models/older"]
+    assert queried == [
+        (current, 1.0, 3, 200),
+        ("models/old", 2.0, 3, 200),
+        ("models/older", 3.0, 3, 200),
+    ]